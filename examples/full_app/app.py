@@ -22,21 +22,31 @@ import logging
 import os
 import subprocess
 import sys
+import time
 import uuid
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
-from fastapi import FastAPI, File, HTTPException, Query, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import (
+    FastAPI,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 # NOTE: memory_system is a local module under examples/full_app/memory_system
 # It is deliberately designed to be low-dependency and portable.
 try:
-    from memory_system.core import MemorySystem
+    from memory_system.core import flush_shared_memory_systems, get_shared_memory_system
     # Import from the same directory
     import sys
     from pathlib import Path
@@ -67,10 +77,11 @@ from pydantic_ai.tools import (
 from pydantic_deep import (
     DeepAgentDeps,
     SessionManager,
+    SkillMaterializer,
     create_deep_agent,
 )
 from pydantic_deep.types import SubAgentConfig
-from pydantic_ai_backends import StateBackend, FilesystemBackend
+from pydantic_ai_backends import DockerSandbox, StateBackend, FilesystemBackend
 from dotenv import load_dotenv
 
 # Try to import DockerException, but it's optional
@@ -93,6 +104,7 @@ logger = logging.getLogger(__name__)
 APP_DIR = Path(__file__).parent
 WORKSPACE_DIR = APP_DIR / "workspace"
 SKILLS_DIR = APP_DIR / "skills"
+SKILL_CACHE_DIR = APP_DIR / "skill_cache"
 STATIC_DIR = APP_DIR / "static"
 MEMORY_DIR = APP_DIR / "memories"
 
@@ -100,10 +112,19 @@ MEMORY_DIR = APP_DIR / "memories"
 # All memories are stored for this single user identity
 PERSONAL_USER_ID = "owner"
 
+# Memory writes made during a turn are coalesced and written at most this often
+# (and always at the end of the turn and on shutdown)
+MEMORY_FLUSH_INTERVAL = 5.0
+
 # Create workspace if it doesn't exist
 WORKSPACE_DIR.mkdir(exist_ok=True)
 MEMORY_DIR.mkdir(exist_ok=True)
 
+# Loaded skills (and their scripts) are copied once per version into SKILL_CACHE_DIR
+# on the host, which every session's container bind-mounts at /skills, so new
+# sessions find them already in place
+SKILL_MATERIALIZER = SkillMaterializer(root="/skills", host_dir=str(SKILL_CACHE_DIR))
+
 
 def ensure_memories_directory():
     """确保 memories 目录存在，如果不存在则重建并初始化空模板（按模块拆分为多个文件）"""
@@ -203,6 +224,32 @@ class UserSession:
     deps: DeepAgentDeps
     message_history: list[ModelMessage] = field(default_factory=list)
     pending_approval_state: dict[str, Any] = field(default_factory=dict)
+    todos_version_sent: int = -1  # Version of deps.todos last pushed to the client
+
+
+class SkillVolumeSessionManager(SessionManager):
+    """SessionManager whose containers also bind-mount the shared skill copies."""
+
+    def __init__(self, volumes: dict[str, str], **kwargs: Any):
+        super().__init__(**kwargs)
+        self._volumes = volumes
+
+    async def get_or_create(self, session_id: str, runtime: Any = None) -> DockerSandbox:
+        sandbox = self._sessions.get(session_id)
+        if sandbox is not None and sandbox.is_alive():
+            sandbox._last_activity = time.time()
+            return sandbox
+        self._sessions.pop(session_id, None)  # Container died
+
+        sandbox = DockerSandbox(
+            runtime=runtime or self._default_runtime,
+            session_id=session_id,
+            idle_timeout=self._default_idle_timeout,
+            volumes=self._volumes,
+        )
+        sandbox.start()
+        self._sessions[session_id] = sandbox
+        return sandbox
 
 
 # Global state - shared agent (stateless) and session manager
@@ -451,6 +498,7 @@ def create_agent() -> Agent[DeepAgentDeps, str]:
                 memory_dir=str(MEMORY_DIR),
                 id="personal_assistant",
                 fixed_user_id=PERSONAL_USER_ID,  # Fixed user ID for personal companion
+                flush_interval=MEMORY_FLUSH_INTERVAL,
             )
             toolsets.append(personal_assistant_toolset)
             logger.info("Personal assistant toolset added to agent (user_id='owner')")
@@ -476,6 +524,8 @@ def create_agent() -> Agent[DeepAgentDeps, str]:
         include_general_purpose_subagent=False,  # We only want our custom subagent
         # Skills
         skill_directories=[{"path": str(SKILLS_DIR), "recursive": True}],
+        # Copy loaded skills (and their scripts) once per version, shared by all sandboxes
+        skill_materializer=SKILL_MATERIALIZER,
         # Human-in-the-loop: require approval for execute
         interrupt_on={
             "execute": True,
@@ -489,9 +539,10 @@ def create_agent() -> Agent[DeepAgentDeps, str]:
         def inject_user_memory_context(ctx: Any) -> str:  # pragma: no cover
             """Inject user memory context (name, preferences) into system prompt."""
             try:
-                memory_sys = MemorySystem(
+                memory_sys = get_shared_memory_system(
                     user_id=PERSONAL_USER_ID,
-                    memory_dir=str(MEMORY_DIR)
+                    memory_dir=str(MEMORY_DIR),
+                    flush_interval=MEMORY_FLUSH_INTERVAL
                 )
                 
                 # Extract user name directly
@@ -586,7 +637,8 @@ async def lifespan(app: FastAPI):
         docker_available = True
         
         # Create session manager for per-user Docker containers
-        session_manager = SessionManager(
+        session_manager = SkillVolumeSessionManager(
+            volumes=SKILL_MATERIALIZER.volumes,
             default_runtime=None,  # Will use default python:3.12-slim
             default_idle_timeout=3600,  # 1 hour idle timeout
         )
@@ -669,6 +721,13 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"⚠️  Error stopping frontend dev server: {e}")
 
+    # Write memory changes still waiting for their flush interval
+    if MEMORY_SYSTEM_AVAILABLE:
+        try:
+            flush_shared_memory_systems()
+        except Exception as e:
+            print(f"⚠️  Error flushing memories: {e}")
+
     # Shutdown all sessions if Docker was available
     if session_manager is not None:
         count = await session_manager.shutdown()
@@ -802,6 +861,12 @@ async def run_agent_with_streaming(
     # Send start event
     await websocket.send_json({"type": "start"})
 
+    # Forward subagent progress (text deltas, tool calls) while `task` is running
+    async def forward_subagent_event(event: dict[str, Any]) -> None:
+        await websocket.send_json({"type": "subagent_event", **event})
+
+    session.deps.event_sink = forward_subagent_event
+
     # Use iter() for streaming execution with session's message history
     assert agent is not None
     async with agent.iter(
@@ -858,11 +923,14 @@ async def run_agent_with_streaming(
     # Use fixed PERSONAL_USER_ID for personal companion AI (not session-based)
     if MEMORY_SYSTEM_AVAILABLE:
         try:
-            memory_sys = MemorySystem(
+            memory_sys = get_shared_memory_system(
                 user_id=PERSONAL_USER_ID,  # Fixed user ID for personal companion
-                memory_dir=str(MEMORY_DIR)
+                memory_dir=str(MEMORY_DIR),
+                flush_interval=MEMORY_FLUSH_INTERVAL
             )
             memory_sys.increment_conversation_count()
+            # Write everything this turn changed in one go
+            memory_sys.flush()
             logger.debug("Updated memory statistics for owner")
         except Exception as e:
             logger.warning(f"Failed to update memory statistics: {e}")
@@ -1020,13 +1088,14 @@ async def _stream_tool_calls(
                     }
                 )
 
-                # Send TODO update after write_todos or read_todos
-                if tool_name in ("write_todos", "read_todos"):
+                # Push a TODO update only when the todo list actually changed
+                if session.deps.todos.version != session.todos_version_sent:
                     await _send_todos_update(websocket, session)
 
 
 async def _send_todos_update(websocket: WebSocket, session: UserSession) -> None:
     """Send current TODO list to frontend."""
+    session.todos_version_sent = session.deps.todos.version
     todos = [todo.model_dump() for todo in session.deps.todos]
     await websocket.send_json(
         {
@@ -1120,7 +1189,9 @@ async def list_files(session_id: str = Query(..., description="Session ID")):
     # List uploads from deps
     files["uploads"] = list(session.deps.uploads.keys())
 
-    return JSONResponse(content=files)
+    return JSONResponse(
+        content={**files, "uploads_version": session.deps.uploads.version},
+    )
 
 
 @app.get("/files/download/{filepath:path}")
@@ -1199,7 +1270,6 @@ async def get_file_binary(filepath: str, session_id: str = Query(..., descriptio
         filepath: Full path to file (e.g., /workspace/chart.png)
         session_id: Session ID
     """
-    from fastapi.responses import Response
 
     if session_id not in user_sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1267,17 +1337,31 @@ async def get_file_binary(filepath: str, session_id: str = Query(..., descriptio
 
 
 @app.get("/todos")
-async def get_todos(session_id: str = Query(..., description="Session ID")):
-    """Get current todo list for a specific session."""
+async def get_todos(
+    session_id: str = Query(..., description="Session ID"),
+    if_none_match: str | None = Header(None),
+):
+    """Get current todo list for a specific session.
+
+    The response carries an ETag derived from the todo list version, so clients
+    can poll with If-None-Match and get a 304 when nothing changed.
+    """
     if session_id not in user_sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
     session = user_sessions[session_id]
+    version = session.deps.todos.version
+    etag = f'W/"todos-{version}"'
+
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
 
     return JSONResponse(
         content={
             "todos": [todo.model_dump() for todo in session.deps.todos],
-        }
+            "version": version,
+        },
+        headers={"ETag": etag},
     )
 
 
@@ -1347,7 +1431,6 @@ async def preview_file(session_id: str, filepath: str):
              -> loads HTML, which requests style.css
              -> browser resolves to /preview/abc123/workspace/style.css
     """
-    from fastapi.responses import Response
 
     if session_id not in user_sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -4,13 +4,13 @@
 这个模块提供了一个完全独立的记忆系统，可以：
 1. 作为工具集集成到 pydantic-deep agent
 2. 独立使用，方便移植到其他 agent 框架
-3. 使用 JSON 格式存储，结构清晰，易于维护
+3. 使用 JSON 格式存储，结构清晰，易于维护（也可选 SQLite 存储：storage="sqlite"）
 
 使用示例：
-    from memory_system import MemorySystem
+    from memory_system import get_shared_memory_system
     
-    # 初始化
-    memory = MemorySystem(user_id="user123", memory_dir="./memories")
+    # 初始化（同一进程内共享实例，读缓存跨调用有效）
+    memory = get_shared_memory_system(user_id="user123", memory_dir="./memories")
     
     # 读取记忆
     context = memory.get_context()
@@ -21,8 +21,16 @@
     memory.learn_habit("用户喜欢在早上工作", category="工作习惯")
 """
 
-from .core import MemorySystem
+from .core import (
+    MemorySystem,
+    clear_shared_memory_systems,
+    flush_shared_memory_systems,
+    get_shared_memory_system,
+)
+from .interval_index import IntervalIndex
 from .json_storage import JsonMemoryStorage
+from .recurrence import RecurrenceRule
+from .sqlite_storage import SqliteMemoryStorage, migrate_json_to_sqlite
 from .utils import (
     calculate_remind_time,
     format_datetime,
@@ -37,7 +45,14 @@ from .utils import (
 
 __all__ = [
     "MemorySystem",
+    "get_shared_memory_system",
+    "flush_shared_memory_systems",
+    "clear_shared_memory_systems",
     "JsonMemoryStorage",
+    "IntervalIndex",
+    "RecurrenceRule",
+    "SqliteMemoryStorage",
+    "migrate_json_to_sqlite",
     "generate_id",
     "parse_datetime",
     "format_datetime",
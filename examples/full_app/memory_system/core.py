@@ -1,15 +1,18 @@
 """
 记忆系统核心模块（重构版本）
 
-提供高级接口，所有操作委托给 JsonMemoryStorage。
+提供高级接口，所有操作委托给存储实现（JsonMemoryStorage 或 SqliteMemoryStorage）。
 """
 
 from __future__ import annotations
 
+import threading
+from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from .json_storage import JsonMemoryStorage
+from .sqlite_storage import SqliteMemoryStorage
 
 
 class MemorySystem:
@@ -18,19 +21,36 @@ class MemorySystem:
     使用 JSON 格式存储所有记忆数据：
     memories/
       owner/
-        memory.json      # 所有记忆数据（JSON 格式）
+        memory.json      # 所有记忆数据的快照（JSON 格式）
+        memory.wal       # 快照之后的修改（预写日志，定期压缩进快照）
+    
+    flush_interval 开启 JSON 存储的延迟写入：一轮对话中的多次修改合并为一次
+    写入，调用方需在对话结束和进程退出时调用 flush()。
+    
+    storage="sqlite" 时改用 SQLite 存储（memory.db，带索引的查询），
+    首次打开时自动从已有的 memory.json 迁移。
     """
     
     def __init__(
         self,
         user_id: str,
-        memory_dir: str | Path = "./memories"
+        memory_dir: str | Path = "./memories",
+        storage: str = "json",
+        flush_interval: Optional[float] = None
     ):
         self.user_id = user_id
         self.memory_dir = Path(memory_dir)
         
-        # 使用 JSON 存储
-        self.storage = JsonMemoryStorage(user_id=user_id, memory_dir=memory_dir)
+        # 选择存储实现（json / sqlite）
+        self.storage: JsonMemoryStorage | SqliteMemoryStorage
+        if storage == "sqlite":
+            self.storage = SqliteMemoryStorage(user_id=user_id, memory_dir=memory_dir)
+        elif storage == "json":
+            self.storage = JsonMemoryStorage(
+                user_id=user_id, memory_dir=memory_dir, flush_interval=flush_interval
+            )
+        else:
+            raise ValueError(f"未知的存储类型: {storage}")
     
     def get_context(self, sections: Optional[List[str]] = None) -> str:
         """获取记忆上下文（用于注入系统提示）
@@ -154,6 +174,16 @@ class MemorySystem:
         """检测时间冲突"""
         return self.storage.check_time_conflict(start_time, end_time, exclude_id)
     
+    def find_free_slots(
+        self,
+        start: datetime,
+        end: datetime,
+        duration_minutes: int,
+        limit: int = 5
+    ) -> List[tuple[datetime, datetime]]:
+        """查找可用时间段（每天 9:00-18:00，避开一次性事件、已安排的待办和定期日程）"""
+        return self.storage.find_free_slots(start, end, duration_minutes, limit)
+    
     # ========== 新增功能 ==========
     
     def add_idea(
@@ -220,6 +250,10 @@ class MemorySystem:
         """增加对话计数"""
         self.storage.increment_conversation_count()
     
+    def flush(self):
+        """立即写入延迟写入模式下尚未落盘的修改"""
+        self.storage.flush()
+    
     # ========== 便捷访问 ==========
     
     @property
@@ -230,3 +264,52 @@ class MemorySystem:
     def get_all_data(self) -> Dict[str, Any]:
         """获取所有数据"""
         return self.storage.get_all_data()
+
+
+# 进程内共享的实例：(记忆目录, 用户ID, 存储类型) -> MemorySystem
+_instances: Dict[tuple[str, str, str], MemorySystem] = {}
+_instances_lock = threading.Lock()
+
+
+def get_shared_memory_system(
+    user_id: str,
+    memory_dir: str | Path = "./memories",
+    storage: str = "json",
+    flush_interval: Optional[float] = None
+) -> MemorySystem:
+    """获取 (memory_dir, user_id) 对应的共享 MemorySystem 实例
+    
+    同一进程内每个用户只创建一次存储实例，读缓存在工具调用和对话轮次之间
+    保持有效，也省去了每次调用的目录创建和文件检查。flush_interval 只在
+    首次创建实例时生效。
+    """
+    key = (str(Path(memory_dir).resolve()), user_id, storage)
+    memory_sys = _instances.get(key)
+    if memory_sys is not None:
+        return memory_sys
+    with _instances_lock:
+        memory_sys = _instances.get(key)
+        if memory_sys is None:
+            memory_sys = MemorySystem(
+                user_id=user_id,
+                memory_dir=memory_dir,
+                storage=storage,
+                flush_interval=flush_interval
+            )
+            _instances[key] = memory_sys
+        return memory_sys
+
+
+def flush_shared_memory_systems():
+    """写入所有共享实例中尚未落盘的修改（进程退出前调用）"""
+    with _instances_lock:
+        instances = list(_instances.values())
+    for memory_sys in instances:
+        memory_sys.flush()
+
+
+def clear_shared_memory_systems():
+    """清空共享实例（测试或重新加载磁盘数据时使用）"""
+    flush_shared_memory_systems()
+    with _instances_lock:
+        _instances.clear()
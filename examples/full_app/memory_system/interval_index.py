@@ -0,0 +1,220 @@
+"""
+日程区间索引
+
+把一次性事件和已安排的待办按长度分级、每级按开始时间排序保存，时间字符串
+只在加入索引时解析一次。冲突检测在每级用二分查找定位候选区间，空闲时间
+查找对合并后的忙碌区间做一次扫描。
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from heapq import merge
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .utils import parse_datetime
+
+
+def event_interval(event: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+    """一次性事件的时间段（没有结束时间时假设为开始时间后1小时，与 time_overlap 一致）"""
+    try:
+        start = parse_datetime(event["start_time"])
+        end = parse_datetime(event["end_time"]) if event.get("end_time") else None
+    except (KeyError, TypeError, ValueError):
+        return None
+    return start, end or start + timedelta(hours=1)
+
+
+def todo_interval(todo: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+    """已安排待办的时间段"""
+    scheduled = todo.get("scheduled_time") or {}
+    try:
+        start = parse_datetime(scheduled["start"])
+        end = parse_datetime(scheduled["end"]) if scheduled.get("end") else None
+    except (KeyError, TypeError, ValueError):
+        return None
+    return start, end or start + timedelta(hours=1)
+
+
+_BASE_LENGTH = timedelta(hours=1)
+
+
+def _level(length: timedelta) -> int:
+    """区间长度的级别：级别 k 的区间长度不超过 1小时 * 2^k"""
+    level, limit = 0, _BASE_LENGTH
+    while length > limit:
+        level, limit = level + 1, limit * 2
+    return level
+
+
+class IntervalIndex:
+    """按长度分级、每级按开始时间排序的时间段索引
+    
+    级别 k 的区间长度不超过 1小时 * 2^k。查询 [start, end) 时，级别 k 中与之
+    重叠的区间开始时间一定落在 (start - 1小时 * 2^k, end) 内，每级二分查找这
+    一段后再逐个比较结束时间。长区间（如多天的出差）只扩大自己那一级的查找
+    范围，不会让每次查询都扫描大段的短日程。
+    """
+    
+    def __init__(self):
+        self._levels: Dict[int, List[Tuple[datetime, str]]] = {}  # 级别 -> (开始时间, ID)，有序
+        self._items: Dict[str, Tuple[datetime, datetime, Dict[str, Any]]] = {}
+    
+    @classmethod
+    def from_schedule(
+        cls,
+        events: Iterable[Dict[str, Any]],
+        scheduled_todos: Iterable[Dict[str, Any]]
+    ) -> IntervalIndex:
+        """从一次性事件和已安排的待办建立索引"""
+        return cls.from_intervals(
+            [(e, event_interval(e)) for e in events]
+            + [(t, todo_interval(t)) for t in scheduled_todos]
+        )
+    
+    @classmethod
+    def from_intervals(
+        cls,
+        intervals: Iterable[Tuple[Dict[str, Any], Optional[Tuple[datetime, datetime]]]]
+    ) -> IntervalIndex:
+        """从 (条目, (开始, 结束)) 列表建立索引（同一ID只保留最早的区间）"""
+        index = cls()
+        entries = []
+        for item, interval in intervals:
+            if interval is not None and item.get("id"):
+                entries.append((interval[0], item["id"], interval[1], item))
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        for start, item_id, end, item in entries:
+            if item_id in index._items:
+                continue
+            index._levels.setdefault(_level(end - start), []).append((start, item_id))
+            index._items[item_id] = (start, end, item)
+        return index
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def add(self, item: Dict[str, Any], interval: Optional[Tuple[datetime, datetime]]):
+        """加入（或替换）一个区间；interval 为 None 时只删除旧区间"""
+        item_id = item.get("id")
+        if not item_id:
+            return
+        self.remove(item_id)
+        if interval is None:
+            return
+        start, end = interval
+        insort(self._levels.setdefault(_level(end - start), []), (start, item_id))
+        self._items[item_id] = (start, end, item)
+    
+    def add_event(self, event: Dict[str, Any]):
+        self.add(event, event_interval(event))
+    
+    def add_todo(self, todo: Dict[str, Any]):
+        self.add(todo, todo_interval(todo))
+    
+    def remove(self, item_id: str):
+        """删除一个区间（不存在时忽略）"""
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        level = _level(entry[1] - entry[0])
+        order = self._levels[level]
+        del order[bisect_left(order, (entry[0], item_id))]
+        if not order:
+            del self._levels[level]
+    
+    def _candidates(self, start: datetime, end: datetime) -> Iterator[Tuple[datetime, str]]:
+        """开始时间落在各级查找范围内的 (开始时间, ID)，按开始时间排序"""
+        slices = []
+        for level, order in self._levels.items():
+            lo = bisect_left(order, (start - _BASE_LENGTH * 2 ** level,))
+            hi = bisect_left(order, (end,))
+            if lo < hi:
+                slices.append(order[lo:hi])
+        return merge(*slices)
+    
+    def entries(
+        self,
+        start: datetime,
+        end: datetime
+    ) -> List[Tuple[datetime, datetime, Dict[str, Any]]]:
+        """返回与 [start, end) 重叠的 (开始, 结束, 条目)，按开始时间排序"""
+        results = []
+        for _, item_id in self._candidates(start, end):
+            entry = self._items[item_id]
+            if entry[1] > start:
+                results.append(entry)
+        return results
+    
+    def overlapping(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """返回与 [start, end) 重叠的事件和待办，按开始时间排序"""
+        return [item for _, _, item in self.entries(start, end)]
+    
+    def window(
+        self,
+        start: datetime,
+        end: datetime,
+        extra: Iterable[Tuple[Dict[str, Any], Tuple[datetime, datetime]]] = ()
+    ) -> IntervalIndex:
+        """[start, end) 内的子索引，并加入 extra 中的区间（如定期日程的发生）"""
+        inside = [
+            (item, (item_start, item_end))
+            for item_start, item_end, item in self.entries(start, end)
+        ]
+        return IntervalIndex.from_intervals(inside + list(extra))
+    
+    def busy(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """返回 [start, end) 内合并后的忙碌时间段"""
+        merged: List[Tuple[datetime, datetime]] = []
+        for item_start, item_end, _ in self.entries(start, end):
+            item_start, item_end = max(item_start, start), min(item_end, end)
+            if merged and item_start <= merged[-1][1]:
+                if item_end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], item_end)
+            else:
+                merged.append((item_start, item_end))
+        return merged
+    
+    def free_slots(
+        self,
+        start: datetime,
+        end: datetime,
+        duration: timedelta,
+        day_start_hour: int = 9,
+        day_end_hour: int = 18,
+        step: timedelta = timedelta(hours=1),
+        limit: int = 5
+    ) -> List[Tuple[datetime, datetime]]:
+        """查找 [start, end) 内每天工作时间中的空闲时间段
+        
+        对合并后的忙碌区间做一次扫描：每个空档从开始处起每隔 step 给出一个
+        长度为 duration 的时间段，最多返回 limit 个。
+        """
+        busy = self.busy(start, end)
+        slots: List[Tuple[datetime, datetime]] = []
+        j = 0
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end and len(slots) < limit:
+            window_start = max(day.replace(hour=day_start_hour), start)
+            window_end = min(day.replace(hour=day_end_hour), end)
+            day += timedelta(days=1)
+            if window_start >= window_end:
+                continue
+            
+            # 跳过已结束的忙碌区间，然后依次处理窗口内的空档
+            while j < len(busy) and busy[j][1] <= window_start:
+                j += 1
+            cursor = window_start
+            k = j
+            while cursor < window_end and len(slots) < limit:
+                gap_end = min(busy[k][0], window_end) if k < len(busy) else window_end
+                slot_start = cursor
+                while slot_start + duration <= gap_end and len(slots) < limit:
+                    slots.append((slot_start, slot_start + duration))
+                    slot_start += step
+                if k >= len(busy) or busy[k][0] >= window_end:
+                    break
+                cursor = max(cursor, busy[k][1])
+                k += 1
+        return slots
@@ -2,35 +2,373 @@
 基于 JSON 的记忆存储实现（重构版本）
 
 使用 JSON 格式存储所有记忆数据，所有操作通过ID进行，支持缓存和批量操作。
+
+存储引擎（预写日志）：
+    memories/owner/
+      memory.json   # 快照（完整数据，原子替换写入）
+      memory.wal    # 预写日志（每行一个事务，只追加）
+
+每次修改只向 memory.wal 追加一行 JSON（写入量与修改大小成正比），
+日志条数达到 compact_after 后压缩为新快照：先写临时文件再 os.replace
+原子替换，最后清空日志。加载时读取快照并重放 seq 大于快照
+metadata.wal_seq 的日志条目；崩溃时写了一半的最后一行会被忽略，
+因此每个事务要么完整生效，要么完全不生效。
+
+延迟写入（flush_interval）：修改立即应用到内存数据，日志最多每
+flush_interval 秒追加一次，期间的所有修改合并为一个事务（一次写入、
+一次 fsync）。调用 flush() 立即写入；进程退出前应调用 flush()，
+否则最后 flush_interval 秒内的修改会丢失。
+
+多进程：所有磁盘读写都持有 memory.lock 上的 fcntl 文件锁。缓存以快照和
+日志文件的 inode/mtime/大小为准，任一进程写入后其他进程下次读取时重新
+加载。写入前若发现版本（日志序号）已被其他进程推进，先加载最新数据并在
+其上重放本次尚未写入的操作。重放不会重新读取数据，因此：
+    - 计数类修改使用相对操作（incr，以及 update 的 incr 字段），在最新数据上
+      重放时结果仍然正确；
+    - 需要先读取再决定如何修改的方法（完成待办、移动状态、比较置信度等）在
+      读取和提交期间持有文件锁。立即写入模式下提交也在锁内完成，整个
+      读取-修改-写入是原子的；延迟写入模式下同一字段的并发 set 以最后写入
+      日志的为准。
 """
 
 from __future__ import annotations
 
+import copy
 import json
+import os
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内的线程锁
+    fcntl = None
+
+from .interval_index import IntervalIndex
+from .recurrence import (
+    RecurrenceRule,
+    advance_reminded_until,
+    expand_schedules,
+    parse_occurrence_reminder_id,
+    recurring_reminders,
+)
 from .utils import (
     calculate_remind_time,
     format_datetime,
+    format_duration,
     generate_id,
     get_current_time,
     parse_datetime,
     parse_duration,
-    time_overlap,
 )
 
+TODO_STATUSES = ["pending", "scheduled", "in_progress", "completed"]
+
+
+def _resolve(data: Dict[str, Any], path: List[Any]) -> Any:
+    """沿路径取出容器，缺失的字典层级自动创建"""
+    node: Any = data
+    for key in path:
+        if isinstance(node, dict):
+            node = node.setdefault(key, {})
+        else:
+            node = node[key]
+    return node
+
+
+def apply_op(data: Dict[str, Any], op: Dict[str, Any]):
+    """把一条日志操作应用到内存数据上（写入和重放共用）
+
+    支持的操作：
+        set      - 设置 path 处的值
+        delete   - 删除 path 处的键
+        incr     - 把 path 处的数值加 by（不存在时视为 0）
+        append   - 向 path 处的列表末尾追加 value
+        insert   - 在 path 处列表的 index 位置插入 value
+        truncate - 把 path 处的列表截断为 length 项
+        remove   - 从 path 处列表删除 id 匹配的项
+        update   - 更新 path 处列表中 id 匹配项的字段（fields 覆盖，incr 累加）
+        replace  - 用 value 替换全部数据
+    """
+    kind = op["op"]
+    if kind == "replace":
+        data.clear()
+        data.update(copy.deepcopy(op["value"]))
+        return
+
+    path = op["path"]
+    if kind in ("set", "delete", "incr"):
+        parent = _resolve(data, path[:-1])
+        if kind == "set":
+            parent[path[-1]] = op["value"]
+        elif kind == "incr":
+            parent[path[-1]] = (parent.get(path[-1]) or 0) + op.get("by", 1)
+        else:
+            parent.pop(path[-1], None)
+        return
+
+    parent = _resolve(data, path[:-1])
+    items = parent.get(path[-1]) if isinstance(parent, dict) else parent[path[-1]]
+    if not isinstance(items, list):
+        items = parent[path[-1]] = []
+
+    if kind == "append":
+        items.append(op["value"])
+    elif kind == "insert":
+        items.insert(op["index"], op["value"])
+    elif kind == "truncate":
+        del items[op["length"]:]
+    elif kind == "remove":
+        items[:] = [item for item in items if item.get("id") != op["id"]]
+    elif kind == "update":
+        for item in items:
+            if item.get("id") == op["id"]:
+                item.update(op.get("fields", {}))
+                for field, by in op.get("incr", {}).items():
+                    item[field] = (item.get(field) or 0) + by
+    else:
+        raise ValueError(f"未知的日志操作: {kind}")
+
+
+def default_memory_data() -> Dict[str, Any]:
+    """新用户的默认记忆数据"""
+    now = get_current_time()
+    return {
+        "profile": {
+            "basic_info": {
+                "姓名": "",
+                "昵称": "",
+                "时区": "Asia/Shanghai (UTC+8)",
+                "语言": "zh-CN"
+            },
+            "preferences": {
+                "提醒方式": {
+                    "默认提醒方式": "推送通知",
+                    "重要事项提醒": "邮件 + 推送",
+                    "提醒提前时间": "15分钟"
+                },
+                "工作习惯": {
+                    "工作日": "周一至周五",
+                    "工作时间": "09:00 - 18:00"
+                },
+                "内容偏好": {
+                    "喜欢的主题": "",
+                    "回复风格": "简洁、专业"
+                },
+                "日程偏好": {},
+                "询问偏好": {
+                    "任务完成询问": "after_task_time",
+                    "进度检查频率": "weekly",
+                    "最小询问间隔小时数": 4
+                }
+            }
+        },
+        "todos": {
+            "pending": [],
+            "scheduled": [],
+            "in_progress": [],
+            "completed": []
+        },
+        "habits": {
+            "工作习惯": [],
+            "沟通习惯": [],
+            "生活习惯": []
+        },
+        "conversations": [],
+        "diary": [],
+        "schedule": {
+            "regular": [],
+            "upcoming": []
+        },
+        "relationships": {
+            "contacts": [],
+            "important": []
+        },
+        "reminders": [],
+        "followups": [],
+        "ideas": [],
+        "metadata": {
+            "created_at": now,
+            "last_updated": now,
+            "conversation_count": 0,
+            "version": "2.0"
+        }
+    }
+
+
+def new_reminder(
+    reminder_type: str,
+    target_id: str,
+    remind_at: str,
+    reminder_minutes: int
+) -> tuple[str, Dict[str, Any]]:
+    """构造提醒任务（不写入），返回 (ID, 提醒)"""
+    reminder_id = generate_id("reminder")
+    now = get_current_time()
+    
+    # 计算提醒时间
+    if isinstance(remind_at, str):
+        remind_dt = parse_datetime(remind_at) - timedelta(minutes=reminder_minutes)
+        remind_at_str = format_datetime(remind_dt)
+    else:
+        remind_at_str = remind_at
+    
+    reminder = {
+        "id": reminder_id,
+        "type": reminder_type,
+        "target_id": target_id,
+        "remind_at": remind_at_str,
+        "reminded": False,
+        "reminder_minutes": reminder_minutes,
+        "content": None,  # 可以后续生成
+        "created_at": now
+    }
+    
+    return reminder_id, reminder
+
+
+def new_followup(
+    followup_type: str,
+    target_id: str,
+    ask_at: str,
+    frequency: str = "after_task_time"
+) -> tuple[str, Dict[str, Any]]:
+    """构造询问任务（不写入），返回 (ID, 询问)"""
+    followup_id = generate_id("followup")
+    now = get_current_time()
+    
+    followup = {
+        "id": followup_id,
+        "type": followup_type,
+        "target_id": target_id,
+        "ask_at": ask_at,
+        "asked": False,
+        "frequency": frequency,
+        "content": None,  # 可以后续生成
+        "created_at": now,
+        "last_asked_at": None,
+        "response_count": 0
+    }
+    
+    return followup_id, followup
+
+
+def render_context(data: Dict[str, Any], sections: Optional[List[str]] = None) -> str:
+    """把记忆数据渲染为上下文文本（用于注入系统提示，各存储实现共用）"""
+    context_parts = []
+    
+    if sections is None or "profile" in sections:
+        context_parts.append("## 👤 个人档案")
+        
+        basic_info = data["profile"]["basic_info"]
+        user_name = basic_info.get("姓名") or basic_info.get("昵称")
+        
+        if user_name:
+            context_parts.append(f"### ⭐ 用户姓名：**{user_name}**")
+            context_parts.append("")
+            context_parts.append("**重要**：这是你的主人。你只在打招呼或对话开始时称呼用户为：" + user_name + "，让用户知道你记得他们。之后正常交流即可，不需要频繁提及名字。")
+            context_parts.append("")
+        
+        context_parts.append("### 基本信息")
+        for key, value in basic_info.items():
+            if value:
+                context_parts.append(f"- {key}：{value}")
+        context_parts.append("")
+        
+        preferences = data["profile"]["preferences"]
+        if preferences:
+            context_parts.append("### 偏好设置")
+            for category, items in list(preferences.items())[:3]:
+                if items:
+                    context_parts.append(f"#### {category}")
+                    for key, value in list(items.items())[:3]:
+                        if value:
+                            context_parts.append(f"- {key}：{value}")
+            context_parts.append("")
+    
+    if sections is None or "todos" in sections:
+        all_todos = (
+            data["todos"].get("in_progress", []) +
+            data["todos"].get("scheduled", []) +
+            data["todos"].get("pending", [])
+        )
+        if all_todos:
+            context_parts.append("## 当前待办")
+            for todo in all_todos[:5]:
+                priority_str = f"（优先级：{todo['priority']}）" if todo.get('priority') != 'medium' else ""
+                due_str = f"，截止：{todo['due_date']}" if todo.get('due_date') else ""
+                context_parts.append(f"- [ ] {todo['content']}{priority_str}{due_str}")
+            context_parts.append("")
+    
+    if sections is None or "habits" in sections:
+        habits = data["habits"]
+        if any(habits.values()):
+            context_parts.append("## 学习到的习惯")
+            for category, habit_list in habits.items():
+                if habit_list:
+                    context_parts.append(f"### {category}")
+                    for habit_item in habit_list[-5:]:
+                        context_parts.append(f"- {habit_item['habit']}")
+            context_parts.append("")
+    
+    if sections is None or "schedule" in sections:
+        regular_schedules = data["schedule"].get("regular", [])
+        if regular_schedules:
+            context_parts.append("## 📅 定期日程")
+            for schedule in regular_schedules:
+                desc_str = f"（{schedule['description']}）" if schedule.get('description') else ""
+                context_parts.append(f"- **{schedule['title']}**：{schedule['time']}，{schedule['frequency']}{desc_str}")
+            context_parts.append("")
+        
+        upcoming_events = data["schedule"].get("upcoming", [])
+        if upcoming_events:
+            context_parts.append("## 📅 即将到来的事件")
+            for event in upcoming_events[:5]:
+                end_str = f"-{event['end_time']}" if event.get('end_time') else ""
+                desc_str = f"（{event['description']}）" if event.get('description') else ""
+                context_parts.append(f"- **{event['title']}**：{event['start_time']}{end_str}{desc_str}")
+            context_parts.append("")
+    
+    if sections is None or "conversations" in sections:
+        conversations = data["conversations"]
+        if conversations:
+            context_parts.append("## 最近对话摘要")
+            for conv in conversations[:3]:
+                context_parts.append(f"### {conv['date']} - {conv['topic']}")
+                for point in conv['summary'][:3]:
+                    context_parts.append(f"  - {point}")
+            context_parts.append("")
+    
+    return "\n".join(context_parts)
+
 
 class JsonMemoryStorage:
-    """基于 JSON 的记忆存储系统（重构版本）"""
+    """基于 JSON 的记忆存储系统（重构版本）
+
+    修改写入预写日志（memory.wal），定期压缩为快照（memory.json）。
+    多个进程（如多个 uvicorn worker）可以同时使用同一个记忆目录。
+    """
     
     def __init__(
         self,
         user_id: str = "owner",
-        memory_dir: str | Path = "./memories"
+        memory_dir: str | Path = "./memories",
+        compact_after: int = 200,
+        fsync: bool = True,
+        flush_interval: Optional[float] = None
     ):
+        """
+        Args:
+            user_id: 用户ID
+            memory_dir: 记忆根目录
+            compact_after: 日志累计多少个事务后压缩为快照
+            fsync: 每次追加日志后是否 fsync（关闭后更快，但断电可能丢失最近的修改）
+            flush_interval: 延迟写入间隔（秒）；None 表示每次修改立即写入日志
+        """
         self.user_id = user_id
         self.memory_dir = Path(memory_dir)
         self.memory_dir.mkdir(parents=True, exist_ok=True)
@@ -39,90 +377,75 @@ class JsonMemoryStorage:
         self.user_dir = self.memory_dir / user_id
         self.user_dir.mkdir(parents=True, exist_ok=True)
         
-        # JSON 文件路径
+        # JSON 快照、预写日志和跨进程锁文件路径
         self.json_file = self.user_dir / "memory.json"
+        self.wal_file = self.user_dir / "memory.wal"
+        self.lock_file = self.user_dir / "memory.lock"
+        self.compact_after = compact_after
+        self.fsync = fsync
+        self.flush_interval = flush_interval
         
-        # 缓存机制
+        # 缓存机制（快照和日志文件未变化时直接使用内存数据）
         self._cache: Optional[Dict[str, Any]] = None
-        self._cache_timestamp: Optional[float] = None
-        self._cache_ttl: float = 60.0  # 缓存60秒
+        self._disk_state: Optional[tuple] = None  # 上次读写后两个文件的状态
+        self._schedule_index: Optional[IntervalIndex] = None  # 随缓存一起失效，按需重建
+        
+        # 日志状态（seq 即数据的版本号，快照中记录为 metadata.wal_seq）
+        self._seq: int = 0  # 最后一个事务的序号
+        self._wal_entries: int = 0  # 快照之后的日志条数
+        
+        # 延迟写入状态：尚未写入日志的操作，以及到期后写入的定时器
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        
+        # 进程内线程锁 + 跨进程文件锁（可重入）
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd: Optional[int] = None
         
         # 初始化 JSON 文件
         self._initialize_json()
     
+    @contextmanager
+    def _locked(self):
+        """独占访问磁盘文件：线程锁 + fcntl 文件锁（不支持 fcntl 的平台只有线程锁）"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+    
+    def _disk_signature(self) -> tuple:
+        """快照和日志文件的 (inode, mtime, 大小)，任一进程写入后都会改变"""
+        signature = []
+        for path in (self.json_file, self.wal_file):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
     def _initialize_json(self):
         """初始化 JSON 文件（如果不存在）"""
-        if not self.json_file.exists():
-            now = get_current_time()
-            default_data = {
-                "profile": {
-                    "basic_info": {
-                        "姓名": "",
-                        "昵称": "",
-                        "时区": "Asia/Shanghai (UTC+8)",
-                        "语言": "zh-CN"
-                    },
-                    "preferences": {
-                        "提醒方式": {
-                            "默认提醒方式": "推送通知",
-                            "重要事项提醒": "邮件 + 推送",
-                            "提醒提前时间": "15分钟"
-                        },
-                        "工作习惯": {
-                            "工作日": "周一至周五",
-                            "工作时间": "09:00 - 18:00"
-                        },
-                        "内容偏好": {
-                            "喜欢的主题": "",
-                            "回复风格": "简洁、专业"
-                        },
-                        "日程偏好": {},
-                        "询问偏好": {
-                            "任务完成询问": "after_task_time",
-                            "进度检查频率": "weekly",
-                            "最小询问间隔小时数": 4
-                        }
-                    }
-                },
-                "todos": {
-                    "pending": [],
-                    "scheduled": [],
-                    "in_progress": [],
-                    "completed": []
-                },
-                "habits": {
-                    "工作习惯": [],
-                    "沟通习惯": [],
-                    "生活习惯": []
-                },
-                "conversations": [],
-                "diary": [],
-                "schedule": {
-                    "regular": [],
-                    "upcoming": []
-                },
-                "relationships": {
-                    "contacts": [],
-                    "important": []
-                },
-                "reminders": [],
-                "followups": [],
-                "ideas": [],
-                "metadata": {
-                    "created_at": now,
-                    "last_updated": now,
-                    "conversation_count": 0,
-                    "version": "2.0"
-                }
-            }
-            self._write_json(default_data)
+        with self._locked():
+            if not self.json_file.exists():
+                self._write_json(default_memory_data())
     
-    def _read_json(self, use_cache: bool = True) -> Dict[str, Any]:
-        """读取 JSON 文件（带缓存）"""
-        if use_cache and self._cache is not None:
-            if time.time() - self._cache_timestamp < self._cache_ttl:
-                return self._cache
-        
+    def _load(self) -> Dict[str, Any]:
+        """从快照加载数据并重放预写日志（在 _locked 中调用）
+
+        尚未写入日志的操作会重新应用到加载的数据上，因此其他进程的修改
+        和本进程的修改都不会丢失。
+        """
         if not self.json_file.exists():
             self._initialize_json()
         
@@ -130,56 +453,237 @@ class JsonMemoryStorage:
             with open(self.json_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
-            # 如果文件损坏，重新初始化
-            self._initialize_json()
-            with open(self.json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # 快照损坏（旧版本非原子写入可能造成）：保留原文件后重新初始化，避免静默丢失数据
+            if self.json_file.exists():
+                backup = self.json_file.with_name(f"memory.json.corrupt-{int(time.time())}")
+                os.replace(self.json_file, backup)
+            data = default_memory_data()
+            self._write_snapshot(data, seq=0)
+        
+        metadata = data.setdefault("metadata", {})
+        snapshot_seq = metadata.get("wal_seq", 0)
+        self._seq = snapshot_seq
+        self._wal_entries = 0
+        for entry in self._read_wal():
+            if entry["seq"] <= snapshot_seq:
+                continue
+            for op in entry["ops"]:
+                apply_op(data, op)
+            metadata["last_updated"] = entry["ts"]
+            self._seq = entry["seq"]
+            self._wal_entries += 1
+        metadata["wal_seq"] = self._seq
+        self._disk_state = self._disk_signature()
+        
+        for op in self._pending:
+            apply_op(data, op)
         
         # 更新缓存
         self._cache = data
-        self._cache_timestamp = time.time()
-        
+        self._schedule_index = None
         return data
     
-    def _write_json(self, data: Dict[str, Any], invalidate_cache: bool = True):
-        """写入 JSON 文件（清除缓存）"""
-        # 更新最后更新时间
-        if "metadata" in data:
-            data["metadata"]["last_updated"] = get_current_time()
+    def _read_wal(self) -> List[Dict[str, Any]]:
+        """读取预写日志中的完整事务
+
+        崩溃时写了一半的最后一行会被截掉，保证之后追加的事务能被正确读取。
+        """
+        if not self.wal_file.exists():
+            return []
+        
+        entries = []
+        valid_bytes = 0
+        with open(self.wal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # 最后一行未写完
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid_bytes += len(line)
         
-        # 使用缩进使 JSON 文件更易读
-        with open(self.json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if valid_bytes < self.wal_file.stat().st_size:
+            with open(self.wal_file, 'r+b') as f:
+                f.truncate(valid_bytes)
+        return entries
+    
+    def _read_json(self, use_cache: bool = True) -> Dict[str, Any]:
+        """读取记忆数据（文件未被任何进程修改时使用缓存）"""
+        with self._lock:
+            if use_cache and self._cache is not None:
+                if self._disk_signature() == self._disk_state:
+                    return self._cache
+            
+            with self._locked():
+                return self._load()
+    
+    def _commit(self, ops: List[Dict[str, Any]]):
+        """以一个事务写入一组操作：追加日志（或延迟追加），并应用到内存数据"""
+        if not ops:
+            return
+        with self._lock:
+            data = self._read_json()
+            for op in ops:
+                apply_op(data, op)
+            data.setdefault("metadata", {})["last_updated"] = get_current_time()
+            if self._schedule_index is not None:
+                for op in ops:
+                    self._update_schedule_index(data, op)
+            
+            self._pending.extend(ops)
+            if self.flush_interval is None:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _update_schedule_index(self, data: Dict[str, Any], op: Dict[str, Any]):
+        """根据一条操作增量维护日程索引；无法增量处理的操作使索引失效"""
+        path = op.get("path", [])
+        watched = (["schedule", "upcoming"], ["todos", "scheduled"])
+        if path == watched[0]:
+            add = self._schedule_index.add_event
+        elif path == watched[1]:
+            add = self._schedule_index.add_todo
+        elif op["op"] == "replace" or any(path == w[:len(path)] or path[:2] == w for w in watched):
+            # 替换了整个列表（或其上层）或修改了列表中的某一项
+            self._schedule_index = None
+            return
+        else:
+            return
         
-        if invalidate_cache:
-            self._cache = None
-            self._cache_timestamp = None
+        if op["op"] == "append":
+            add(op["value"])
+        elif op["op"] == "remove":
+            self._schedule_index.remove(op["id"])
+        elif op["op"] == "update":
+            for item in _resolve(data, path):
+                if item.get("id") == op["id"]:
+                    add(item)
+        else:
+            self._schedule_index = None
+    
+    def schedule_index(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> IntervalIndex:
+        """一次性事件和已安排待办的区间索引（建立一次，修改时增量维护）
+        
+        给出 start/end 时返回该窗口的子索引，并加入定期日程在窗口内的发生。
+        """
+        with self._lock:
+            data = self._read_json()
+            if self._schedule_index is None:
+                self._schedule_index = IntervalIndex.from_schedule(
+                    data["schedule"].get("upcoming", []),
+                    data["todos"].get("scheduled", [])
+                )
+            if start is None or end is None:
+                return self._schedule_index
+            return self._schedule_index.window(
+                start, end, expand_schedules(data["schedule"].get("regular", []), start, end)
+            )
+    
+    def flush(self):
+        """把尚未写入的修改作为一个事务追加到日志"""
+        with self._locked():
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            
+            # 上次读取后有其他进程写入（版本号已前进）时，先加载最新数据并在其上
+            # 重放未写入的操作（按ID定位或相对的操作），新事务的序号接在最新版本之后
+            if self._disk_signature() != self._disk_state:
+                self._load()
+            
+            entry = {"seq": self._seq + 1, "ts": get_current_time(), "ops": self._pending}
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+            with open(self.wal_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            
+            self._pending = []
+            self._seq += 1
+            self._wal_entries += 1
+            if self._cache is not None:
+                self._cache.setdefault("metadata", {})["wal_seq"] = self._seq
+            self._disk_state = self._disk_signature()
+            if self._wal_entries >= self.compact_after:
+                self.compact()
+    
+    def compact(self):
+        """把当前数据压缩为新快照并清空预写日志"""
+        with self._locked():
+            self.flush()
+            data = self._read_json()
+            self._write_snapshot(data, seq=self._seq)
+            with open(self.wal_file, 'w', encoding='utf-8'):
+                pass
+            self._wal_entries = 0
+            self._disk_state = self._disk_signature()
+    
+    def _write_snapshot(self, data: Dict[str, Any], seq: int):
+        """原子写入快照：写临时文件、fsync，再 os.replace 替换"""
+        data.setdefault("metadata", {})["wal_seq"] = seq
+        tmp = self.json_file.with_name(f"memory.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            # 使用缩进使 JSON 文件更易读
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.json_file)
+    
+    def _write_json(self, data: Dict[str, Any], invalidate_cache: bool = True):
+        """用 data 替换全部数据（写入新快照并清空日志）"""
+        with self._locked():
+            if self._disk_signature() != self._disk_state and self.json_file.exists():
+                self._load()  # 取得最新版本号，保证版本号单调递增
+            
+            # 未写入的修改已包含在 data 中（或被 data 整体替换）
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending = []
+            
+            # 更新最后更新时间
+            if "metadata" in data:
+                data["metadata"]["last_updated"] = get_current_time()
+            
+            self._seq += 1
+            self._write_snapshot(data, seq=self._seq)
+            with open(self.wal_file, 'w', encoding='utf-8'):
+                pass
+            self._wal_entries = 0
+            self._disk_state = self._disk_signature()
+            self._cache = None if invalidate_cache else data
+            self._schedule_index = None
     
     def batch_update(self, operations: List[Callable[[Dict], Dict]]):
-        """批量操作（原子性）
+        """批量操作（原子性：整个读取-修改-写入过程持有跨进程锁）
         
         Args:
             operations: 操作函数列表，每个函数接收data并返回修改后的data
         """
-        data = self._read_json(use_cache=False)
-        
-        try:
+        with self._locked():
+            data = copy.deepcopy(self._read_json(use_cache=False))
+            
             for op in operations:
                 data = op(data)
             self._write_json(data, invalidate_cache=True)
-        except Exception as e:
-            # 回滚：重新读取文件
-            self._cache = None
-            self._cache_timestamp = None
-            raise
     
     # ========== Profile 操作 ==========
     
     def update_profile(self, field: str, value: str):
         """更新个人档案基本信息"""
-        data = self._read_json()
-        data["profile"]["basic_info"][field] = value
-        self._write_json(data)
+        self._commit([{"op": "set", "path": ["profile", "basic_info", field], "value": value}])
     
     def update_preference(self, category: str, key: str, value: str):
         """更新偏好设置"""
@@ -187,13 +691,10 @@ class JsonMemoryStorage:
             self.update_profile(key, value)
             return
         
-        data = self._read_json()
-        
-        if category not in data["profile"]["preferences"]:
-            data["profile"]["preferences"][category] = {}
-        
-        data["profile"]["preferences"][category][key] = value
-        self._write_json(data)
+        # 分类不存在时 set 操作会自动创建
+        self._commit([
+            {"op": "set", "path": ["profile", "preferences", category, key], "value": value}
+        ])
     
     # ========== Todos 操作（重构：通过ID）==========
     
@@ -210,8 +711,6 @@ class JsonMemoryStorage:
         todo_id = generate_id("todo")
         now = get_current_time()
         
-        data = self._read_json()
-        
         todo_item = {
             "id": todo_id,
             "content": content,
@@ -225,10 +724,7 @@ class JsonMemoryStorage:
             "updated_at": now
         }
         
-        if status not in data["todos"]:
-            data["todos"][status] = []
-        data["todos"][status].append(todo_item)
-        self._write_json(data)
+        self._commit([{"op": "append", "path": ["todos", status], "value": todo_item}])
         
         return todo_id
     
@@ -243,6 +739,21 @@ class JsonMemoryStorage:
         
         return None
     
+    def _find_todo(
+        self,
+        todo_id: str,
+        statuses: Optional[List[str]] = None
+    ) -> tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """查找待办，返回 (状态, 待办)"""
+        data = self._read_json()
+        
+        for status in statuses or TODO_STATUSES:
+            for todo in data["todos"].get(status, []):
+                if todo.get("id") == todo_id:
+                    return status, todo
+        
+        return None, None
+    
     def find_todo_by_content(self, content: str) -> Optional[str]:
         """通过content查找ID（仅用于查询，不用于更新）"""
         data = self._read_json()
@@ -256,81 +767,63 @@ class JsonMemoryStorage:
     
     def update_todo(self, todo_id: str, **kwargs) -> bool:
         """更新待办（通过ID）"""
-        data = self._read_json()
-        
-        for status in ["pending", "scheduled", "in_progress", "completed"]:
-            for todo in data["todos"].get(status, []):
-                if todo.get("id") == todo_id:
-                    # 更新字段
-                    for key, value in kwargs.items():
-                        if key != "id":  # 不允许修改ID
-                            todo[key] = value
-                    todo["updated_at"] = get_current_time()
-                    self._write_json(data)
-                    return True
-        
-        return False
+        with self._locked():
+            status, todo = self._find_todo(todo_id)
+            if todo is None:
+                return False
+            
+            # 更新字段
+            fields = {key: value for key, value in kwargs.items() if key != "id"}  # 不允许修改ID
+            fields["updated_at"] = get_current_time()
+            self._commit([
+                {"op": "update", "path": ["todos", status], "id": todo_id, "fields": fields}
+            ])
+            return True
     
     def complete_todo(self, todo_id: str) -> bool:
         """完成待办（通过ID）"""
-        data = self._read_json()
         now = get_current_time()
         
-        for status in ["pending", "scheduled", "in_progress"]:
-            for todo in data["todos"].get(status, []):
-                if todo.get("id") == todo_id:
-                    todo["completed_at"] = now
-                    todo["updated_at"] = now
-                    # 移动到已完成列表
-                    data["todos"]["completed"].append(todo)
-                    data["todos"][status].remove(todo)
-                    self._write_json(data)
-                    return True
-        
-        return False
+        with self._locked():
+            status, todo = self._find_todo(todo_id, ["pending", "scheduled", "in_progress"])
+            if todo is None:
+                return False
+            
+            # 移动到已完成列表
+            completed = {**todo, "completed_at": now, "updated_at": now}
+            self._commit([
+                {"op": "remove", "path": ["todos", status], "id": todo_id},
+                {"op": "append", "path": ["todos", "completed"], "value": completed},
+            ])
+            return True
     
     def remove_todo(self, todo_id: str) -> bool:
         """删除待办（通过ID）"""
-        data = self._read_json()
-        
-        for status in ["pending", "scheduled", "in_progress", "completed"]:
-            data["todos"][status] = [
-                todo for todo in data["todos"].get(status, [])
-                if todo.get("id") != todo_id
-            ]
-        
-        self._write_json(data)
-        return True
+        with self._locked():
+            data = self._read_json()
+            
+            self._commit([
+                {"op": "remove", "path": ["todos", status], "id": todo_id}
+                for status in TODO_STATUSES
+                if any(todo.get("id") == todo_id for todo in data["todos"].get(status, []))
+            ])
+            return True
     
     def update_todo_status(self, todo_id: str, status: str) -> bool:
         """更新待办状态（pending/scheduled/in_progress/completed）"""
-        data = self._read_json()
-        
-        # 找到待办
-        todo = None
-        old_status = None
-        for s in ["pending", "scheduled", "in_progress", "completed"]:
-            for t in data["todos"].get(s, []):
-                if t.get("id") == todo_id:
-                    todo = t
-                    old_status = s
-                    break
-            if todo:
-                break
-        
-        if not todo:
-            return False
-        
-        # 移动到新状态
-        if old_status:
-            data["todos"][old_status].remove(todo)
-        if status not in data["todos"]:
-            data["todos"][status] = []
-        data["todos"][status].append(todo)
-        todo["updated_at"] = get_current_time()
-        
-        self._write_json(data)
-        return True
+        with self._locked():
+            # 找到待办
+            old_status, todo = self._find_todo(todo_id)
+            if todo is None:
+                return False
+            
+            # 移动到新状态
+            moved = {**todo, "updated_at": get_current_time()}
+            self._commit([
+                {"op": "remove", "path": ["todos", old_status], "id": todo_id},
+                {"op": "append", "path": ["todos", status], "value": moved},
+            ])
+            return True
     
     def schedule_todo(
         self,
@@ -340,53 +833,52 @@ class JsonMemoryStorage:
         reminder_minutes: int = 15
     ) -> bool:
         """为待办安排时间预算"""
-        data = self._read_json()
-        
-        # 找到待办
-        todo = None
-        old_status = None
-        for status in ["pending", "scheduled", "in_progress"]:
-            for t in data["todos"].get(status, []):
-                if t.get("id") == todo_id:
-                    todo = t
-                    old_status = status
-                    break
-            if todo:
-                break
-        
-        if not todo:
-            return False
-        
-        # 计算结束时间
-        start_dt = parse_datetime(start_time)
-        duration_minutes = parse_duration(duration)
-        end_dt = start_dt + timedelta(minutes=duration_minutes)
-        
-        # 更新待办
-        todo["scheduled_time"] = {
-            "start": start_time,
-            "end": format_datetime(end_dt),
-            "duration": duration
-        }
-        todo["reminder_minutes"] = reminder_minutes
-        todo["updated_at"] = get_current_time()
-        
-        # 移动到scheduled状态
-        if old_status and old_status != "scheduled":
-            data["todos"][old_status].remove(todo)
-        if "scheduled" not in data["todos"]:
-            data["todos"]["scheduled"] = []
-        data["todos"]["scheduled"].append(todo)
-        
-        # 创建提醒
-        self._create_reminder("todo", todo_id, start_time, reminder_minutes)
-        
-        # 创建询问任务
-        ask_at_dt = end_dt + timedelta(hours=1)  # 任务结束后1小时询问
-        self._create_followup("task_completion", todo_id, format_datetime(ask_at_dt))
-        
-        self._write_json(data)
-        return True
+        with self._locked():
+            # 找到待办
+            old_status, todo = self._find_todo(todo_id, ["pending", "scheduled", "in_progress"])
+            if todo is None:
+                return False
+            
+            # 计算结束时间
+            start_dt = parse_datetime(start_time)
+            duration_minutes = parse_duration(duration)
+            end_dt = start_dt + timedelta(minutes=duration_minutes)
+            
+            # 更新待办
+            fields = {
+                "scheduled_time": {
+                    "start": start_time,
+                    "end": format_datetime(end_dt),
+                    "duration": duration
+                },
+                "reminder_minutes": reminder_minutes,
+                "updated_at": get_current_time()
+            }
+            
+            # 移动到scheduled状态
+            if old_status == "scheduled":
+                ops = [{
+                    "op": "update", "path": ["todos", "scheduled"], "id": todo_id,
+                    "fields": fields
+                }]
+            else:
+                ops = [
+                    {"op": "remove", "path": ["todos", old_status], "id": todo_id},
+                    {"op": "append", "path": ["todos", "scheduled"], "value": {**todo, **fields}},
+                ]
+            
+            # 创建提醒
+            _, reminder = new_reminder("todo", todo_id, start_time, reminder_minutes)
+            ops.append({"op": "append", "path": ["reminders"], "value": reminder})
+            
+            # 创建询问任务
+            ask_at_dt = end_dt + timedelta(hours=1)  # 任务结束后1小时询问
+            _, followup = new_followup("task_completion", todo_id, format_datetime(ask_at_dt))
+            ops.append({"op": "append", "path": ["followups"], "value": followup})
+            
+            # 待办、提醒和询问在同一个事务中写入
+            self._commit(ops)
+            return True
     
     def query_todos(
         self,
@@ -445,8 +937,6 @@ class JsonMemoryStorage:
             end_dt = start_dt + timedelta(hours=1)
             end_time = format_datetime(end_dt)
         
-        data = self._read_json()
-        
         event = {
             "id": event_id,
             "title": title,
@@ -459,12 +949,12 @@ class JsonMemoryStorage:
             "created_at": now
         }
         
-        data["schedule"]["upcoming"].append(event)
-        
-        # 自动创建提醒
-        self._create_reminder("schedule", event_id, start_time, reminder_minutes)
-        
-        self._write_json(data)
+        # 自动创建提醒（与事件在同一个事务中写入）
+        _, reminder = new_reminder("schedule", event_id, start_time, reminder_minutes)
+        self._commit([
+            {"op": "append", "path": ["schedule", "upcoming"], "value": event},
+            {"op": "append", "path": ["reminders"], "value": reminder},
+        ])
         return event_id
     
     def add_recurring_schedule(
@@ -481,22 +971,20 @@ class JsonMemoryStorage:
         schedule_id = generate_id("recurring")
         now = get_current_time()
         
-        data = self._read_json()
-        
         event = {
             "id": schedule_id,
             "title": title,
             "time": start_time,
             "duration": duration,
             "frequency": frequency,
+            "rrule": rule.to_rrule() if (rule := RecurrenceRule.parse(frequency)) else None,
             "description": description,
             "end_date": end_date,
             "reminder_minutes": reminder_minutes,
             "created_at": now
         }
         
-        data["schedule"]["regular"].append(event)
-        self._write_json(data)
+        self._commit([{"op": "append", "path": ["schedule", "regular"], "value": event}])
         return schedule_id
     
     def get_schedule_event(self, event_id: str) -> Optional[Dict[str, Any]]:
@@ -519,27 +1007,27 @@ class JsonMemoryStorage:
         end_time: str,
         exclude_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """检测时间冲突"""
-        conflicts = []
-        data = self._read_json()
-        
-        # 检查一次性事件
-        for event in data["schedule"].get("upcoming", []):
-            if exclude_id and event.get("id") == exclude_id:
-                continue
-            if time_overlap(start_time, end_time, event["start_time"], event.get("end_time")):
-                conflicts.append(event)
-        
-        # 检查已安排的待办
-        for todo in data["todos"].get("scheduled", []):
-            if exclude_id and todo.get("id") == exclude_id:
-                continue
-            scheduled = todo.get("scheduled_time")
-            if scheduled:
-                if time_overlap(start_time, end_time, scheduled["start"], scheduled.get("end")):
-                    conflicts.append(todo)
-        
-        return conflicts
+        """检测时间冲突（一次性事件、已安排的待办和定期日程的发生，按开始时间排序）"""
+        start, end = parse_datetime(start_time), parse_datetime(end_time)
+        with self._lock:
+            overlapping = self.schedule_index(start, end).overlapping(start, end)
+        return [
+            item for item in overlapping
+            if not exclude_id or exclude_id not in (item.get("id"), item.get("recurring_id"))
+        ]
+    
+    def find_free_slots(
+        self,
+        start: datetime,
+        end: datetime,
+        duration_minutes: int,
+        limit: int = 5
+    ) -> List[tuple[datetime, datetime]]:
+        """查找 [start, end) 内每天 9:00-18:00 中不与事件、已安排待办和定期日程冲突的时间段"""
+        with self._lock:
+            return self.schedule_index(start, end).free_slots(
+                start, end, timedelta(minutes=duration_minutes), limit=limit
+            )
     
     # ========== 新增功能 ==========
     
@@ -560,8 +1048,6 @@ class JsonMemoryStorage:
         if not time:
             time = datetime.now().strftime("%H:%M")
         
-        data = self._read_json()
-        
         idea = {
             "id": idea_id,
             "content": content,
@@ -572,8 +1058,7 @@ class JsonMemoryStorage:
             "created_at": now
         }
         
-        data["ideas"].append(idea)
-        self._write_json(data)
+        self._commit([{"op": "append", "path": ["ideas"], "value": idea}])
         return idea_id
     
     def learn_schedule_preference(
@@ -584,30 +1069,27 @@ class JsonMemoryStorage:
         source: str = "explicit"
     ):
         """学习日程偏好"""
-        data = self._read_json()
-        
-        if "日程偏好" not in data["profile"]["preferences"]:
-            data["profile"]["preferences"]["日程偏好"] = {}
-        
-        preferences = data["profile"]["preferences"]["日程偏好"]
-        
-        if preference_type not in preferences:
-            preferences[preference_type] = {
-                "value": value,
-                "confidence": confidence,
-                "source": source,
-                "learned_at": get_current_time()
-            }
-        else:
+        with self._locked():
+            data = self._read_json()
+            
+            preferences = data["profile"]["preferences"].get("日程偏好", {})
+            existing = preferences.get(preference_type)
+            
             # 更新现有偏好（如果置信度更高）
-            existing = preferences[preference_type]
-            if confidence >= existing.get("confidence", 0):
-                existing["value"] = value
-                existing["confidence"] = confidence
-                existing["source"] = source
-                existing["learned_at"] = get_current_time()
-        
-        self._write_json(data)
+            if existing is not None and confidence < existing.get("confidence", 0):
+                return
+            
+            self._commit([{
+                "op": "set",
+                "path": ["profile", "preferences", "日程偏好", preference_type],
+                "value": {
+                    **(existing or {}),
+                    "value": value,
+                    "confidence": confidence,
+                    "source": source,
+                    "learned_at": get_current_time()
+                }
+            }])
     
     def _create_reminder(
         self,
@@ -617,31 +1099,10 @@ class JsonMemoryStorage:
         reminder_minutes: int
     ) -> str:
         """创建提醒任务（内部方法），返回ID"""
-        reminder_id = generate_id("reminder")
-        now = get_current_time()
-        
-        # 计算提醒时间
-        if isinstance(remind_at, str):
-            remind_dt = parse_datetime(remind_at) - timedelta(minutes=reminder_minutes)
-            remind_at_str = format_datetime(remind_dt)
-        else:
-            remind_at_str = remind_at
-        
-        data = self._read_json()
-        
-        reminder = {
-            "id": reminder_id,
-            "type": reminder_type,
-            "target_id": target_id,
-            "remind_at": remind_at_str,
-            "reminded": False,
-            "reminder_minutes": reminder_minutes,
-            "content": None,  # 可以后续生成
-            "created_at": now
-        }
-        
-        data["reminders"].append(reminder)
-        self._write_json(data)
+        reminder_id, reminder = new_reminder(
+            reminder_type, target_id, remind_at, reminder_minutes
+        )
+        self._commit([{"op": "append", "path": ["reminders"], "value": reminder}])
         return reminder_id
     
     def _create_followup(
@@ -652,26 +1113,8 @@ class JsonMemoryStorage:
         frequency: str = "after_task_time"
     ) -> str:
         """创建询问任务（内部方法），返回ID"""
-        followup_id = generate_id("followup")
-        now = get_current_time()
-        
-        data = self._read_json()
-        
-        followup = {
-            "id": followup_id,
-            "type": followup_type,
-            "target_id": target_id,
-            "ask_at": ask_at,
-            "asked": False,
-            "frequency": frequency,
-            "content": None,  # 可以后续生成
-            "created_at": now,
-            "last_asked_at": None,
-            "response_count": 0
-        }
-        
-        data["followups"].append(followup)
-        self._write_json(data)
+        followup_id, followup = new_followup(followup_type, target_id, ask_at, frequency)
+        self._commit([{"op": "append", "path": ["followups"], "value": followup}])
         return followup_id
     
     def get_pending_reminders(self, before: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -694,6 +1137,8 @@ class JsonMemoryStorage:
                 if remind_dt <= before_dt:
                     results.append(reminder)
         
+        # 定期日程的提醒（按发生时间展开，不预先写入 reminders）
+        results.extend(recurring_reminders(data["schedule"].get("regular", []), before_dt))
         return results
     
     def get_pending_followups(self, before: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -720,32 +1165,53 @@ class JsonMemoryStorage:
     
     def mark_reminder_triggered(self, reminder_id: str):
         """标记提醒已触发"""
-        data = self._read_json()
-        
-        for reminder in data.get("reminders", []):
-            if reminder.get("id") == reminder_id:
-                reminder["reminded"] = True
-                self._write_json(data)
+        with self._locked():
+            data = self._read_json()
+            
+            for reminder in data.get("reminders", []):
+                if reminder.get("id") == reminder_id:
+                    self._commit([{
+                        "op": "update", "path": ["reminders"], "id": reminder_id,
+                        "fields": {"reminded": True}
+                    }])
+                    return
+            
+            # 定期日程某次发生的提醒：记录已提醒到的发生时间
+            occurrence = parse_occurrence_reminder_id(reminder_id)
+            if not occurrence:
+                return
+            schedule_id, occurrence_start = occurrence
+            for schedule in data["schedule"].get("regular", []):
+                if schedule.get("id") != schedule_id:
+                    continue
+                reminded_until = advance_reminded_until(schedule, occurrence_start)
+                if reminded_until:
+                    self._commit([{
+                        "op": "update", "path": ["schedule", "regular"], "id": schedule_id,
+                        "fields": {"reminded_until": reminded_until}
+                    }])
                 return
     
     def mark_followup_asked(self, followup_id: str):
         """标记询问已询问"""
-        data = self._read_json()
-        now = get_current_time()
-        
-        for followup in data.get("followups", []):
-            if followup.get("id") == followup_id:
-                followup["asked"] = True
-                followup["last_asked_at"] = now
-                followup["response_count"] = followup.get("response_count", 0) + 1
-                self._write_json(data)
-                return
+        with self._locked():
+            data = self._read_json()
+            now = get_current_time()
+            
+            for followup in data.get("followups", []):
+                if followup.get("id") == followup_id:
+                    # 计数用相对操作，在其他进程的修改之上重放时仍然正确
+                    self._commit([{
+                        "op": "update", "path": ["followups"], "id": followup_id,
+                        "fields": {"asked": True, "last_asked_at": now},
+                        "incr": {"response_count": 1}
+                    }])
+                    return
     
     # ========== 其他操作 ==========
     
     def add_diary_entry(self, title: str, content: str):
         """添加日记条目"""
-        data = self._read_json()
         now = get_current_time()
         
         entry = {
@@ -754,16 +1220,14 @@ class JsonMemoryStorage:
             "created_at": now
         }
         
-        data["diary"].insert(0, entry)
-        
-        if len(data["diary"]) > 100:
-            data["diary"] = data["diary"][:100]
-        
-        self._write_json(data)
+        # 最多保留100条
+        self._commit([
+            {"op": "insert", "path": ["diary"], "index": 0, "value": entry},
+            {"op": "truncate", "path": ["diary"], "length": 100},
+        ])
     
     def learn_habit(self, habit: str, category: str = "工作习惯"):
         """学习新习惯"""
-        data = self._read_json()
         now = datetime.now().strftime("%Y-%m-%d")
         
         habit_item = {
@@ -771,16 +1235,10 @@ class JsonMemoryStorage:
             "learned_at": now
         }
         
-        if category not in data["habits"]:
-            data["habits"][category] = []
-        
-        data["habits"][category].append(habit_item)
-        self._write_json(data)
+        self._commit([{"op": "append", "path": ["habits", category], "value": habit_item}])
     
     def add_relationship(self, name: str, relation: str, details: str = ""):
         """添加人际关系"""
-        data = self._read_json()
-        
         relationship = {
             "name": name,
             "relation": relation,
@@ -788,12 +1246,12 @@ class JsonMemoryStorage:
             "created_at": get_current_time()
         }
         
-        data["relationships"]["contacts"].append(relationship)
-        self._write_json(data)
+        self._commit([
+            {"op": "append", "path": ["relationships", "contacts"], "value": relationship}
+        ])
     
     def add_conversation(self, topic: str, summary: List[str]):
         """添加对话摘要"""
-        data = self._read_json()
         now = datetime.now().strftime("%Y-%m-%d")
         
         conversation = {
@@ -802,107 +1260,20 @@ class JsonMemoryStorage:
             "summary": summary
         }
         
-        data["conversations"].insert(0, conversation)
-        
-        if len(data["conversations"]) > 50:
-            data["conversations"] = data["conversations"][:50]
-        
-        self._write_json(data)
+        # 最多保留50条
+        self._commit([
+            {"op": "insert", "path": ["conversations"], "index": 0, "value": conversation},
+            {"op": "truncate", "path": ["conversations"], "length": 50},
+        ])
     
     def get_context(self, sections: Optional[List[str]] = None) -> str:
         """获取记忆上下文（用于注入系统提示）"""
-        data = self._read_json()
-        context_parts = []
-        
-        if sections is None or "profile" in sections:
-            context_parts.append("## 👤 个人档案")
-            
-            basic_info = data["profile"]["basic_info"]
-            user_name = basic_info.get("姓名") or basic_info.get("昵称")
-            
-            if user_name:
-                context_parts.append(f"### ⭐ 用户姓名：**{user_name}**")
-                context_parts.append("")
-                context_parts.append("**重要**：这是你的主人。你只在打招呼或对话开始时称呼用户为：" + user_name + "，让用户知道你记得他们。之后正常交流即可，不需要频繁提及名字。")
-                context_parts.append("")
-            
-            context_parts.append("### 基本信息")
-            for key, value in basic_info.items():
-                if value:
-                    context_parts.append(f"- {key}：{value}")
-            context_parts.append("")
-            
-            preferences = data["profile"]["preferences"]
-            if preferences:
-                context_parts.append("### 偏好设置")
-                for category, items in list(preferences.items())[:3]:
-                    if items:
-                        context_parts.append(f"#### {category}")
-                        for key, value in list(items.items())[:3]:
-                            if value:
-                                context_parts.append(f"- {key}：{value}")
-                context_parts.append("")
-        
-        if sections is None or "todos" in sections:
-            all_todos = (
-                data["todos"].get("in_progress", []) +
-                data["todos"].get("scheduled", []) +
-                data["todos"].get("pending", [])
-            )
-            if all_todos:
-                context_parts.append("## 当前待办")
-                for todo in all_todos[:5]:
-                    priority_str = f"（优先级：{todo['priority']}）" if todo.get('priority') != 'medium' else ""
-                    due_str = f"，截止：{todo['due_date']}" if todo.get('due_date') else ""
-                    context_parts.append(f"- [ ] {todo['content']}{priority_str}{due_str}")
-                context_parts.append("")
-        
-        if sections is None or "habits" in sections:
-            habits = data["habits"]
-            if any(habits.values()):
-                context_parts.append("## 学习到的习惯")
-                for category, habit_list in habits.items():
-                    if habit_list:
-                        context_parts.append(f"### {category}")
-                        for habit_item in habit_list[-5:]:
-                            context_parts.append(f"- {habit_item['habit']}")
-                context_parts.append("")
-        
-        if sections is None or "schedule" in sections:
-            regular_schedules = data["schedule"].get("regular", [])
-            if regular_schedules:
-                context_parts.append("## 📅 定期日程")
-                for schedule in regular_schedules:
-                    desc_str = f"（{schedule['description']}）" if schedule.get('description') else ""
-                    context_parts.append(f"- **{schedule['title']}**：{schedule['time']}，{schedule['frequency']}{desc_str}")
-                context_parts.append("")
-            
-            upcoming_events = data["schedule"].get("upcoming", [])
-            if upcoming_events:
-                context_parts.append("## 📅 即将到来的事件")
-                for event in upcoming_events[:5]:
-                    end_str = f"-{event['end_time']}" if event.get('end_time') else ""
-                    desc_str = f"（{event['description']}）" if event.get('description') else ""
-                    context_parts.append(f"- **{event['title']}**：{event['start_time']}{end_str}{desc_str}")
-                context_parts.append("")
-        
-        if sections is None or "conversations" in sections:
-            conversations = data["conversations"]
-            if conversations:
-                context_parts.append("## 最近对话摘要")
-                for conv in conversations[:3]:
-                    context_parts.append(f"### {conv['date']} - {conv['topic']}")
-                    for point in conv['summary'][:3]:
-                        context_parts.append(f"  - {point}")
-                context_parts.append("")
-        
-        return "\n".join(context_parts)
+        return render_context(self._read_json(), sections)
     
     def increment_conversation_count(self):
         """增加对话计数"""
-        data = self._read_json()
-        data["metadata"]["conversation_count"] = data["metadata"].get("conversation_count", 0) + 1
-        self._write_json(data)
+        # 相对操作：多个进程同时计数时不会丢失
+        self._commit([{"op": "incr", "path": ["metadata", "conversation_count"], "by": 1}])
     
     # ========== 便捷访问方法 ==========
     
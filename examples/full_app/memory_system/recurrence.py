@@ -0,0 +1,419 @@
+"""
+周期性日程展开（RRULE 风格）
+
+定期日程的 frequency 是自由文本（"每天"、"工作日"、"每周一、三"、"每两周五"、
+"每月15号"……）或 RRULE 字符串（"FREQ=WEEKLY;BYDAY=MO,WE;INTERVAL=2"）。
+这里把它解析为 RecurrenceRule，只展开查询窗口内的发生时间（不从起点逐个
+枚举），展开结果按窗口缓存，供冲突检测、空闲时间查找和提醒共用的区间索引使用。
+"""
+
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .utils import format_datetime, parse_datetime, parse_duration
+
+RRULE_WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+CN_WEEKDAYS = {"一": 0, "二": 1, "三": 2, "四": 3, "五": 4, "六": 5, "日": 6, "天": 6}
+EN_WEEKDAYS = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+}
+CN_DIGITS = {
+    "零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+    "五": 5, "六": 6, "七": 7, "八": 8, "九": 9,
+}
+
+# 展开缓存的窗口数量上限
+EXPANSION_CACHE_SIZE = 256
+
+
+def _cn_number(text: str) -> Optional[int]:
+    """解析阿拉伯数字或中文数字（一 ~ 三十一）"""
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        value = (CN_DIGITS.get(tens, 0) if tens else 1) * 10
+        return value + (CN_DIGITS.get(ones, 0) if ones else 0)
+    return CN_DIGITS.get(text)
+
+
+def _parse_interval(text: str, lower: str) -> int:
+    """重复间隔："每两周"、"每隔3天"、"隔周"、"every 2 weeks"，默认为1"""
+    match = re.search(r"每隔?([0-9零一二两三四五六七八九十]+)个?(天|日|周|星期|礼拜|月)", text)
+    if match:
+        return _cn_number(match.group(1)) or 1
+    if "隔周" in text or "双周" in text or "biweekly" in lower:
+        return 2
+    match = re.search(r"every\s+(\d+)\s+(day|week|month)", lower)
+    return int(match.group(1)) if match else 1
+
+
+def _parse_monthdays(text: str, lower: str) -> Tuple[int, ...]:
+    """每月的某几号（"每月1号、15号"、"monthly on the 1st"），-1 表示最后一天"""
+    days = [
+        _cn_number(day)
+        for day in re.findall(r"([0-9一二三四五六七八九十]+)\s*[号日]", text.split("月", 1)[-1])
+    ]
+    days += [int(day) for day in re.findall(r"\b(\d{1,2})(?:st|nd|rd|th)\b", lower)]
+    if "最后一天" in text or "last day" in lower:
+        days.append(-1)
+    return tuple(sorted({day for day in days if day and -1 <= day <= 31}))
+
+
+def _parse_weekdays(text: str, lower: str) -> Tuple[int, ...]:
+    """指定的星期几（"每周一、三"、"周一至周五"、"每星期五"、"every mon and wed"）"""
+    weekdays = set()
+    for group in re.findall(
+        r"(?:周|星期|礼拜)"
+        r"([一二三四五六日天](?:\s*[、,，和及与/至到~\-]\s*(?:周|星期|礼拜)?[一二三四五六日天])*)",
+        text
+    ):
+        days = re.findall(r"[一二三四五六日天]|[至到~\-]", group)
+        for i, day in enumerate(days):
+            if day in "至到~-" and 0 < i < len(days) - 1:
+                weekdays.update(range(CN_WEEKDAYS[days[i - 1]], CN_WEEKDAYS[days[i + 1]] + 1))
+            elif day in CN_WEEKDAYS:
+                weekdays.add(CN_WEEKDAYS[day])
+    for name, day in EN_WEEKDAYS.items():
+        if re.search(rf"\b{name}", lower):
+            weekdays.add(day)
+    return tuple(sorted(weekdays))
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    """重复规则（RRULE 的 DAILY / WEEKLY / MONTHLY 子集）"""
+    
+    freq: str  # "DAILY" / "WEEKLY" / "MONTHLY"
+    interval: int = 1
+    by_weekday: Tuple[int, ...] = ()  # 0 = 周一
+    by_monthday: Tuple[int, ...] = ()  # -1 = 每月最后一天
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    
+    @classmethod
+    def parse(cls, text: Optional[str]) -> Optional[RecurrenceRule]:
+        """解析 RRULE 字符串或中英文频率描述，无法识别时返回 None"""
+        if not text:
+            return None
+        text = text.strip()
+        if text.upper().startswith(("RRULE:", "FREQ=")):
+            return cls._parse_rrule(text)
+        return cls._parse_text(text)
+    
+    @classmethod
+    def _parse_rrule(cls, text: str) -> Optional[RecurrenceRule]:
+        parts = {}
+        for part in text.upper().removeprefix("RRULE:").split(";"):
+            key, _, value = part.partition("=")
+            parts[key.strip()] = value.strip()
+        freq = parts.get("FREQ")
+        if freq not in ("DAILY", "WEEKLY", "MONTHLY"):
+            return None
+        try:
+            by_weekday = tuple(
+                sorted(RRULE_WEEKDAYS.index(day) for day in parts["BYDAY"].split(","))
+            ) if parts.get("BYDAY") else ()
+            by_monthday = tuple(
+                sorted(int(day) for day in parts["BYMONTHDAY"].split(","))
+            ) if parts.get("BYMONTHDAY") else ()
+            until = None
+            if parts.get("UNTIL"):
+                value = parts["UNTIL"].rstrip("Z")
+                until = datetime.strptime(value, "%Y%m%dT%H%M%S" if "T" in value else "%Y%m%d")
+                if "T" not in value:
+                    until = until.replace(hour=23, minute=59, second=59)
+            return cls(
+                freq=freq,
+                interval=max(int(parts.get("INTERVAL", 1)), 1),
+                by_weekday=by_weekday,
+                by_monthday=by_monthday,
+                count=int(parts["COUNT"]) if parts.get("COUNT") else None,
+                until=until,
+            )
+        except ValueError:
+            return None  # BYDAY=1MO 等暂不支持的写法
+    
+    @classmethod
+    def _parse_text(cls, text: str) -> Optional[RecurrenceRule]:
+        lower = text.lower()
+        interval = _parse_interval(text, lower)
+        
+        # 每月：某几号 / 最后一天
+        if "月" in text or "monthly" in lower or "month" in lower:
+            return cls("MONTHLY", interval, by_monthday=_parse_monthdays(text, lower))
+        
+        # 工作日 / 周末
+        if "工作日" in text or "weekday" in lower:
+            return cls("WEEKLY", interval, by_weekday=(0, 1, 2, 3, 4))
+        if "周末" in text or "weekend" in lower:
+            return cls("WEEKLY", interval, by_weekday=(5, 6))
+        
+        # 指定星期几
+        weekdays = _parse_weekdays(text, lower)
+        if weekdays:
+            return cls("WEEKLY", interval, by_weekday=weekdays)
+        
+        if re.search(r"周|星期|礼拜|week", lower):
+            return cls("WEEKLY", interval)
+        if re.search(r"天|日|daily|day", lower):
+            return cls("DAILY", interval)
+        return None
+    
+    def to_rrule(self) -> str:
+        """转换为 RRULE 字符串"""
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.by_weekday:
+            parts.append("BYDAY=" + ",".join(RRULE_WEEKDAYS[day] for day in self.by_weekday))
+        if self.by_monthday:
+            parts.append("BYMONTHDAY=" + ",".join(str(day) for day in self.by_monthday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%dT%H%M%S}")
+        return ";".join(parts)
+    
+    def occurrences(self, dtstart: datetime, start: datetime, end: datetime) -> Iterator[datetime]:
+        """按时间顺序生成 [start, end) 内的发生时间
+        
+        没有 COUNT 时直接跳到窗口所在的周期，开销只与窗口内的发生次数有关；
+        有 COUNT 时需要从 dtstart 开始计数（次数本身有上限）。
+        """
+        if self.until is not None:
+            end = min(end, self.until + timedelta(seconds=1))
+        seen = 0
+        first = dtstart if self.count is not None else max(dtstart, start)
+        for occurrence, valid in self._candidates(dtstart, first):
+            if occurrence >= end:
+                return
+            if not valid or occurrence < dtstart:
+                continue
+            seen += 1
+            if self.count is not None and seen > self.count:
+                return
+            if occurrence >= start:
+                yield occurrence
+    
+    def _candidates(self, dtstart: datetime, first: datetime) -> Iterator[Tuple[datetime, bool]]:
+        """从 first 所在周期开始，无限生成 (候选时间, 是否有效)（未按 dtstart 过滤）
+        
+        每个周期至少生成一个候选（无效时标记为 False），保证调用方总能遇到
+        窗口结束时间而停止，即使规则永远不会发生（如隔12个月的2月30日）。
+        """
+        if self.freq == "DAILY":
+            period = (first.date() - dtstart.date()).days // self.interval
+            day = dtstart + timedelta(days=period * self.interval)
+            while True:
+                yield day, not self.by_weekday or day.weekday() in self.by_weekday
+                day += timedelta(days=self.interval)
+        
+        elif self.freq == "WEEKLY":
+            weekdays = self.by_weekday or (dtstart.weekday(),)
+            anchor = dtstart - timedelta(days=dtstart.weekday())  # dtstart 所在周的周一
+            week = (first - anchor).days // 7 // self.interval * self.interval
+            while True:
+                monday = anchor + timedelta(weeks=week)
+                for weekday in weekdays:
+                    yield monday + timedelta(days=weekday), True
+                week += self.interval
+        
+        else:  # MONTHLY
+            monthdays = self.by_monthday or (dtstart.day,)
+            months = (first.year - dtstart.year) * 12 + first.month - dtstart.month
+            month = months // self.interval * self.interval
+            while True:
+                year, month_index = divmod(dtstart.month - 1 + month, 12)
+                first_of_month = dtstart.replace(
+                    year=dtstart.year + year, month=month_index + 1, day=1
+                )
+                next_month = (first_of_month + timedelta(days=32)).replace(day=1)
+                days_in_month = (next_month - first_of_month).days
+                # 跳过不存在的日期（如2月30日）
+                days = sorted({
+                    days_in_month if day == -1 else day
+                    for day in monthdays
+                    if 1 <= day <= days_in_month or day == -1
+                })
+                for day in days:
+                    yield first_of_month.replace(day=day), True
+                if not days:
+                    yield first_of_month, False
+                month += self.interval
+
+
+def schedule_rule(schedule: Dict[str, Any]) -> Optional[RecurrenceRule]:
+    """定期日程的重复规则（优先使用已解析的 rrule 字段），end_date 作为截止时间"""
+    rule = RecurrenceRule.parse(schedule.get("rrule") or schedule.get("frequency"))
+    if rule is None or not schedule.get("end_date") or rule.until is not None:
+        return rule
+    try:
+        until = parse_datetime(schedule["end_date"]).replace(hour=23, minute=59, second=59)
+    except ValueError:
+        return rule
+    return RecurrenceRule(
+        rule.freq, rule.interval, rule.by_weekday, rule.by_monthday, rule.count, until
+    )
+
+
+def schedule_start(schedule: Dict[str, Any]) -> Optional[datetime]:
+    """定期日程的首次发生时间：time 为完整日期时间时直接使用，
+    只有时刻（HH:MM）时取 start_date（没有时取创建日期）当天的该时刻"""
+    time_text = str(schedule.get("time") or "").strip()
+    try:
+        return parse_datetime(time_text)
+    except ValueError:
+        pass
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})(?::(\d{2}))?", time_text)
+    if not match:
+        return None
+    try:
+        base = parse_datetime(schedule.get("start_date") or schedule.get("created_at") or "")
+    except ValueError:
+        base = datetime(2000, 1, 1)
+    return base.replace(
+        hour=int(match.group(1)), minute=int(match.group(2)),
+        second=int(match.group(3) or 0), microsecond=0
+    )
+
+
+Occurrence = Tuple[Dict[str, Any], Tuple[datetime, datetime]]
+
+_expansions: OrderedDict[tuple, List[Occurrence]] = OrderedDict()
+
+
+def expand_schedule(schedule: Dict[str, Any], start: datetime, end: datetime) -> List[Occurrence]:
+    """展开一个定期日程在 [start, end) 内开始的所有发生
+    
+    返回 (发生, (开始, 结束)) 列表，发生的 ID 为 "<日程ID>@<YYYYMMDDTHHMM>"。
+    结果按 (日程内容, 窗口) 缓存，调用方不应修改返回的数据。
+    """
+    key = (
+        schedule.get("id"), schedule.get("rrule"), schedule.get("frequency"),
+        schedule.get("time"), schedule.get("start_date"), schedule.get("created_at"),
+        schedule.get("duration"), schedule.get("end_date"), schedule.get("title"),
+        start, end,
+    )
+    cached = _expansions.get(key)
+    if cached is not None:
+        _expansions.move_to_end(key)
+        return cached
+    
+    occurrences: List[Occurrence] = []
+    rule = schedule_rule(schedule)
+    dtstart = schedule_start(schedule)
+    if rule is not None and dtstart is not None and schedule.get("id"):
+        try:
+            length = timedelta(minutes=parse_duration(schedule.get("duration") or "1小时") or 60)
+        except ValueError:
+            length = timedelta(hours=1)
+        for occurrence_start in rule.occurrences(dtstart, start, end):
+            occurrence_end = occurrence_start + length
+            occurrences.append((
+                {
+                    "id": f"{schedule['id']}@{occurrence_start:%Y%m%dT%H%M}",
+                    "recurring_id": schedule["id"],
+                    "title": schedule.get("title"),
+                    "start_time": format_datetime(occurrence_start),
+                    "end_time": format_datetime(occurrence_end),
+                    "description": schedule.get("description", ""),
+                    "reminder_minutes": schedule.get("reminder_minutes", 15),
+                },
+                (occurrence_start, occurrence_end),
+            ))
+    
+    _expansions[key] = occurrences
+    while len(_expansions) > EXPANSION_CACHE_SIZE:
+        _expansions.popitem(last=False)
+    return occurrences
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def expand_schedules(
+    schedules: List[Dict[str, Any]],
+    start: datetime,
+    end: datetime
+) -> List[Occurrence]:
+    """展开多个定期日程在窗口内的发生（包括开始于窗口前、仍在进行中的发生）"""
+    # 向前多展开一天，覆盖跨过窗口开始时间的发生
+    expand_start = _day_start(start - timedelta(days=1))
+    occurrences: List[Occurrence] = []
+    for schedule in schedules:
+        for occurrence, (occurrence_start, occurrence_end) in expand_schedule(
+            schedule, expand_start, end
+        ):
+            if occurrence_end > start:
+                occurrences.append((occurrence, (occurrence_start, occurrence_end)))
+    return occurrences
+
+
+def recurring_reminders(
+    schedules: List[Dict[str, Any]],
+    before: datetime,
+    lookback: timedelta = timedelta(days=1)
+) -> List[Dict[str, Any]]:
+    """定期日程在 before 之前到期、尚未触发的提醒
+    
+    每个日程的 reminded_until 记录已提醒过的最后一次发生，
+    更早（超过 lookback）的发生不再补发提醒。
+    展开窗口按整天对齐后再按精确时间过滤，频繁轮询时命中 expand_schedule 的缓存。
+    """
+    reminders = []
+    for schedule in schedules:
+        minutes = schedule.get("reminder_minutes", 15) or 0
+        window_start = before - lookback
+        if schedule.get("reminded_until"):
+            with suppress(ValueError):
+                window_start = max(
+                    window_start, parse_datetime(schedule["reminded_until"]) + timedelta(seconds=1)
+                )
+        window_end = before + timedelta(minutes=minutes, seconds=1)
+        if window_start >= window_end:
+            continue
+        expand_start = _day_start(before - lookback)
+        expand_end = _day_start(window_end) + timedelta(days=1)
+        for occurrence, (occurrence_start, _) in expand_schedule(
+            schedule, expand_start, expand_end
+        ):
+            if not window_start <= occurrence_start < window_end:
+                continue
+            reminders.append({
+                "id": f"reminder_{occurrence['id']}",
+                "type": "recurring",
+                "target_id": schedule["id"],
+                "remind_at": format_datetime(occurrence_start - timedelta(minutes=minutes)),
+                "reminded": False,
+                "reminder_minutes": minutes,
+                "content": None,
+                "occurrence_start": occurrence["start_time"],
+            })
+    return reminders
+
+
+def advance_reminded_until(schedule: Dict[str, Any], occurrence_start: datetime) -> Optional[str]:
+    """标记某次发生已提醒后的 reminded_until；不晚于已记录的值时返回 None（不回退）"""
+    if schedule.get("reminded_until"):
+        with suppress(ValueError):
+            if parse_datetime(schedule["reminded_until"]) >= occurrence_start:
+                return None
+    return format_datetime(occurrence_start)
+
+
+def parse_occurrence_reminder_id(reminder_id: str) -> Optional[Tuple[str, datetime]]:
+    """从定期日程提醒的ID中取出 (日程ID, 发生时间)，不是这类ID时返回 None"""
+    match = re.fullmatch(r"reminder_(.+)@(\d{8}T\d{4})", reminder_id)
+    if not match:
+        return None
+    return match.group(1), datetime.strptime(match.group(2), "%Y%m%dT%H%M")
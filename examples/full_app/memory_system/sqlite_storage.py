@@ -0,0 +1,924 @@
+"""
+基于 SQLite 的记忆存储实现
+
+与 JsonMemoryStorage 接口相同，可在 MemorySystem 中通过 storage="sqlite" 选择。
+
+待办、日程事件、提醒、询问和创意各存一张表，按 ID、状态、截止日期、
+提醒时间和事件时间段建立索引，查询不再线性扫描整个 JSON，也不再逐行
+解析时间字符串（时间在写入时统一规范为 ISO 格式，可直接按字符串比较）。
+档案、习惯、对话摘要、日记和人际关系数据量小，按章节整体存为 JSON 文档。
+每个修改在一个 BEGIN IMMEDIATE 事务中读取并写回，多个进程共用同一个
+数据库时不会丢失更新。
+
+    memories/owner/
+      memory.db     # SQLite 数据库
+      memory.json   # 旧的 JSON 数据（首次打开时自动迁移，之后不再使用）
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .interval_index import IntervalIndex
+from .json_storage import (
+    TODO_STATUSES,
+    JsonMemoryStorage,
+    default_memory_data,
+    new_followup,
+    new_reminder,
+    render_context,
+)
+from .recurrence import (
+    RecurrenceRule,
+    advance_reminded_until,
+    expand_schedules,
+    parse_occurrence_reminder_id,
+    recurring_reminders,
+)
+from .utils import (
+    format_datetime,
+    format_duration,
+    generate_id,
+    get_current_time,
+    parse_datetime,
+    parse_duration,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    section TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS todos (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    content TEXT,
+    category TEXT,
+    due_date TEXT,
+    sched_start TEXT,
+    sched_end TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS todos_status ON todos (status);
+CREATE INDEX IF NOT EXISTS todos_due_date ON todos (due_date);
+CREATE INDEX IF NOT EXISTS todos_content ON todos (content);
+CREATE INDEX IF NOT EXISTS todos_schedule ON todos (status, sched_start, sched_end);
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    start_at TEXT,
+    end_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_range ON events (kind, start_at, end_at);
+CREATE TABLE IF NOT EXISTS reminders (
+    id TEXT PRIMARY KEY,
+    remind_at TEXT,
+    reminded INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reminders_due ON reminders (reminded, remind_at);
+CREATE TABLE IF NOT EXISTS followups (
+    id TEXT PRIMARY KEY,
+    ask_at TEXT,
+    asked INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS followups_due ON followups (asked, ask_at);
+CREATE TABLE IF NOT EXISTS ideas (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# 整体存为 JSON 文档的章节
+DOCUMENT_SECTIONS = ["profile", "habits", "conversations", "diary", "relationships", "metadata"]
+
+# 按 JSON 中的顺序返回待办：先按状态，再按插入顺序
+_STATUS_ORDER = "CASE status " + " ".join(
+    f"WHEN '{status}' THEN {i}" for i, status in enumerate(TODO_STATUSES)
+) + f" ELSE {len(TODO_STATUSES)} END, rowid"
+
+
+def _upsert_sql(table: str, columns: List[str]) -> str:
+    """按 id 插入或更新一行
+    
+    更新已有行时保留其 rowid，即保留在列表中的位置（与 JSON 中原地修改一致）；
+    INSERT OR REPLACE 会删除后重新插入，把修改过的条目移到末尾。
+    """
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != "id")
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {updates}"
+    )
+
+
+def _norm_time(value: Optional[str]) -> Optional[str]:
+    """把时间字符串规范为 ISO 格式，便于按字符串比较；无法解析时原样返回"""
+    if not value:
+        return None
+    try:
+        return format_datetime(parse_datetime(value))
+    except (TypeError, ValueError):
+        return value
+
+
+def _event_end(event: Dict[str, Any]) -> Optional[str]:
+    """事件结束时间（未提供时假设为开始时间后1小时，与 time_overlap 一致）"""
+    if event.get("end_time"):
+        return _norm_time(event["end_time"])
+    start = _norm_time(event.get("start_time"))
+    try:
+        return format_datetime(parse_datetime(start) + timedelta(hours=1)) if start else None
+    except ValueError:
+        return None
+
+
+class SqliteMemoryStorage:
+    """基于 SQLite 的记忆存储系统（接口与 JsonMemoryStorage 相同）"""
+    
+    def __init__(
+        self,
+        user_id: str = "owner",
+        memory_dir: str | Path = "./memories"
+    ):
+        self.user_id = user_id
+        self.memory_dir = Path(memory_dir)
+        
+        # 创建用户专属目录：memories/owner/
+        self.user_dir = self.memory_dir / user_id
+        self.user_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.db_file = self.user_dir / "memory.db"
+        self.json_file = self.user_dir / "memory.json"
+        
+        is_new = not self.db_file.exists()
+        self._lock = threading.RLock()
+        # 自行管理事务（见 _transaction），读取和写入在同一个事务中
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        
+        if is_new:
+            # 一次性迁移旧的 memory.json（包括其预写日志）
+            if self.json_file.exists():
+                self.set_all_data(JsonMemoryStorage(user_id, memory_dir).get_all_data())
+            else:
+                self.set_all_data(default_memory_data())
+    
+    def flush(self):
+        """与 JsonMemoryStorage 接口一致；每次修改都已在事务中提交，无需额外写入"""
+    
+    def close(self):
+        """关闭数据库连接"""
+        self._conn.close()
+    
+    # ========== 底层读写 ==========
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """执行查询，返回 data 列解析后的对象列表"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在一个事务中执行读取和写操作，并更新最后更新时间
+        
+        BEGIN IMMEDIATE 在读取前就取得写锁，其他进程（或同一目录上的其他实例）
+        的修改不会插在读取和写回之间，读-改-写不会丢失更新。
+        在事务中再次调用时并入外层事务。
+        """
+        with self._lock:
+            if self._conn.in_transaction:
+                return fn(self._conn)
+            
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                metadata = self._get_document("metadata") or {}
+                metadata["last_updated"] = get_current_time()
+                self._put_document(self._conn, "metadata", metadata)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+    
+    def _get_document(self, section: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE section = ?", (section,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    @staticmethod
+    def _put_document(conn: sqlite3.Connection, section: str, value: Any):
+        conn.execute(
+            "INSERT OR REPLACE INTO documents (section, data) VALUES (?, ?)",
+            (section, json.dumps(value, ensure_ascii=False)),
+        )
+    
+    def _update_document(self, section: str, fn: Callable[[Any], Any]):
+        """读取章节文档，用 fn 修改后写回（同一事务）"""
+        def write(conn: sqlite3.Connection):
+            value = self._get_document(section)
+            self._put_document(conn, section, fn(value))
+        
+        self._transaction(write)
+    
+    @staticmethod
+    def _put_todo(conn: sqlite3.Connection, status: str, todo: Dict[str, Any]):
+        scheduled = todo.get("scheduled_time") or {}
+        conn.execute(
+            _upsert_sql("todos", [
+                "id", "status", "content", "category", "due_date", "sched_start", "sched_end",
+                "data",
+            ]),
+            (
+                todo["id"], status, todo.get("content"), todo.get("category"),
+                todo.get("due_date"), _norm_time(scheduled.get("start")),
+                _norm_time(scheduled.get("end")), json.dumps(todo, ensure_ascii=False),
+            ),
+        )
+    
+    @staticmethod
+    def _put_event(conn: sqlite3.Connection, kind: str, event: Dict[str, Any]):
+        start = _norm_time(event.get("start_time")) if kind == "upcoming" else None
+        end = _event_end(event) if kind == "upcoming" else None
+        conn.execute(
+            _upsert_sql("events", ["id", "kind", "start_at", "end_at", "data"]),
+            (event["id"], kind, start, end, json.dumps(event, ensure_ascii=False)),
+        )
+    
+    @staticmethod
+    def _put_reminder(conn: sqlite3.Connection, reminder: Dict[str, Any]):
+        conn.execute(
+            _upsert_sql("reminders", ["id", "remind_at", "reminded", "data"]),
+            (
+                reminder["id"], _norm_time(reminder.get("remind_at")),
+                int(bool(reminder.get("reminded"))), json.dumps(reminder, ensure_ascii=False),
+            ),
+        )
+    
+    @staticmethod
+    def _put_followup(conn: sqlite3.Connection, followup: Dict[str, Any]):
+        conn.execute(
+            _upsert_sql("followups", ["id", "ask_at", "asked", "data"]),
+            (
+                followup["id"], _norm_time(followup.get("ask_at")),
+                int(bool(followup.get("asked"))), json.dumps(followup, ensure_ascii=False),
+            ),
+        )
+    
+    def batch_update(self, operations: List[Callable[[Dict], Dict]]):
+        """批量操作（原子性）
+        
+        Args:
+            operations: 操作函数列表，每个函数接收data并返回修改后的data
+        """
+        def write(conn: sqlite3.Connection):
+            data = self.get_all_data()
+            for op in operations:
+                data = op(data)
+            self.set_all_data(data)
+        
+        self._transaction(write)
+    
+    # ========== Profile 操作 ==========
+    
+    def update_profile(self, field: str, value: str):
+        """更新个人档案基本信息"""
+        def update(profile: Dict[str, Any]) -> Dict[str, Any]:
+            profile.setdefault("basic_info", {})[field] = value
+            return profile
+        
+        self._update_document("profile", update)
+    
+    def update_preference(self, category: str, key: str, value: str):
+        """更新偏好设置"""
+        if category == "基本信息":
+            self.update_profile(key, value)
+            return
+        
+        def update(profile: Dict[str, Any]) -> Dict[str, Any]:
+            profile.setdefault("preferences", {}).setdefault(category, {})[key] = value
+            return profile
+        
+        self._update_document("profile", update)
+    
+    # ========== Todos 操作 ==========
+    
+    def add_todo(
+        self,
+        content: str,
+        priority: str = "medium",
+        due_date: Optional[str] = None,
+        category: Optional[str] = None,
+        estimated_duration: Optional[str] = None,
+        status: str = "pending"
+    ) -> str:
+        """添加待办事项，返回ID"""
+        todo_id = generate_id("todo")
+        now = get_current_time()
+        
+        todo_item = {
+            "id": todo_id,
+            "content": content,
+            "priority": priority,
+            "category": category,
+            "estimated_duration": estimated_duration,
+            "due_date": due_date,
+            "scheduled_time": None,
+            "reminder_minutes": 15,
+            "created_at": now,
+            "updated_at": now
+        }
+        
+        self._transaction(lambda conn: self._put_todo(conn, status, todo_item))
+        return todo_id
+    
+    def _find_todo(
+        self,
+        todo_id: str,
+        statuses: Optional[List[str]] = None
+    ) -> tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """通过索引查找待办，返回 (状态, 待办)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, data FROM todos WHERE id = ?", (todo_id,)
+            ).fetchone()
+        if row is None or row[0] not in (statuses or TODO_STATUSES):
+            return None, None
+        return row[0], json.loads(row[1])
+    
+    def get_todo(self, todo_id: str) -> Optional[Dict[str, Any]]:
+        """通过ID获取待办"""
+        return self._find_todo(todo_id)[1]
+    
+    def find_todo_by_content(self, content: str) -> Optional[str]:
+        """通过content查找ID（仅用于查询，不用于更新）"""
+        statuses = ", ".join("?" * len(TODO_STATUSES))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id FROM todos WHERE content = ? AND status IN ({statuses}) "
+                f"ORDER BY {_STATUS_ORDER} LIMIT 1",
+                (content, *TODO_STATUSES),
+            ).fetchone()
+        return row[0] if row else None
+    
+    def update_todo(self, todo_id: str, **kwargs) -> bool:
+        """更新待办（通过ID）"""
+        def write(conn: sqlite3.Connection) -> bool:
+            status, todo = self._find_todo(todo_id)
+            if todo is None:
+                return False
+            
+            # 更新字段
+            for key, value in kwargs.items():
+                if key != "id":  # 不允许修改ID
+                    todo[key] = value
+            todo["updated_at"] = get_current_time()
+            self._put_todo(conn, status, todo)
+            return True
+        
+        return self._transaction(write)
+    
+    def _move_todo(self, todo: Dict[str, Any], status: str):
+        """把待办移动到 status 列表末尾（删除后重新插入，保持 JSON 中的顺序语义）"""
+        def move(conn: sqlite3.Connection):
+            conn.execute("DELETE FROM todos WHERE id = ?", (todo["id"],))
+            self._put_todo(conn, status, todo)
+        
+        self._transaction(move)
+    
+    def complete_todo(self, todo_id: str) -> bool:
+        """完成待办（通过ID）"""
+        def write(conn: sqlite3.Connection) -> bool:
+            _, todo = self._find_todo(todo_id, ["pending", "scheduled", "in_progress"])
+            if todo is None:
+                return False
+            
+            now = get_current_time()
+            todo["completed_at"] = now
+            todo["updated_at"] = now
+            # 移动到已完成列表
+            self._move_todo(todo, "completed")
+            return True
+        
+        return self._transaction(write)
+    
+    def remove_todo(self, todo_id: str) -> bool:
+        """删除待办（通过ID）"""
+        self._transaction(lambda conn: conn.execute("DELETE FROM todos WHERE id = ?", (todo_id,)))
+        return True
+    
+    def update_todo_status(self, todo_id: str, status: str) -> bool:
+        """更新待办状态（pending/scheduled/in_progress/completed）"""
+        def write(conn: sqlite3.Connection) -> bool:
+            _, todo = self._find_todo(todo_id)
+            if todo is None:
+                return False
+            
+            todo["updated_at"] = get_current_time()
+            self._move_todo(todo, status)
+            return True
+        
+        return self._transaction(write)
+    
+    def schedule_todo(
+        self,
+        todo_id: str,
+        start_time: str,
+        duration: str,
+        reminder_minutes: int = 15
+    ) -> bool:
+        """为待办安排时间预算"""
+        # 计算结束时间
+        start_dt = parse_datetime(start_time)
+        duration_minutes = parse_duration(duration)
+        end_dt = start_dt + timedelta(minutes=duration_minutes)
+        
+        _, reminder = new_reminder("todo", todo_id, start_time, reminder_minutes)
+        ask_at_dt = end_dt + timedelta(hours=1)  # 任务结束后1小时询问
+        _, followup = new_followup("task_completion", todo_id, format_datetime(ask_at_dt))
+        
+        # 读取待办并写入待办、提醒和询问在同一个事务中完成
+        def write(conn: sqlite3.Connection) -> bool:
+            old_status, todo = self._find_todo(todo_id, ["pending", "scheduled", "in_progress"])
+            if todo is None:
+                return False
+            
+            # 更新待办
+            todo["scheduled_time"] = {
+                "start": start_time,
+                "end": format_datetime(end_dt),
+                "duration": duration
+            }
+            todo["reminder_minutes"] = reminder_minutes
+            todo["updated_at"] = get_current_time()
+            
+            if old_status != "scheduled":
+                conn.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
+            self._put_todo(conn, "scheduled", todo)
+            self._put_reminder(conn, reminder)
+            self._put_followup(conn, followup)
+            return True
+        
+        return self._transaction(write)
+    
+    def query_todos(
+        self,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        due_before: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """查询待办（走 status / due_date 索引）"""
+        statuses = [status] if status else TODO_STATUSES
+        sql = f"SELECT data FROM todos WHERE status IN ({', '.join('?' * len(statuses))})"
+        params: list = list(statuses)
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        if due_before:
+            sql += " AND (due_date IS NULL OR due_date = '' OR due_date <= ?)"
+            params.append(due_before)
+        return self._query(f"{sql} ORDER BY {_STATUS_ORDER}", tuple(params))
+    
+    # ========== Schedule 操作 ==========
+    
+    def add_one_time_event(
+        self,
+        title: str,
+        start_time: str,
+        end_time: Optional[str] = None,
+        duration: Optional[str] = None,
+        description: str = "",
+        location: Optional[str] = None,
+        reminder_minutes: int = 15
+    ) -> str:
+        """添加一次性事件，返回ID"""
+        event_id = generate_id("event")
+        now = get_current_time()
+        
+        # 计算duration或end_time
+        start_dt = parse_datetime(start_time)
+        if end_time:
+            duration_minutes = int((parse_datetime(end_time) - start_dt).total_seconds() / 60)
+            duration = format_duration(duration_minutes)
+        elif duration:
+            end_time = format_datetime(start_dt + timedelta(minutes=parse_duration(duration)))
+        else:
+            duration = "1小时"
+            end_time = format_datetime(start_dt + timedelta(hours=1))
+        
+        event = {
+            "id": event_id,
+            "title": title,
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration": duration,
+            "description": description,
+            "location": location,
+            "reminder_minutes": reminder_minutes,
+            "created_at": now
+        }
+        
+        # 自动创建提醒（与事件在同一个事务中写入）
+        _, reminder = new_reminder("schedule", event_id, start_time, reminder_minutes)
+        
+        def write(conn: sqlite3.Connection):
+            self._put_event(conn, "upcoming", event)
+            self._put_reminder(conn, reminder)
+        
+        self._transaction(write)
+        return event_id
+    
+    def add_recurring_schedule(
+        self,
+        title: str,
+        start_time: str,
+        duration: str,
+        frequency: str,
+        description: str = "",
+        end_date: Optional[str] = None,
+        reminder_minutes: int = 15
+    ) -> str:
+        """添加周期性日程，返回ID"""
+        schedule_id = generate_id("recurring")
+        
+        event = {
+            "id": schedule_id,
+            "title": title,
+            "time": start_time,
+            "duration": duration,
+            "frequency": frequency,
+            "rrule": rule.to_rrule() if (rule := RecurrenceRule.parse(frequency)) else None,
+            "description": description,
+            "end_date": end_date,
+            "reminder_minutes": reminder_minutes,
+            "created_at": get_current_time()
+        }
+        
+        self._transaction(lambda conn: self._put_event(conn, "regular", event))
+        return schedule_id
+    
+    def get_schedule_event(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """通过ID获取日程事件"""
+        rows = self._query("SELECT data FROM events WHERE id = ?", (event_id,))
+        return rows[0] if rows else None
+    
+    def check_time_conflict(
+        self,
+        start_time: str,
+        end_time: str,
+        exclude_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """检测时间冲突（按时间段索引做区间查询，包括定期日程的发生，按开始时间排序）"""
+        start, end = parse_datetime(start_time), parse_datetime(end_time)
+        overlapping = self.schedule_index(start, end).overlapping(start, end)
+        return [
+            item for item in overlapping
+            if not exclude_id or exclude_id not in (item.get("id"), item.get("recurring_id"))
+        ]
+    
+    def schedule_index(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> IntervalIndex:
+        """[start, end) 内一次性事件、已安排待办和定期日程发生的区间索引
+        
+        按时间段索引查询后建立。
+        """
+        events_sql = "SELECT data FROM events WHERE kind = 'upcoming'"
+        todos_sql = "SELECT data FROM todos WHERE status = 'scheduled'"
+        params: tuple = ()
+        if start is not None and end is not None:
+            events_sql += " AND start_at < ? AND end_at > ?"
+            todos_sql += " AND sched_start < ? AND sched_end > ?"
+            params = (format_datetime(end), format_datetime(start))
+        index = IntervalIndex.from_schedule(
+            self._query(events_sql, params), self._query(todos_sql, params)
+        )
+        if start is None or end is None:
+            return index
+        return index.window(start, end, expand_schedules(self._regular_schedules(), start, end))
+    
+    def _regular_schedules(self) -> List[Dict[str, Any]]:
+        return self._query("SELECT data FROM events WHERE kind = 'regular' ORDER BY rowid")
+    
+    def find_free_slots(
+        self,
+        start: datetime,
+        end: datetime,
+        duration_minutes: int,
+        limit: int = 5
+    ) -> List[tuple[datetime, datetime]]:
+        """查找 [start, end) 内每天 9:00-18:00 中不与事件、已安排待办和定期日程冲突的时间段"""
+        return self.schedule_index(start, end).free_slots(
+            start, end, timedelta(minutes=duration_minutes), limit=limit
+        )
+    
+    # ========== 新增功能 ==========
+    
+    def add_idea(
+        self,
+        content: str,
+        date: Optional[str] = None,
+        time: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        category: Optional[str] = None
+    ) -> str:
+        """添加创意想法，返回ID"""
+        idea_id = generate_id("idea")
+        
+        idea = {
+            "id": idea_id,
+            "content": content,
+            "date": date or datetime.now().strftime("%Y-%m-%d"),
+            "time": time or datetime.now().strftime("%H:%M"),
+            "tags": tags or [],
+            "category": category,
+            "created_at": get_current_time()
+        }
+        
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO ideas (id, data) VALUES (?, ?)",
+            (idea_id, json.dumps(idea, ensure_ascii=False)),
+        ))
+        return idea_id
+    
+    def learn_schedule_preference(
+        self,
+        preference_type: str,
+        value: str,
+        confidence: float = 1.0,
+        source: str = "explicit"
+    ):
+        """学习日程偏好"""
+        def update(profile: Dict[str, Any]) -> Dict[str, Any]:
+            preferences = profile.setdefault("preferences", {}).setdefault("日程偏好", {})
+            existing = preferences.get(preference_type)
+            # 更新现有偏好（如果置信度更高）
+            if existing is None or confidence >= existing.get("confidence", 0):
+                preferences[preference_type] = {
+                    **(existing or {}),
+                    "value": value,
+                    "confidence": confidence,
+                    "source": source,
+                    "learned_at": get_current_time()
+                }
+            return profile
+        
+        self._update_document("profile", update)
+    
+    def _create_reminder(
+        self,
+        reminder_type: str,
+        target_id: str,
+        remind_at: str,
+        reminder_minutes: int
+    ) -> str:
+        """创建提醒任务（内部方法），返回ID"""
+        reminder_id, reminder = new_reminder(reminder_type, target_id, remind_at, reminder_minutes)
+        self._transaction(lambda conn: self._put_reminder(conn, reminder))
+        return reminder_id
+    
+    def _create_followup(
+        self,
+        followup_type: str,
+        target_id: str,
+        ask_at: str,
+        frequency: str = "after_task_time"
+    ) -> str:
+        """创建询问任务（内部方法），返回ID"""
+        followup_id, followup = new_followup(followup_type, target_id, ask_at, frequency)
+        self._transaction(lambda conn: self._put_followup(conn, followup))
+        return followup_id
+    
+    def get_pending_reminders(self, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取待触发的提醒（走 remind_at 索引），包括定期日程按发生时间展开的提醒"""
+        before = _norm_time(before) or get_current_time()
+        reminders = self._query(
+            "SELECT data FROM reminders WHERE reminded = 0 AND remind_at <= ? ORDER BY rowid",
+            (before,),
+        )
+        return reminders + recurring_reminders(self._regular_schedules(), parse_datetime(before))
+    
+    def get_pending_followups(self, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取待触发的询问（走 ask_at 索引）"""
+        before = _norm_time(before) or get_current_time()
+        return self._query(
+            "SELECT data FROM followups WHERE asked = 0 AND ask_at <= ? ORDER BY rowid",
+            (before,),
+        )
+    
+    def mark_reminder_triggered(self, reminder_id: str):
+        """标记提醒已触发"""
+        def write(conn: sqlite3.Connection):
+            rows = self._query("SELECT data FROM reminders WHERE id = ?", (reminder_id,))
+            if rows:
+                rows[0]["reminded"] = True
+                self._put_reminder(conn, rows[0])
+                return
+            
+            # 定期日程某次发生的提醒：记录已提醒到的发生时间
+            occurrence = parse_occurrence_reminder_id(reminder_id)
+            schedule = self.get_schedule_event(occurrence[0]) if occurrence else None
+            reminded_until = advance_reminded_until(schedule, occurrence[1]) if schedule else None
+            if reminded_until:
+                schedule["reminded_until"] = reminded_until
+                self._put_event(conn, "regular", schedule)
+        
+        self._transaction(write)
+    
+    def mark_followup_asked(self, followup_id: str):
+        """标记询问已询问"""
+        def write(conn: sqlite3.Connection):
+            rows = self._query("SELECT data FROM followups WHERE id = ?", (followup_id,))
+            if rows:
+                followup = rows[0]
+                followup["asked"] = True
+                followup["last_asked_at"] = get_current_time()
+                followup["response_count"] = followup.get("response_count", 0) + 1
+                self._put_followup(conn, followup)
+        
+        self._transaction(write)
+    
+    # ========== 其他操作 ==========
+    
+    def add_diary_entry(self, title: str, content: str):
+        """添加日记条目"""
+        entry = {
+            "title": title,
+            "content": content,
+            "created_at": get_current_time()
+        }
+        # 最多保留100条
+        self._update_document("diary", lambda diary: [entry, *(diary or [])][:100])
+    
+    def learn_habit(self, habit: str, category: str = "工作习惯"):
+        """学习新习惯"""
+        habit_item = {
+            "habit": habit,
+            "learned_at": datetime.now().strftime("%Y-%m-%d")
+        }
+        
+        def update(habits: Dict[str, Any]) -> Dict[str, Any]:
+            habits = habits or {}
+            habits.setdefault(category, []).append(habit_item)
+            return habits
+        
+        self._update_document("habits", update)
+    
+    def add_relationship(self, name: str, relation: str, details: str = ""):
+        """添加人际关系"""
+        relationship = {
+            "name": name,
+            "relation": relation,
+            "details": details,
+            "created_at": get_current_time()
+        }
+        
+        def update(relationships: Dict[str, Any]) -> Dict[str, Any]:
+            relationships = relationships or {"contacts": [], "important": []}
+            relationships.setdefault("contacts", []).append(relationship)
+            return relationships
+        
+        self._update_document("relationships", update)
+    
+    def add_conversation(self, topic: str, summary: List[str]):
+        """添加对话摘要"""
+        conversation = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "topic": topic,
+            "summary": summary
+        }
+        # 最多保留50条
+        self._update_document(
+            "conversations", lambda conversations: [conversation, *(conversations or [])][:50]
+        )
+    
+    def get_context(self, sections: Optional[List[str]] = None) -> str:
+        """获取记忆上下文（用于注入系统提示）
+        
+        只读取上下文用到的数据：每种状态最多5条待办、最多5个即将到来的事件。
+        """
+        todos: Dict[str, List[Dict[str, Any]]] = {}
+        for status in ["in_progress", "scheduled", "pending"]:
+            todos[status] = self._query(
+                "SELECT data FROM todos WHERE status = ? ORDER BY rowid LIMIT 5", (status,)
+            )
+        data = {
+            "profile": self._get_document("profile") or {"basic_info": {}, "preferences": {}},
+            "todos": todos,
+            "habits": self._get_document("habits") or {},
+            "schedule": {
+                "regular": self._query(
+                    "SELECT data FROM events WHERE kind = 'regular' ORDER BY rowid"
+                ),
+                "upcoming": self._query(
+                    "SELECT data FROM events WHERE kind = 'upcoming' ORDER BY rowid LIMIT 5"
+                ),
+            },
+            "conversations": self._get_document("conversations") or [],
+        }
+        return render_context(data, sections)
+    
+    def increment_conversation_count(self):
+        """增加对话计数"""
+        def update(metadata: Dict[str, Any]) -> Dict[str, Any]:
+            metadata = metadata or {}
+            metadata["conversation_count"] = metadata.get("conversation_count", 0) + 1
+            return metadata
+        
+        self._update_document("metadata", update)
+    
+    # ========== 便捷访问方法 ==========
+    
+    @property
+    def json_path(self) -> Path:
+        """获取存储文件路径（SQLite 数据库）"""
+        return self.db_file
+    
+    def get_all_data(self) -> Dict[str, Any]:
+        """获取所有数据（与 memory.json 结构相同，用于调试或导出）"""
+        data: Dict[str, Any] = {}
+        for section in DOCUMENT_SECTIONS:
+            data[section] = self._get_document(section)
+        
+        data["todos"] = {status: [] for status in TODO_STATUSES}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT status, data FROM todos ORDER BY {_STATUS_ORDER}"
+            ).fetchall()
+        for status, row in rows:
+            data["todos"].setdefault(status, []).append(json.loads(row))
+        
+        data["schedule"] = {
+            kind: self._query("SELECT data FROM events WHERE kind = ? ORDER BY rowid", (kind,))
+            for kind in ["regular", "upcoming"]
+        }
+        data["reminders"] = self._query("SELECT data FROM reminders ORDER BY rowid")
+        data["followups"] = self._query("SELECT data FROM followups ORDER BY rowid")
+        data["ideas"] = self._query("SELECT data FROM ideas ORDER BY rowid")
+        return data
+    
+    def set_all_data(self, data: Dict[str, Any]):
+        """设置所有数据（用于导入或迁移，整体替换）"""
+        defaults = default_memory_data()
+        
+        def write(conn: sqlite3.Connection):
+            for table in ["documents", "todos", "events", "reminders", "followups", "ideas"]:
+                conn.execute(f"DELETE FROM {table}")
+            for section in DOCUMENT_SECTIONS:
+                self._put_document(conn, section, data.get(section, defaults[section]))
+            for status, todos in data.get("todos", {}).items():
+                for i, todo in enumerate(todos):
+                    self._put_todo(conn, status, _with_id(todo, f"todo_{status}", i))
+            for kind in ["regular", "upcoming"]:
+                for i, event in enumerate(data.get("schedule", {}).get(kind, [])):
+                    self._put_event(conn, kind, _with_id(event, f"event_{kind}", i))
+            for i, reminder in enumerate(data.get("reminders", [])):
+                self._put_reminder(conn, _with_id(reminder, "reminder", i))
+            for i, followup in enumerate(data.get("followups", [])):
+                self._put_followup(conn, _with_id(followup, "followup", i))
+            for i, idea in enumerate(data.get("ideas", [])):
+                idea = _with_id(idea, "idea", i)
+                conn.execute(
+                    "INSERT OR REPLACE INTO ideas (id, data) VALUES (?, ?)",
+                    (idea["id"], json.dumps(idea, ensure_ascii=False)),
+                )
+        
+        self._transaction(write)
+
+
+def _with_id(item: Dict[str, Any], prefix: str, index: int) -> Dict[str, Any]:
+    """旧数据中缺少ID的条目补一个唯一ID"""
+    if item.get("id"):
+        return item
+    return {**item, "id": f"{generate_id(prefix)}_{index}"}
+
+
+def migrate_json_to_sqlite(memory_dir: str | Path = "./memories") -> List[str]:
+    """把 memory_dir 下所有用户的 memory.json 一次性迁移到 SQLite
+    
+    已有 memory.db 的用户会被跳过；memory.json 保持不变，可作为备份。
+    
+    Returns:
+        本次迁移的用户ID列表
+    """
+    migrated = []
+    for user_dir in sorted(Path(memory_dir).iterdir()):
+        if not (user_dir / "memory.json").exists() or (user_dir / "memory.db").exists():
+            continue
+        SqliteMemoryStorage(user_dir.name, memory_dir).close()
+        migrated.append(user_dir.name)
+    return migrated
@@ -38,6 +38,7 @@ def parse_datetime(dt_str: str) -> datetime:
     # 支持多种格式
     formats = [
         "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S.%f",  # get_current_time() 的格式
         "%Y-%m-%d %H:%M:%S",
         "%Y-%m-%dT%H:%M",
         "%Y-%m-%d %H:%M",
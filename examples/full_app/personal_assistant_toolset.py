@@ -23,14 +23,15 @@ except ImportError:
 
 from datetime import timedelta
 
-from memory_system.core import MemorySystem
-from memory_system.utils import get_current_date, get_current_time, parse_datetime, parse_duration, time_overlap
+from memory_system.core import MemorySystem, get_shared_memory_system
+from memory_system.utils import get_current_date, get_current_time, parse_datetime, parse_duration
 
 
 def create_personal_assistant_toolset(
     memory_dir: str = "./memories",
     id: str = "personal_assistant",
     fixed_user_id: Optional[str] = None,
+    flush_interval: Optional[float] = None,
 ) -> FunctionToolset[DepsType]:
     """创建个人助手工具集
     
@@ -38,6 +39,7 @@ def create_personal_assistant_toolset(
         memory_dir: 记忆文件存储目录
         id: 工具集 ID
         fixed_user_id: 固定用户 ID（用于单用户私人助手）
+        flush_interval: 记忆延迟写入间隔（秒），None 表示每次修改立即写入
     
     Returns:
         FunctionToolset 实例
@@ -62,9 +64,10 @@ def create_personal_assistant_toolset(
         return "default_user"
     
     def get_memory_system(ctx: RunContext[DepsType]) -> MemorySystem:
-        """获取或创建记忆系统实例"""
-        user_id = get_user_id(ctx)
-        return MemorySystem(user_id=user_id, memory_dir=memory_dir)
+        """获取记忆系统实例（每个用户在进程内共享一个）"""
+        return get_shared_memory_system(
+            user_id=get_user_id(ctx), memory_dir=memory_dir, flush_interval=flush_interval
+        )
     
     # ========== 个性化学习模块 ==========
     
@@ -624,7 +627,8 @@ def create_personal_assistant_toolset(
         Args:
             title: 日程标题
             time: 时间（格式：HH:MM）
-            frequency: 频率（每天、工作日、每周一、每周五等）
+            frequency: 频率（每天、工作日、每周一、每两周五、每月15号等，也可以是 RRULE 如
+                "FREQ=WEEKLY;BYDAY=MO,WE"）
             description: 描述
             duration: 持续时间（如 "30分钟"）
             reminder_minutes: 提前提醒的分钟数
@@ -714,73 +718,25 @@ def create_personal_assistant_toolset(
             end_date: 结束日期（格式：YYYY-MM-DD），默认一周后
         """
         memory_sys = get_memory_system(ctx)
-        data = memory_sys.get_all_data()
         
         today = get_current_date()
         start_date = start_date or today
         
-        from datetime import timedelta
+        start_dt = parse_datetime(start_date + " 00:00:00")
         if end_date:
             end_dt = parse_datetime(end_date + " 00:00:00")
         else:
-            end_dt = parse_datetime(start_date + " 00:00:00") + timedelta(days=7)
-        
-        # 获取所有日程
-        schedule = data.get("schedule", {})
-        all_events = []
-        
-        # 定期日程（需要展开）
-        for regular in schedule.get("regular", []):
-            # 简化：只检查今天到结束日期之间的工作日
-            # 实际应该根据 frequency 展开
-            pass
-        
-        # 一次性事件
-        for event in schedule.get("upcoming", []):
-            start_time = event.get("start_time")
-            end_time = event.get("end_time")
-            if start_time and end_time:
-                all_events.append({
-                    "start": parse_datetime(start_time),
-                    "end": parse_datetime(end_time)
-                })
-        
-        # 查找可用时间段（简化版：每天9:00-18:00，每小时检查）
-        current_dt = parse_datetime(start_date + " 09:00:00")
-        available_slots = []
-        
-        while current_dt < end_dt:
-            # 检查这个时间段是否可用
-            slot_end = current_dt + timedelta(minutes=duration_minutes)
-            
-            # 检查是否在工作时间内（9:00-18:00）
-            if current_dt.hour >= 9 and slot_end.hour <= 18:
-                # 检查是否与已有事件冲突
-                conflict = False
-                for event in all_events:
-                    if time_overlap(
-                        current_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        slot_end.strftime("%Y-%m-%d %H:%M:%S"),
-                        event["start"].strftime("%Y-%m-%d %H:%M:%S"),
-                        event["end"].strftime("%Y-%m-%d %H:%M:%S")
-                    ):
-                        conflict = True
-                        break
-                
-                if not conflict:
-                    available_slots.append({
-                        "start": current_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        "end": slot_end.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                    if len(available_slots) >= 5:  # 最多返回5个
-                        break
-            
-            # 下一个时间段（每小时）
-            current_dt += timedelta(hours=1)
-            
-            # 如果超过一天，重置到第二天9点
-            if current_dt.hour >= 18:
-                current_dt = current_dt.replace(hour=9, minute=0, second=0) + timedelta(days=1)
+            end_dt = start_dt + timedelta(days=7)
+        
+        # 在合并后的忙碌区间（一次性事件、已安排的待办和按频率展开的定期日程）之间查找，
+        # 每天 9:00-18:00
+        available_slots = [
+            {
+                "start": slot_start.strftime("%Y-%m-%d %H:%M:%S"),
+                "end": slot_end.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            for slot_start, slot_end in memory_sys.find_free_slots(start_dt, end_dt, duration_minutes)
+        ]
         
         if not available_slots:
             return f"在 {start_date} 到 {end_date or '一周后'} 之间未找到可用时间段"
@@ -103,6 +103,21 @@ export default function ChatPanel({ sessionId, onFileClick }) {
         }
         break;
 
+      case 'subagent_event':
+        // Live progress of a running `task` subagent, shown inside its tool card
+        if (currentToolsRef.current && currentToolsRef.current.status === 'running') {
+          const tool = currentToolsRef.current;
+          if (data.kind === 'text') {
+            tool.output = (tool.output || '') + data.content;
+          } else if (data.kind === 'tool_call') {
+            tool.output = (tool.output || '') + `\n[${data.subagent_type}] → ${data.tool_name}\n`;
+          } else if (data.kind === 'aborted') {
+            tool.output = (tool.output || '') + `\n[${data.subagent_type}] stopped: ${data.content}\n`;
+          }
+          setMessages(prev => [...prev]);
+        }
+        break;
+
       case 'text_delta':
         if (currentMessageRef.current) {
           streamedTextRef.current += data.content;
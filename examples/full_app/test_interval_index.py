@@ -0,0 +1,227 @@
+"""
+IntervalIndex 日程区间索引测试
+
+在 examples/full_app 目录下运行：
+    python -m pytest test_interval_index.py
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from memory_system.interval_index import IntervalIndex, event_interval, todo_interval
+from memory_system.json_storage import JsonMemoryStorage
+
+MONDAY = datetime(2025, 1, 6)
+
+
+def _at(hour, minute=0, day=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def _index(*intervals):
+    """由 (ID, 开始, 结束) 建立索引"""
+    return IntervalIndex.from_intervals(
+        ({"id": item_id}, (start, end)) for item_id, start, end in intervals
+    )
+
+
+def _ids(items):
+    return [item["id"] for item in items]
+
+
+class TestIntervals:
+    """测试从事件和待办取时间段"""
+
+    def test_event_interval(self):
+        """测试事件时间段，没有结束时间时默认1小时"""
+        assert event_interval(
+            {"start_time": "2025-01-06 10:00", "end_time": "2025-01-06 10:30"}
+        ) == (_at(10), _at(10, 30))
+        assert event_interval({"start_time": "2025-01-06 10:00"}) == (_at(10), _at(11))
+        assert event_interval({"start_time": "不是时间"}) is None
+        assert event_interval({}) is None
+
+    def test_todo_interval(self):
+        """测试已安排待办的时间段，未安排时为 None"""
+        todo = {"scheduled_time": {"start": "2025-01-06 10:00", "end": "2025-01-06 12:00"}}
+        assert todo_interval(todo) == (_at(10), _at(12))
+        assert todo_interval({"scheduled_time": None}) is None
+
+
+class TestOverlapping:
+    """测试重叠查询"""
+
+    def test_half_open_boundaries(self):
+        """测试区间为左闭右开：首尾相接不算重叠"""
+        index = _index(("a", _at(9), _at(10)), ("b", _at(10), _at(11)))
+
+        assert _ids(index.overlapping(_at(10), _at(10, 30))) == ["b"]
+        assert _ids(index.overlapping(_at(9, 30), _at(10, 30))) == ["a", "b"]
+        assert index.overlapping(_at(11), _at(12)) == []
+
+    def test_long_interval_before_window(self):
+        """测试开始得很早、仍在进行中的长区间也能查到"""
+        index = _index(("all_day", _at(0), _at(23)), ("short", _at(8), _at(8, 15)))
+
+        assert _ids(index.overlapping(_at(15), _at(16))) == ["all_day"]
+
+    def test_long_interval_keeps_queries_bounded(self):
+        """测试一个很长的区间不会让查询扫描它开始以来的所有短区间"""
+        intervals = [(f"e{day}", _at(10, day=day), _at(11, day=day)) for day in range(365)]
+        index = _index(("trip", _at(0), _at(0, day=365)), *intervals)
+        query = (_at(10, 30, day=200), _at(12, day=200))
+
+        assert _ids(index.overlapping(*query)) == ["trip", "e200"]
+        assert len(list(index._candidates(*query))) == 2
+
+        index.remove("trip")
+        assert _ids(index.overlapping(*query)) == ["e200"]
+        assert len(list(index._candidates(*query))) == 1
+
+    def test_matches_brute_force(self):
+        """测试随机区间上的查询结果与逐个比较一致"""
+        rng = random.Random(0)
+        intervals = []
+        for i in range(300):
+            start = _at(0) + timedelta(minutes=rng.randrange(0, 7 * 24 * 60, 15))
+            intervals.append((f"e{i}", start, start + timedelta(minutes=rng.choice([15, 60, 240]))))
+        index = _index(*intervals)
+
+        for _ in range(200):
+            start = _at(0) + timedelta(minutes=rng.randrange(0, 7 * 24 * 60, 5))
+            end = start + timedelta(minutes=rng.randrange(5, 600, 5))
+            expected = sorted(
+                (s, item_id) for item_id, s, e in intervals if s < end and e > start
+            )
+            assert _ids(index.overlapping(start, end)) == [item_id for _, item_id in expected]
+
+
+class TestUpdates:
+    """测试增量维护"""
+
+    def test_add_replaces_and_remove(self):
+        """测试同一ID再次加入时替换旧区间，删除不存在的ID时忽略"""
+        index = _index(("a", _at(9), _at(10)))
+
+        index.add({"id": "a"}, (_at(14), _at(15)))
+        index.add({"id": "b"}, (_at(9), _at(10)))
+        index.remove("missing")
+
+        assert len(index) == 2
+        assert _ids(index.overlapping(_at(9), _at(10))) == ["b"]
+        assert _ids(index.overlapping(_at(14), _at(15))) == ["a"]
+
+        index.add({"id": "a"}, None)
+        assert len(index) == 1
+
+    def test_duplicate_ids_keep_earliest(self):
+        """测试建立索引时同一ID只保留最早的区间"""
+        index = _index(("a", _at(14), _at(15)), ("a", _at(9), _at(10)))
+
+        assert len(index) == 1
+        assert _ids(index.overlapping(_at(9), _at(10))) == ["a"]
+
+    def test_window_adds_extra(self):
+        """测试子索引只包含窗口内的区间和额外加入的区间"""
+        index = _index(("a", _at(9), _at(10)), ("b", _at(9, day=1), _at(10, day=1)))
+
+        window = index.window(_at(0), _at(0, day=1), [({"id": "extra"}, (_at(12), _at(13)))])
+
+        assert _ids(window.overlapping(_at(0), _at(0, day=2))) == ["a", "extra"]
+
+
+class TestBusyAndFreeSlots:
+    """测试忙碌时间段和空闲时间查找"""
+
+    def test_busy_merges_and_clips(self):
+        """测试重叠和相接的区间合并，并裁剪到查询窗口"""
+        index = _index(
+            ("a", _at(8), _at(10)),
+            ("b", _at(9, 30), _at(11)),
+            ("c", _at(11), _at(11, 30)),
+            ("d", _at(13), _at(14)),
+        )
+
+        assert index.busy(_at(9), _at(18)) == [(_at(9), _at(11, 30)), (_at(13), _at(14))]
+
+    def test_free_slots_skip_busy_time(self):
+        """测试空闲时段避开忙碌区间，只在工作时间内"""
+        index = _index(("a", _at(9), _at(10, 30)), ("b", _at(12), _at(17)))
+
+        slots = index.free_slots(_at(0), _at(0, day=1), timedelta(hours=1), limit=10)
+
+        assert slots == [(_at(10, 30), _at(11, 30)), (_at(17), _at(18))]
+
+    def test_free_slots_span_days_and_limit(self):
+        """测试跨天查找，并在达到 limit 后停止"""
+        index = _index(("a", _at(9), _at(18)))
+
+        slots = index.free_slots(_at(0), _at(0, day=3), timedelta(hours=2), limit=3)
+
+        assert slots == [
+            (_at(9, day=1), _at(11, day=1)),
+            (_at(10, day=1), _at(12, day=1)),
+            (_at(11, day=1), _at(13, day=1)),
+        ]
+
+    def test_free_slots_busy_spanning_days(self):
+        """测试跨越多天的忙碌区间"""
+        index = _index(("trip", _at(12), _at(12, day=1)))
+
+        slots = index.free_slots(_at(0), _at(0, day=2), timedelta(hours=3), limit=10)
+
+        assert slots == [
+            (_at(9), _at(12)),
+            (_at(12, day=1), _at(15, day=1)),
+            (_at(13, day=1), _at(16, day=1)),
+            (_at(14, day=1), _at(17, day=1)),
+            (_at(15, day=1), _at(18, day=1)),
+        ]
+
+
+class TestStorageIndex:
+    """测试 JsonMemoryStorage 增量维护的索引"""
+
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return JsonMemoryStorage(memory_dir=tmp_path / "memories")
+
+    def _rebuilt(self, storage):
+        data = storage.get_all_data()
+        return IntervalIndex.from_schedule(
+            data["schedule"]["upcoming"], data["todos"]["scheduled"]
+        )
+
+    def test_incremental_index_matches_rebuild(self, storage):
+        """测试一系列修改后增量维护的索引与重新建立的索引相同"""
+        storage.schedule_index()  # 先建立索引，之后的修改增量维护
+        meeting = storage.add_one_time_event("项目会议", "2025-01-06 14:00", duration="1小时")
+        report = storage.add_todo("写周报")
+        review = storage.add_todo("代码评审")
+        storage.schedule_todo(report, "2025-01-06 10:00", "2小时")
+        storage.schedule_todo(review, "2025-01-06 15:30", "1小时")
+        storage.schedule_todo(report, "2025-01-06 16:00", "1小时")  # 重新安排
+        storage.complete_todo(review)
+        lunch = storage.add_one_time_event("午饭", "2025-01-06 12:00", end_time="2025-01-06 13:00")
+
+        window = (_at(0), _at(0, day=1))
+        expected = _ids(self._rebuilt(storage).overlapping(*window))
+        assert _ids(storage.schedule_index().overlapping(*window)) == expected
+        assert expected == [lunch, meeting, report]
+
+    def test_conflicts_and_free_slots(self, storage):
+        """测试存储上的冲突检查和空闲时间查找"""
+        storage.add_one_time_event("项目会议", "2025-01-06 14:00", duration="1小时")
+        report = storage.add_todo("写周报")
+        storage.schedule_todo(report, "2025-01-06 09:00", "3小时")
+
+        conflicts = storage.check_time_conflict("2025-01-06 11:00", "2025-01-06 14:30")
+        titles = sorted(c.get("title") or c.get("content") for c in conflicts)
+        assert titles == ["写周报", "项目会议"]
+        assert storage.check_time_conflict(
+            "2025-01-06 11:00", "2025-01-06 14:30", exclude_id=report
+        )[0]["title"] == "项目会议"
+
+        slots = storage.find_free_slots(_at(0), _at(0, day=1), 120)
+        assert slots == [(_at(12), _at(14)), (_at(15), _at(17)), (_at(16), _at(18))]
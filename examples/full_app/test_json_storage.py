@@ -0,0 +1,289 @@
+"""
+JsonMemoryStorage 存储引擎测试
+
+在 examples/full_app 目录下运行：
+    python -m pytest test_json_storage.py
+"""
+
+import json
+import multiprocessing
+import time
+
+import pytest
+from memory_system.json_storage import JsonMemoryStorage, apply_op
+
+
+@pytest.fixture
+def memory_dir(tmp_path):
+    """临时记忆目录"""
+    return tmp_path / "memories"
+
+
+def _add_todos(memory_dir, worker, count):
+    """子进程中添加待办并计数"""
+    storage = JsonMemoryStorage(memory_dir=memory_dir, compact_after=7)
+    for i in range(count):
+        storage.add_todo(f"进程{worker}-{i}")
+        storage.increment_conversation_count()
+
+
+def _wal_lines(storage):
+    """预写日志中的事务"""
+    if not storage.wal_file.exists():
+        return []
+    return [json.loads(line) for line in storage.wal_file.read_text(encoding="utf-8").splitlines()]
+
+
+class TestWriteAheadLog:
+    """测试预写日志、崩溃恢复和压缩"""
+
+    def test_changes_are_appended_and_replayed(self, memory_dir):
+        """测试修改只追加日志，新实例重放日志得到相同数据"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        base = storage.get_all_data()["metadata"]["wal_seq"]
+        snapshot = storage.json_file.read_bytes()
+
+        todo_id = storage.add_todo("写周报", priority="high")
+        storage.update_profile("姓名", "小明")
+
+        assert storage.json_file.read_bytes() == snapshot
+        entries = _wal_lines(storage)
+        assert [entry["seq"] for entry in entries] == [base + 1, base + 2]
+        assert entries[0]["ops"][0]["op"] == "append"
+
+        reloaded = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+        assert reloaded["todos"]["pending"][0]["id"] == todo_id
+        assert reloaded["profile"]["basic_info"]["姓名"] == "小明"
+        assert reloaded["metadata"]["wal_seq"] == base + 2
+
+    def test_multi_op_transaction_is_one_entry(self, memory_dir):
+        """测试一次修改的多个操作写为一个事务（待办移动 + 提醒 + 询问）"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        todo_id = storage.add_todo("写周报")
+
+        storage.schedule_todo(todo_id, "2025-01-06 10:00", "1小时")
+
+        entry = _wal_lines(storage)[-1]
+        assert [op["op"] for op in entry["ops"]] == ["remove", "append", "append", "append"]
+
+    def test_torn_tail_is_ignored_and_truncated(self, memory_dir):
+        """测试崩溃时写了一半的最后一行被忽略，之后追加的事务仍能读取"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        storage.add_todo("已提交")
+        with open(storage.wal_file, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "ts": "2025-01-01 10:00:00", "ops": [{"op": "app')
+
+        recovered = JsonMemoryStorage(memory_dir=memory_dir)
+        assert [t["content"] for t in recovered.get_all_data()["todos"]["pending"]] == ["已提交"]
+        assert recovered.wal_file.read_text(encoding="utf-8").endswith("\n")
+
+        recovered.add_todo("崩溃之后")
+        pending = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["todos"]["pending"]
+        assert [t["content"] for t in pending] == ["已提交", "崩溃之后"]
+
+    def test_corrupt_line_stops_replay(self, memory_dir):
+        """测试无法解析的完整行及其之后的内容不会被应用"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        storage.add_todo("第一条")
+        with open(storage.wal_file, "a", encoding="utf-8") as f:
+            f.write("not json\n")
+
+        data = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+        assert [t["content"] for t in data["todos"]["pending"]] == ["第一条"]
+
+    def test_compaction(self, memory_dir):
+        """测试日志达到 compact_after 后压缩为快照并清空"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir, compact_after=3)
+        base = storage.get_all_data()["metadata"]["wal_seq"]
+        for i in range(3):
+            storage.add_idea(f"想法{i}")
+
+        assert storage.wal_file.read_text(encoding="utf-8") == ""
+        snapshot = json.loads(storage.json_file.read_text(encoding="utf-8"))
+        assert [idea["content"] for idea in snapshot["ideas"]] == ["想法0", "想法1", "想法2"]
+        assert snapshot["metadata"]["wal_seq"] == base + 3
+
+        storage.add_idea("想法3")
+        assert [entry["seq"] for entry in _wal_lines(storage)] == [base + 4]
+        assert len(JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["ideas"]) == 4
+
+    def test_crash_between_snapshot_and_log_truncation(self, memory_dir):
+        """测试快照已替换但日志未清空时，已包含在快照中的事务不会重复应用"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        storage.add_idea("只出现一次")
+        wal = storage.wal_file.read_bytes()
+        storage.compact()
+        storage.wal_file.write_bytes(wal)  # 模拟清空日志前崩溃
+
+        ideas = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["ideas"]
+        assert [idea["content"] for idea in ideas] == ["只出现一次"]
+
+    def test_corrupt_snapshot_is_backed_up(self, memory_dir):
+        """测试损坏的快照被保留为备份，并重新初始化"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        storage.json_file.write_text("{broken", encoding="utf-8")
+
+        data = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+
+        assert data["todos"]["pending"] == []
+        (backup,) = storage.user_dir.glob("memory.json.corrupt-*")
+        assert backup.read_text(encoding="utf-8") == "{broken"
+
+    def test_set_all_data_replaces_snapshot(self, memory_dir):
+        """测试整体替换写入新快照，旧日志不再重放，且版本号继续递增"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir)
+        storage.add_idea("旧数据")
+        data = storage.get_all_data()
+        seq = data["metadata"]["wal_seq"]
+        data["ideas"] = []
+
+        storage.set_all_data(data)
+
+        reloaded = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+        assert reloaded["ideas"] == []
+        assert reloaded["metadata"]["wal_seq"] == seq + 1
+
+
+class TestWriteBehind:
+    """测试延迟写入（flush_interval）"""
+
+    def test_changes_wait_for_flush(self, memory_dir):
+        """测试修改在 flush 前只在内存中，同一实例可以读到"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=60)
+
+        storage.add_todo("写周报")
+
+        assert _wal_lines(storage) == []
+        assert [t["content"] for t in storage.get_all_data()["todos"]["pending"]] == ["写周报"]
+        assert JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["todos"]["pending"] == []
+
+        storage.flush()
+        pending = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["todos"]["pending"]
+        assert [t["content"] for t in pending] == ["写周报"]
+
+    def test_changes_are_coalesced(self, memory_dir):
+        """测试 flush 前的多次修改合并为一个事务"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=60)
+
+        storage.add_todo("写周报")
+        storage.update_profile("姓名", "小明")
+        storage.increment_conversation_count()
+        storage.flush()
+        storage.flush()  # 没有新的修改时不写入
+
+        (entry,) = _wal_lines(storage)
+        assert [op["op"] for op in entry["ops"]] == ["append", "set", "incr"]
+
+    def test_timer_flushes(self, memory_dir):
+        """测试到达 flush_interval 后自动写入"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=0.05)
+        storage.add_idea("自动写入")
+
+        deadline = time.monotonic() + 5
+        while not _wal_lines(storage) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        (entry,) = _wal_lines(storage)
+        assert entry["ops"][0]["value"]["content"] == "自动写入"
+
+    def test_set_all_data_discards_pending(self, memory_dir):
+        """测试整体替换数据时丢弃未写入的操作，之后的 flush 不会重放它们"""
+        storage = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=60)
+        storage.add_idea("被替换")
+        data = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+
+        storage.set_all_data(data)
+        storage.flush()
+
+        assert JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["ideas"] == []
+
+
+class TestConcurrentInstances:
+    """测试同一目录上的多个存储实例（模拟多个 worker 进程）"""
+
+    @pytest.mark.parametrize("flush_interval", [None, 60])
+    def test_conversation_count_is_not_lost(self, memory_dir, flush_interval):
+        """测试两个实例各自计数后，计数相加而不是互相覆盖"""
+        first = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=flush_interval)
+        second = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=flush_interval)
+        first.get_all_data()
+        second.get_all_data()
+
+        first.increment_conversation_count()
+        second.increment_conversation_count()
+        first.flush()
+        second.flush()
+
+        fresh = JsonMemoryStorage(memory_dir=memory_dir)
+        assert fresh.get_all_data()["metadata"]["conversation_count"] == 2
+
+    def test_followup_response_count_is_not_lost(self, memory_dir):
+        """测试两个实例标记同一询问时，回答次数累加"""
+        first = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=60)
+        followup_id = first._create_followup("task_completion", "todo_1", "2025-01-01 10:00")
+        first.flush()
+        second = JsonMemoryStorage(memory_dir=memory_dir, flush_interval=60)
+        second.get_all_data()
+
+        first.mark_followup_asked(followup_id)
+        second.mark_followup_asked(followup_id)
+        second.flush()
+        first.flush()
+
+        (followup,) = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["followups"]
+        assert followup["asked"] is True
+        assert followup["response_count"] == 2
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork 启动子进程"
+    )
+    def test_worker_processes(self, memory_dir):
+        """测试多个进程同时写入（期间多次压缩）后，所有修改都保留"""
+        JsonMemoryStorage(memory_dir=memory_dir)
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_add_todos, args=(memory_dir, worker, 10))
+            for worker in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            assert process.exitcode == 0
+
+        data = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()
+        contents = {t["content"] for t in data["todos"]["pending"]}
+        assert contents == {f"进程{w}-{i}" for w in range(4) for i in range(10)}
+        assert data["metadata"]["conversation_count"] == 40
+
+    def test_complete_sees_other_instance_move(self, memory_dir):
+        """测试完成待办时读取的是其他实例写入后的最新状态"""
+        first = JsonMemoryStorage(memory_dir=memory_dir)
+        second = JsonMemoryStorage(memory_dir=memory_dir)
+        todo_id = first.add_todo("写周报")
+        second.get_all_data()
+
+        first.update_todo_status(todo_id, "in_progress")
+        assert second.complete_todo(todo_id)
+
+        todos = JsonMemoryStorage(memory_dir=memory_dir).get_all_data()["todos"]
+        assert [t["id"] for t in todos["completed"]] == [todo_id]
+        assert not todos["pending"] and not todos["in_progress"]
+
+
+class TestApplyOp:
+    """测试日志操作"""
+
+    def test_relative_ops(self):
+        """测试 incr 操作和 update 的 incr 字段"""
+        data = {"metadata": {}, "followups": [{"id": "f1", "response_count": 1}]}
+
+        apply_op(data, {"op": "incr", "path": ["metadata", "conversation_count"], "by": 1})
+        apply_op(data, {"op": "incr", "path": ["metadata", "conversation_count"], "by": 2})
+        apply_op(data, {
+            "op": "update", "path": ["followups"], "id": "f1",
+            "fields": {"asked": True}, "incr": {"response_count": 1}
+        })
+
+        assert data["metadata"]["conversation_count"] == 3
+        assert data["followups"] == [{"id": "f1", "response_count": 2, "asked": True}]
@@ -0,0 +1,103 @@
+"""
+MemorySystem 和进程内共享实例测试
+
+在 examples/full_app 目录下运行：
+    python -m pytest test_memory_core.py
+"""
+
+import pytest
+from memory_system import (
+    MemorySystem,
+    clear_shared_memory_systems,
+    flush_shared_memory_systems,
+    get_shared_memory_system,
+)
+from memory_system.json_storage import JsonMemoryStorage
+from memory_system.sqlite_storage import SqliteMemoryStorage
+
+
+@pytest.fixture
+def memory_dir(tmp_path):
+    """临时记忆目录"""
+    return tmp_path / "memories"
+
+
+@pytest.fixture(autouse=True)
+def shared_instances():
+    """每个测试前后清空共享实例"""
+    clear_shared_memory_systems()
+    yield
+    clear_shared_memory_systems()
+
+
+class TestMemorySystem:
+    """测试存储类型选择"""
+
+    @pytest.mark.parametrize("storage, storage_cls", [
+        ("json", JsonMemoryStorage),
+        ("sqlite", SqliteMemoryStorage),
+    ])
+    def test_storage_selection(self, memory_dir, storage, storage_cls):
+        """测试按 storage 参数选择存储实现"""
+        memory_sys = MemorySystem("owner", memory_dir, storage=storage)
+
+        assert isinstance(memory_sys.storage, storage_cls)
+
+    def test_unknown_storage(self, memory_dir):
+        """测试未知的存储类型"""
+        with pytest.raises(ValueError):
+            MemorySystem("owner", memory_dir, storage="yaml")
+
+
+class TestSharedMemorySystem:
+    """测试进程内共享的 MemorySystem 实例"""
+
+    def test_same_instance_for_same_key(self, memory_dir, monkeypatch):
+        """测试同一目录（不同写法）和用户返回同一个实例"""
+        monkeypatch.chdir(memory_dir.parent)
+
+        first = get_shared_memory_system("owner", memory_dir)
+        second = get_shared_memory_system("owner", "./memories")
+
+        assert first is second
+
+    def test_different_instance_per_user_and_storage(self, memory_dir):
+        """测试不同用户、目录或存储类型各有一个实例"""
+        owner = get_shared_memory_system("owner", memory_dir)
+
+        assert get_shared_memory_system("guest", memory_dir) is not owner
+        assert get_shared_memory_system("owner", memory_dir / "other") is not owner
+        assert get_shared_memory_system("owner", memory_dir, storage="sqlite") is not owner
+
+    def test_flush_interval_only_applies_on_creation(self, memory_dir):
+        """测试 flush_interval 只在首次创建实例时生效"""
+        first = get_shared_memory_system("owner", memory_dir, flush_interval=60)
+        second = get_shared_memory_system("owner", memory_dir)
+
+        assert second is first
+        assert second.storage.flush_interval == 60
+
+    def test_flush_shared_memory_systems(self, memory_dir):
+        """测试进程退出前写入所有共享实例中延迟的修改"""
+        owner = get_shared_memory_system("owner", memory_dir, flush_interval=60)
+        guest = get_shared_memory_system("guest", memory_dir, flush_interval=60)
+        owner.add_todo("owner 的待办")
+        guest.add_todo("guest 的待办")
+
+        flush_shared_memory_systems()
+
+        for user_id in ["owner", "guest"]:
+            pending = JsonMemoryStorage(user_id, memory_dir).get_all_data()["todos"]["pending"]
+            assert [t["content"] for t in pending] == [f"{user_id} 的待办"]
+
+    def test_clear_creates_new_instance(self, memory_dir):
+        """测试清空后重新创建实例，并保留之前写入的数据"""
+        first = get_shared_memory_system("owner", memory_dir, flush_interval=60)
+        first.add_todo("写周报")
+
+        clear_shared_memory_systems()
+        second = get_shared_memory_system("owner", memory_dir)
+
+        assert second is not first
+        pending = second.get_all_data()["todos"]["pending"]
+        assert [t["content"] for t in pending] == ["写周报"]
@@ -0,0 +1,228 @@
+"""
+周期性日程展开测试
+
+在 examples/full_app 目录下运行：
+    python -m pytest test_recurrence.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from memory_system import recurrence
+from memory_system.json_storage import JsonMemoryStorage
+from memory_system.recurrence import (
+    RecurrenceRule,
+    expand_schedule,
+    parse_occurrence_reminder_id,
+)
+from memory_system.sqlite_storage import SqliteMemoryStorage
+
+MONDAY = datetime(2025, 1, 6, 9, 30)
+
+
+def _occurrences(rule, dtstart, start, end):
+    return list(RecurrenceRule.parse(rule).occurrences(dtstart, start, end))
+
+
+class TestParse:
+    """测试频率描述和 RRULE 的解析"""
+
+    @pytest.mark.parametrize("text, rrule", [
+        ("每天", "FREQ=DAILY"),
+        ("每隔3天", "FREQ=DAILY;INTERVAL=3"),
+        ("工作日", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"),
+        ("周末", "FREQ=WEEKLY;BYDAY=SA,SU"),
+        ("每周一、三", "FREQ=WEEKLY;BYDAY=MO,WE"),
+        ("周一至周五", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"),
+        ("每两周五", "FREQ=WEEKLY;INTERVAL=2;BYDAY=FR"),
+        ("隔周", "FREQ=WEEKLY;INTERVAL=2"),
+        ("每月1号、15号", "FREQ=MONTHLY;BYMONTHDAY=1,15"),
+        ("每月十五日", "FREQ=MONTHLY;BYMONTHDAY=15"),
+        ("每月最后一天", "FREQ=MONTHLY;BYMONTHDAY=-1"),
+        ("every 2 weeks on mon and wed", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE"),
+        ("monthly on the 1st", "FREQ=MONTHLY;BYMONTHDAY=1"),
+        ("daily", "FREQ=DAILY"),
+    ])
+    def test_text(self, text, rrule):
+        """测试中英文频率描述"""
+        assert RecurrenceRule.parse(text).to_rrule() == rrule
+
+    @pytest.mark.parametrize("text", [
+        "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE",
+        "FREQ=DAILY;COUNT=3",
+        "FREQ=MONTHLY;BYMONTHDAY=-1;UNTIL=20250331T235959",
+    ])
+    def test_rrule_round_trip(self, text):
+        """测试 RRULE 解析后再转换得到相同的字符串"""
+        assert RecurrenceRule.parse(text).to_rrule() == text
+        assert RecurrenceRule.parse("RRULE:" + text).to_rrule() == text
+
+    def test_rrule_date_until_is_end_of_day(self):
+        """测试只有日期的 UNTIL 包含当天"""
+        rule = RecurrenceRule.parse("FREQ=DAILY;UNTIL=20250131")
+
+        assert rule.until == datetime(2025, 1, 31, 23, 59, 59)
+
+    @pytest.mark.parametrize("text", [None, "", "随便", "FREQ=YEARLY", "FREQ=WEEKLY;BYDAY=1MO"])
+    def test_unsupported(self, text):
+        """测试无法识别的描述和暂不支持的 RRULE"""
+        assert RecurrenceRule.parse(text) is None
+
+
+class TestOccurrences:
+    """测试发生时间的展开"""
+
+    def test_weekly_window(self):
+        """测试只展开窗口内的发生，窗口远在起点之后也不从起点枚举"""
+        start = datetime(2030, 1, 7)
+
+        occurrences = _occurrences("每周一、三", MONDAY, start, start + timedelta(days=7))
+
+        assert occurrences == [datetime(2030, 1, 7, 9, 30), datetime(2030, 1, 9, 9, 30)]
+
+    def test_interval_keeps_phase(self):
+        """测试隔周规则按起点所在的周计算，而不是窗口所在的周"""
+        occurrences = _occurrences(
+            "每两周一", MONDAY, datetime(2025, 1, 13), datetime(2025, 2, 3)
+        )
+
+        assert occurrences == [datetime(2025, 1, 20, 9, 30)]
+
+    def test_count(self):
+        """测试 COUNT 从起点开始计数，窗口之外的发生也占用次数"""
+        occurrences = _occurrences(
+            "FREQ=DAILY;COUNT=3", MONDAY, datetime(2025, 1, 7), datetime(2025, 2, 1)
+        )
+
+        assert occurrences == [datetime(2025, 1, 7, 9, 30), datetime(2025, 1, 8, 9, 30)]
+
+    def test_until(self):
+        """测试 UNTIL 之后不再发生"""
+        occurrences = _occurrences(
+            "FREQ=DAILY;UNTIL=20250108", MONDAY, MONDAY, datetime(2025, 2, 1)
+        )
+
+        assert len(occurrences) == 3
+
+    def test_last_day_of_month(self):
+        """测试每月最后一天和不存在的日期"""
+        dtstart = datetime(2025, 1, 31, 18, 0)
+        end = datetime(2025, 5, 1)
+
+        assert [d.day for d in _occurrences("每月最后一天", dtstart, dtstart, end)] == [
+            31, 28, 31, 30
+        ]
+        assert [d.month for d in _occurrences("每月31号", dtstart, dtstart, end)] == [1, 3]
+
+    def test_never_matching_rule_terminates(self):
+        """测试永远不会发生的规则（隔12个月的2月30日）也能结束"""
+        rule = RecurrenceRule("MONTHLY", 12, by_monthday=(30,))
+
+        occurrences = rule.occurrences(
+            datetime(2025, 2, 1), datetime(2025, 1, 1), datetime(2125, 1, 1)
+        )
+
+        assert list(occurrences) == []
+
+    def test_expand_schedule(self):
+        """测试展开定期日程：发生的ID、结束时间和结束日期"""
+        schedule = {
+            "id": "recurring_1",
+            "title": "站会",
+            "time": "09:30",
+            "start_date": "2025-01-06",
+            "duration": "15分钟",
+            "frequency": "工作日",
+            "end_date": "2025-01-07",
+        }
+
+        occurrences = expand_schedule(schedule, datetime(2025, 1, 1), datetime(2025, 2, 1))
+
+        assert [occurrence["id"] for occurrence, _ in occurrences] == [
+            "recurring_1@20250106T0930", "recurring_1@20250107T0930",
+        ]
+        assert occurrences[0][1] == (MONDAY, MONDAY + timedelta(minutes=15))
+        assert parse_occurrence_reminder_id("reminder_recurring_1@20250106T0930") == (
+            "recurring_1", MONDAY,
+        )
+        assert parse_occurrence_reminder_id("reminder_123") is None
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    """两种存储引擎"""
+    if request.param == "json":
+        return JsonMemoryStorage(memory_dir=tmp_path / "memories")
+    return SqliteMemoryStorage(memory_dir=tmp_path / "memories")
+
+
+class TestRecurringSchedules:
+    """测试存储中的定期日程：冲突、空闲时间和提醒"""
+
+    def test_conflicts(self, storage):
+        """测试与定期日程某次发生的冲突，排除整个定期日程"""
+        standup = storage.add_recurring_schedule("站会", "2025-01-06 09:30", "30分钟", "工作日")
+
+        conflicts = storage.check_time_conflict("2025-01-15 09:00", "2025-01-15 10:00")
+        assert [(c["title"], c["start_time"]) for c in conflicts] == [
+            ("站会", "2025-01-15T09:30:00")
+        ]
+        assert conflicts[0]["recurring_id"] == standup
+
+        assert storage.check_time_conflict("2025-01-18 09:00", "2025-01-18 10:00") == []
+        assert storage.check_time_conflict(
+            "2025-01-15 09:00", "2025-01-15 10:00", exclude_id=standup
+        ) == []
+
+    def test_free_slots(self, storage):
+        """测试空闲时间避开定期日程的每次发生"""
+        storage.add_recurring_schedule("站会", "2025-01-06 09:00", "1小时", "每天")
+        storage.add_one_time_event("评审", "2025-01-08 11:00", duration="6小时")
+
+        slots = storage.find_free_slots(
+            datetime(2025, 1, 8), datetime(2025, 1, 10), 60, limit=3
+        )
+
+        assert slots == [
+            (datetime(2025, 1, 8, 10), datetime(2025, 1, 8, 11)),
+            (datetime(2025, 1, 8, 17), datetime(2025, 1, 8, 18)),
+            (datetime(2025, 1, 9, 10), datetime(2025, 1, 9, 11)),
+        ]
+
+    def test_reminders(self, storage):
+        """测试定期日程每次发生的提醒，标记后同一次发生不再提醒"""
+        storage.add_recurring_schedule(
+            "站会", "2025-01-06 09:30", "15分钟", "工作日", reminder_minutes=10
+        )
+
+        (reminder,) = storage.get_pending_reminders(before="2025-01-06 09:25")
+        assert reminder["type"] == "recurring"
+        assert reminder["remind_at"] == "2025-01-06T09:20:00"
+
+        storage.mark_reminder_triggered(reminder["id"])
+        assert storage.get_pending_reminders(before="2025-01-06 09:25") == []
+
+        (reminder,) = storage.get_pending_reminders(before="2025-01-07 09:25")
+        assert reminder["occurrence_start"] == "2025-01-07T09:30:00"
+
+    def test_reminded_until_does_not_move_back(self, storage):
+        """测试先标记较晚的发生再标记较早的发生时，较晚的发生不会再次提醒"""
+        storage.add_recurring_schedule(
+            "站会", "2025-01-06 09:30", "15分钟", "每天", reminder_minutes=10
+        )
+        monday, tuesday = storage.get_pending_reminders(before="2025-01-07 09:25")
+
+        storage.mark_reminder_triggered(tuesday["id"])
+        storage.mark_reminder_triggered(monday["id"])
+
+        assert storage.get_pending_reminders(before="2025-01-07 09:25") == []
+
+    def test_polling_reuses_expansion(self, storage):
+        """测试轮询时间精确到微秒时，同一天内的轮询复用同一次展开"""
+        storage.add_recurring_schedule("站会", "2025-01-06 09:30", "15分钟", "每天")
+        recurrence._expansions.clear()
+
+        for second in range(20):
+            storage.get_pending_reminders(before=f"2025-01-08T08:00:{second:02d}.{second:06d}")
+
+        assert len(recurrence._expansions) == 1
@@ -0,0 +1,183 @@
+"""
+SqliteMemoryStorage 存储引擎测试
+
+在 examples/full_app 目录下运行：
+    python -m pytest test_sqlite_storage.py
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+from memory_system.json_storage import JsonMemoryStorage
+from memory_system.sqlite_storage import SqliteMemoryStorage, migrate_json_to_sqlite
+
+# 随生成时间或随机ID变化、不参与比较的字段
+VOLATILE_KEYS = {
+    "id", "target_id", "created_at", "updated_at", "completed_at",
+    "last_updated", "last_asked_at", "learned_at", "wal_seq", "date",
+}
+
+
+@pytest.fixture
+def memory_dir(tmp_path):
+    """临时记忆目录"""
+    return tmp_path / "memories"
+
+
+def _normalize(value):
+    """去掉随时间或ID变化的字段，便于比较两个引擎的数据"""
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _run_operations(storage):
+    """在存储上执行一组覆盖各类修改的操作"""
+    storage.update_profile("姓名", "小明")
+    storage.update_preference("工作", "开始时间", "9点")
+    storage.learn_schedule_preference("会议时长", "30分钟", confidence=0.8)
+
+    report = storage.add_todo("写周报", priority="high", due_date="2025-01-10")
+    review = storage.add_todo("代码评审")
+    storage.add_todo("买咖啡", priority="low")
+    storage.update_todo(review, category="工作")
+    storage.update_todo_status(review, "in_progress")
+    storage.schedule_todo(report, "2025-01-06 10:00", "1小时")
+    storage.complete_todo(review)
+    storage.remove_todo(storage.find_todo_by_content("买咖啡"))
+
+    storage.add_one_time_event("项目会议", "2025-01-06 14:00", duration="1小时", location="A会议室")
+    storage.add_recurring_schedule("站会", "2025-01-06 09:30", "15分钟", "每个工作日")
+
+    storage.add_idea("把周报做成模板", tags=["效率"])
+    storage.add_diary_entry("周一", "开了很多会")
+    storage.learn_habit("上午写代码")
+    storage.add_relationship("小红", "同事", "前端")
+    storage.add_conversation("周计划", ["安排了周报"])
+    storage.increment_conversation_count()
+    storage.increment_conversation_count()
+
+    reminders = storage.get_pending_reminders(before="2025-01-06 09:50")
+    storage.mark_reminder_triggered(reminders[0]["id"])
+    followups = storage.get_pending_followups(before="2025-01-06 12:00")
+    storage.mark_followup_asked(followups[0]["id"])
+    storage.flush()
+
+
+class TestParity:
+    """测试 JSON 和 SQLite 两个引擎对同一组操作得到相同的数据"""
+
+    def test_same_operations_same_data(self, tmp_path):
+        """测试执行同一组操作后导出的数据相同"""
+        json_storage = JsonMemoryStorage(memory_dir=tmp_path / "json")
+        sqlite_storage = SqliteMemoryStorage(memory_dir=tmp_path / "sqlite")
+
+        _run_operations(json_storage)
+        _run_operations(sqlite_storage)
+
+        assert _normalize(sqlite_storage.get_all_data()) == _normalize(
+            JsonMemoryStorage(memory_dir=tmp_path / "json").get_all_data()
+        )
+        assert sqlite_storage.get_context() == json_storage.get_context()
+
+    def test_same_queries(self, tmp_path):
+        """测试冲突检查、空闲时段和待办查询的结果相同"""
+        storages = [
+            JsonMemoryStorage(memory_dir=tmp_path / "json"),
+            SqliteMemoryStorage(memory_dir=tmp_path / "sqlite"),
+        ]
+        results = []
+        for storage in storages:
+            _run_operations(storage)
+            conflicts = storage.check_time_conflict("2025-01-06 09:00", "2025-01-06 15:00")
+            slots = storage.find_free_slots(
+                datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 18, 0), 60
+            )
+            results.append((
+                sorted(c["title"] if "title" in c else c["content"] for c in conflicts),
+                slots,
+                [t["content"] for t in storage.query_todos(status="scheduled")],
+            ))
+
+        assert results[0] == results[1]
+        assert results[0][0] == ["写周报", "站会", "项目会议"]
+
+
+class TestMigration:
+    """测试从 memory.json 迁移到 SQLite"""
+
+    def test_first_open_migrates_json(self, memory_dir):
+        """测试首次打开时自动迁移 memory.json（包括预写日志中的修改）"""
+        json_storage = JsonMemoryStorage(memory_dir=memory_dir)
+        _run_operations(json_storage)
+
+        sqlite_storage = SqliteMemoryStorage(memory_dir=memory_dir)
+
+        assert _normalize(sqlite_storage.get_all_data()) == _normalize(json_storage.get_all_data())
+        assert sqlite_storage.db_file.exists()
+
+    def test_migrate_all_users(self, memory_dir):
+        """测试批量迁移所有用户，已迁移的用户被跳过"""
+        JsonMemoryStorage("alice", memory_dir).add_todo("alice 的待办")
+        JsonMemoryStorage("bob", memory_dir).add_todo("bob 的待办")
+
+        assert migrate_json_to_sqlite(memory_dir) == ["alice", "bob"]
+        assert migrate_json_to_sqlite(memory_dir) == []
+
+        pending = SqliteMemoryStorage("bob", memory_dir).query_todos(status="pending")
+        assert [t["content"] for t in pending] == ["bob 的待办"]
+
+
+def _run_concurrently(storages, fn, times=20):
+    """每个存储实例在自己的线程中执行 fn(storage) times 次"""
+    def work(storage):
+        for _ in range(times):
+            fn(storage)
+
+    threads = [threading.Thread(target=work, args=(storage,)) for storage in storages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestConcurrentInstances:
+    """测试同一数据库上的多个存储实例（模拟多个 worker 进程）"""
+
+    def test_conversation_count_is_not_lost(self, memory_dir):
+        """测试多个连接同时计数时，计数相加而不是互相覆盖"""
+        storages = [SqliteMemoryStorage(memory_dir=memory_dir) for _ in range(4)]
+
+        _run_concurrently(storages, lambda storage: storage.increment_conversation_count())
+
+        metadata = SqliteMemoryStorage(memory_dir=memory_dir).get_all_data()["metadata"]
+        assert metadata["conversation_count"] == 80
+
+    def test_followup_response_count_is_not_lost(self, memory_dir):
+        """测试多个连接同时标记同一询问时，回答次数累加"""
+        storages = [SqliteMemoryStorage(memory_dir=memory_dir) for _ in range(4)]
+        followup_id = storages[0]._create_followup("task_completion", "todo_1", "2025-01-01 10:00")
+
+        _run_concurrently(storages, lambda storage: storage.mark_followup_asked(followup_id))
+
+        (followup,) = storages[0].get_all_data()["followups"]
+        assert followup["response_count"] == 80
+
+    def test_failed_transaction_is_rolled_back(self, memory_dir):
+        """测试事务中出错时不留下部分写入，连接仍可继续使用"""
+        storage = SqliteMemoryStorage(memory_dir=memory_dir)
+
+        def fail(conn):
+            conn.execute("DELETE FROM todos")
+            raise RuntimeError("boom")
+
+        todo_id = storage.add_todo("写周报")
+        with pytest.raises(RuntimeError):
+            storage._transaction(fail)
+
+        assert storage.get_todo(todo_id) is not None
+        storage.add_todo("之后的待办")
+        assert len(storage.query_todos(status="pending")) == 2
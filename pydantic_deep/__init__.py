@@ -68,18 +68,45 @@ from pydantic_ai_backends import (
 
 from pydantic_deep.agent import create_deep_agent, create_default_deps, run_with_files
 from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.instrumentation import (
+    InMemorySink,
+    Instrumentation,
+    JsonlSink,
+    OTelFileExporter,
+    RunSummary,
+    Span,
+)
+from pydantic_deep.overlay import OverlayBackend, OverlayMergeResult, SandboxOverlayBackend
 from pydantic_deep.processors import (
     SummarizationProcessor,
     create_summarization_processor,
 )
-from pydantic_deep.toolsets import FilesystemToolset, SkillsToolset, SubAgentToolset, TodoToolset
+from pydantic_deep.state import StateChange, VersionedDict, VersionedList
+from pydantic_deep.toolsets import (
+    FilesystemToolset,
+    OutputBudget,
+    OutputBudgetToolset,
+    SkillBundle,
+    SkillIndex,
+    SkillMaterializer,
+    SkillRegistry,
+    SkillSearchIndex,
+    SkillsToolset,
+    SubAgentRegistry,
+    SubAgentResultCache,
+    SubAgentToolset,
+    TodoToolset,
+)
 from pydantic_deep.types import (
     CompiledSubAgent,
     ResponseFormat,
     Skill,
     SkillDirectory,
     SkillFrontmatter,
+    SubAgentBudget,
     SubAgentConfig,
+    SubAgentEvent,
+    SubAgentTask,
     Todo,
     UploadedFile,
 )
@@ -101,6 +128,9 @@ __all__ = [
     "BaseSandbox",
     "DockerSandbox",
     "LocalSandbox",
+    "OverlayBackend",
+    "OverlayMergeResult",
+    "SandboxOverlayBackend",
     # Runtimes
     "RuntimeConfig",
     "BUILTIN_RUNTIMES",
@@ -112,9 +142,29 @@ __all__ = [
     "FilesystemToolset",
     "SubAgentToolset",
     "SkillsToolset",
+    "SkillBundle",
+    "SkillIndex",
+    "SkillMaterializer",
+    "SkillRegistry",
+    "SkillSearchIndex",
+    "SubAgentRegistry",
+    "SubAgentResultCache",
+    "OutputBudget",
+    "OutputBudgetToolset",
     # Processors
     "SummarizationProcessor",
     "create_summarization_processor",
+    # Instrumentation
+    "Instrumentation",
+    "Span",
+    "RunSummary",
+    "InMemorySink",
+    "JsonlSink",
+    "OTelFileExporter",
+    # State
+    "StateChange",
+    "VersionedDict",
+    "VersionedList",
     # Types
     "FileData",
     "FileInfo",
@@ -124,6 +174,9 @@ __all__ = [
     "GrepMatch",
     "Todo",
     "SubAgentConfig",
+    "SubAgentTask",
+    "SubAgentBudget",
+    "SubAgentEvent",
     "CompiledSubAgent",
     "Skill",
     "SkillDirectory",
@@ -3,23 +3,38 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, TypeVar, overload
 
-from pydantic_ai import Agent
+from pydantic_ai import Agent, RunContext
 from pydantic_ai._agent_graph import HistoryProcessor
 from pydantic_ai.models import Model
 from pydantic_ai.output import OutputSpec
 from pydantic_ai.tools import DeferredToolRequests, Tool
+from pydantic_ai.toolsets import FunctionToolset, ToolsetTool, WrapperToolset
 from pydantic_ai_backends import BackendProtocol, SandboxProtocol, StateBackend
 from pydantic_ai_todo import create_todo_toolset, get_todo_system_prompt
 
 from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.instrumentation import Instrumentation
+from pydantic_deep.processors.summarization import SummarizationProcessor
+from pydantic_deep.toolsets.budget import OutputBudget
 from pydantic_deep.toolsets.filesystem import (
     create_filesystem_toolset,
     get_filesystem_system_prompt,
 )
-from pydantic_deep.toolsets.skills import create_skills_toolset, get_skills_system_prompt
-from pydantic_deep.toolsets.subagents import create_subagent_toolset, get_subagent_system_prompt
+from pydantic_deep.toolsets.skill_sync import SkillMaterializer
+from pydantic_deep.toolsets.skills import (
+    SkillIndex,
+    SkillRegistry,
+    create_skills_toolset,
+)
+from pydantic_deep.toolsets.subagents import (
+    SubAgentRegistry,
+    SubAgentResultCache,
+    create_subagent_toolset,
+    get_subagent_system_prompt,
+)
 from pydantic_deep.types import Skill, SkillDirectory, SubAgentConfig
 
 if TYPE_CHECKING:
@@ -49,6 +64,33 @@ You are a helpful AI assistant with access to planning, filesystem, subagent, an
 """
 
 
+@dataclass
+class _TodoChangeToolset(WrapperToolset[DeepAgentDeps]):
+    """Record todo edits on `deps.todos` after every todo tool call.
+
+    pydantic-ai-todo updates items in place (e.g. `todo.status = ...`), which
+    the versioned list cannot observe. Touching the list keeps the cached todo
+    prompt and version-gated UI updates in sync with the actual items.
+    """
+
+    @property
+    def id(self) -> str | None:
+        return self.wrapped.id
+
+    async def call_tool(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[DeepAgentDeps],
+        tool: ToolsetTool[DeepAgentDeps],
+    ) -> Any:
+        result = await super().call_tool(name, tool_args, ctx, tool)
+        todos = getattr(ctx.deps, "todos", None)
+        if name != "read_todos" and hasattr(todos, "touch"):
+            todos.touch()
+        return result
+
+
 @overload
 def create_deep_agent(
     model: str | Model | None = None,
@@ -68,6 +110,16 @@ def create_deep_agent(
     interrupt_on: dict[str, bool] | None = None,
     output_type: None = None,
     history_processors: Sequence[HistoryProcessor[DeepAgentDeps]] | None = None,
+    instrumentation: Instrumentation | None = None,
+    output_budget: OutputBudget | None = None,
+    skill_index: SkillIndex | None = None,
+    skill_registry: SkillRegistry | None = None,
+    skill_materializer: SkillMaterializer | None = None,
+    subagent_registry: SubAgentRegistry | None = None,
+    subagent_result_cache: SubAgentResultCache | None = None,
+    subagent_max_concurrency: int = 4,
+    subagent_task_timeout: float | None = None,
+    eager_subagents: bool = False,
     **agent_kwargs: Any,
 ) -> Agent[DeepAgentDeps, str]: ...
 
@@ -92,6 +144,16 @@ def create_deep_agent(
     *,
     output_type: OutputSpec[OutputDataT],
     history_processors: Sequence[HistoryProcessor[DeepAgentDeps]] | None = None,
+    instrumentation: Instrumentation | None = None,
+    output_budget: OutputBudget | None = None,
+    skill_index: SkillIndex | None = None,
+    skill_registry: SkillRegistry | None = None,
+    skill_materializer: SkillMaterializer | None = None,
+    subagent_registry: SubAgentRegistry | None = None,
+    subagent_result_cache: SubAgentResultCache | None = None,
+    subagent_max_concurrency: int = 4,
+    subagent_task_timeout: float | None = None,
+    eager_subagents: bool = False,
     **agent_kwargs: Any,
 ) -> Agent[DeepAgentDeps, OutputDataT]: ...
 
@@ -114,6 +176,16 @@ def create_deep_agent(  # noqa: C901
     interrupt_on: dict[str, bool] | None = None,
     output_type: OutputSpec[OutputDataT] | None = None,
     history_processors: Sequence[HistoryProcessor[DeepAgentDeps]] | None = None,
+    instrumentation: Instrumentation | None = None,
+    output_budget: OutputBudget | None = None,
+    skill_index: SkillIndex | None = None,
+    skill_registry: SkillRegistry | None = None,
+    skill_materializer: SkillMaterializer | None = None,
+    subagent_registry: SubAgentRegistry | None = None,
+    subagent_result_cache: SubAgentResultCache | None = None,
+    subagent_max_concurrency: int = 4,
+    subagent_task_timeout: float | None = None,
+    eager_subagents: bool = False,
     **agent_kwargs: Any,
 ) -> Agent[DeepAgentDeps, OutputDataT] | Agent[DeepAgentDeps, str]:
     """Create a deep agent with planning, filesystem, subagent, and skills capabilities.
@@ -151,6 +223,31 @@ def create_deep_agent(  # noqa: C901
             When specified, the agent will return this type instead of str.
         history_processors: Sequence of history processors to apply to messages
             before sending to the model. Useful for summarization, filtering, etc.
+        instrumentation: Records spans for model requests, every tool call
+            (including user tools and toolsets), subagent runs, skill loading and
+            summarization. `SummarizationProcessor`s in `history_processors`
+            without their own instrumentation are attached to it.
+        output_budget: Token limits applied to the results of every tool
+            (including user tools and toolsets). Oversized results are saved to
+            the backend and replaced by a preview and the file path.
+        skill_index: Persistent index that makes repeated skill discovery cost
+            only `stat` calls (see `SkillIndex`).
+        skill_registry: Live skill registry (see `SkillRegistry`); call its
+            `start()` to pick up added, edited and removed skills without a
+            restart. Overrides `skills` and `skill_directories`.
+        skill_materializer: Copies each loaded skill's files into the backend
+            once per skill version (see `SkillMaterializer`), e.g. so skill
+            scripts can run in a sandbox.
+        subagent_registry: Registry holding the subagent agents, e.g. to share
+            built subagents between several deep agents (see `SubAgentRegistry`).
+        subagent_result_cache: Opt-in cache returning earlier results for
+            identical delegations (see `SubAgentResultCache`).
+        subagent_max_concurrency: Maximum number of subagents `task_batch` runs
+            at once.
+        subagent_task_timeout: Timeout in seconds for each subagent run
+            (None = no limit).
+        eager_subagents: Build all subagent agents when the deep agent is
+            created instead of on first use.
         **agent_kwargs: Additional arguments passed to Agent constructor.
 
     Returns:
@@ -201,7 +298,7 @@ def create_deep_agent(  # noqa: C901
     all_toolsets: list[AbstractToolset[DeepAgentDeps]] = []
 
     if include_todo:
-        todo_toolset = create_todo_toolset(id="deep-todo")
+        todo_toolset = _TodoChangeToolset(wrapped=create_todo_toolset(id="deep-todo"))
         all_toolsets.append(todo_toolset)
 
     if include_filesystem:
@@ -233,30 +330,51 @@ def create_deep_agent(  # noqa: C901
             subagents=subagents,
             default_model=subagent_model,
             include_general_purpose=include_general_purpose_subagent,
+            max_concurrency=subagent_max_concurrency,
+            task_timeout=subagent_task_timeout,
+            registry=subagent_registry,
+            eager=eager_subagents,
+            result_cache=subagent_result_cache,
+            instrumentation=instrumentation,
         )
         all_toolsets.append(subagent_toolset)
 
     # Skills toolset
-    loaded_skills: list[Skill] = []
+    prompt_skills: SkillRegistry | None = None
     if include_skills:
         skills_toolset = create_skills_toolset(
             id="deep-skills",
             directories=skill_directories,
             skills=skills,
+            instrumentation=instrumentation,
+            index=skill_index,
+            registry=skill_registry,
+            materializer=skill_materializer,
         )
         all_toolsets.append(skills_toolset)
-        # Track loaded skills for system prompt
-        if skills:
-            loaded_skills = skills
-        elif skill_directories:
-            from pydantic_deep.toolsets.skills import discover_skills
-
-            loaded_skills = discover_skills(skill_directories)
+        # Reuse the toolset's registry for the system prompt
+        if skills or skill_directories or skill_registry is not None:
+            prompt_skills = skills_toolset.registry
 
     # Add user-provided toolsets
     if toolsets:
         all_toolsets.extend(toolsets)
 
+    if tools and (instrumentation is not None or output_budget is not None):
+        # Route user tools through a toolset so the wrappers below see their calls
+        all_toolsets.append(FunctionToolset(tools=list(tools)))
+        tools = None
+
+    if output_budget is not None:
+        all_toolsets = [output_budget.wrap_toolset(ts) for ts in all_toolsets]
+
+    if instrumentation is not None:
+        all_toolsets = [instrumentation.wrap_toolset(ts) for ts in all_toolsets]
+        model = instrumentation.wrap_model(model)
+        for processor in history_processors or []:
+            if isinstance(processor, SummarizationProcessor) and processor.instrumentation is None:
+                processor.instrumentation = instrumentation
+
     # Build base instructions
     base_instructions = instructions or DEFAULT_INSTRUCTIONS
 
@@ -317,8 +435,9 @@ def create_deep_agent(  # noqa: C901
             if subagent_prompt:
                 parts.append(subagent_prompt)
 
-        if include_skills and loaded_skills:
-            skills_prompt = get_skills_system_prompt(ctx.deps, loaded_skills)
+        if prompt_skills is not None:
+            query = ctx.prompt if isinstance(ctx.prompt, str) else None
+            skills_prompt = prompt_skills.system_prompt(ctx.deps, query=query)
             if skills_prompt:
                 parts.append(skills_prompt)
 
@@ -3,13 +3,18 @@
 from __future__ import annotations
 
 import mimetypes
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any
 
 import chardet
-from pydantic_ai_backends import BackendProtocol, StateBackend
+from pydantic_ai_backends import BackendProtocol, SandboxProtocol, StateBackend
 
-from pydantic_deep.types import FileData, Todo, UploadedFile
+from pydantic_deep.overlay import OverlayBackend, SandboxOverlayBackend
+from pydantic_deep.state import StateChange, StateListener, VersionedDict, VersionedList
+from pydantic_deep.types import FileData, SubAgentEvent, Todo, UploadedFile
 
 if TYPE_CHECKING:
     pass
@@ -22,11 +27,21 @@ class DeepAgentDeps:
     This container holds all the state and resources needed by the agent
     and its tools during execution.
 
+    The `files`, `todos`, `subagents` and `uploads` containers are versioned
+    (see `pydantic_deep.state`): each has a `version` counter bumped on every
+    mutation and supports `subscribe()` for change notifications. Assigning a
+    new value to one of these attributes replaces the contents of the existing
+    container, so versions and subscriptions survive reassignment.
+
     Attributes:
         backend: File storage backend (StateBackend, FilesystemBackend, etc.)
         files: In-memory file cache (used with StateBackend)
         todos: Task list for planning
         subagents: Pre-configured subagents available for delegation
+        files_summary_max_tokens: Token cap for the files section of the system prompt
+        files_summary_recent_files: Recently touched files listed in compact summaries
+        event_sink: Callback receiving `SubAgentEvent`s (text deltas, tool calls)
+            from running subagents; may return an awaitable
     """
 
     backend: BackendProtocol = field(default_factory=StateBackend)
@@ -34,6 +49,28 @@ class DeepAgentDeps:
     todos: list[Todo] = field(default_factory=list)
     subagents: dict[str, Any] = field(default_factory=dict)  # Agent instances
     uploads: dict[str, UploadedFile] = field(default_factory=dict)  # Uploaded files metadata
+    files_summary_max_tokens: int = 2000  # Token cap for the files section of the prompt
+    files_summary_recent_files: int = 20  # Recently touched files shown in compact summaries
+    event_sink: Callable[[SubAgentEvent], Any] | None = field(
+        default=None, repr=False, compare=False
+    )  # Receives subagent progress events; may be sync or async
+    _prompt_cache: dict[str, tuple[int, str]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _files_index: _FilesIndex | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Keep state containers versioned across (re)assignment."""
+        if name in _VERSIONED_FIELDS:
+            current = self.__dict__.get(name)
+            if current is not None and current is not value:
+                # Replace in place so subscribers and the version counter survive
+                current.replace(value)
+                return
+            if not isinstance(value, (VersionedDict, VersionedList)):
+                container = VersionedList if name == "todos" else VersionedDict
+                value = container(value, name=name)
+        object.__setattr__(self, name, value)
 
     def __post_init__(self) -> None:
         """Initialize backend with files if using StateBackend."""
@@ -41,12 +78,63 @@ class DeepAgentDeps:
             if self.files:
                 # Sync files to state backend
                 self.backend._files = self.files
-            else:
-                # Use backend's files dict as the shared reference
+            elif isinstance(self.backend._files, VersionedDict):
+                # Backend is already tracked (e.g. shared with a parent deps)
                 object.__setattr__(self, "files", self.backend._files)
+            else:
+                # Track the backend's files and use them as the shared reference
+                files = VersionedDict(self.backend._files, name="files")
+                object.__setattr__(self, "files", files)
+                self.backend._files = files
+
+    @property
+    def state_version(self) -> tuple[int, int, int, int]:
+        """Combined version of (files, todos, subagents, uploads).
+
+        Compare against a previously stored value to detect any state change.
+        """
+        return (
+            self.files.version,  # type: ignore[attr-defined]
+            self.todos.version,  # type: ignore[attr-defined]
+            self.subagents.version,  # type: ignore[attr-defined]
+            self.uploads.version,  # type: ignore[attr-defined]
+        )
+
+    def subscribe(self, listener: StateListener) -> Callable[[], None]:
+        """Subscribe to changes of any versioned state container.
+
+        Args:
+            listener: Called with a `StateChange` after every mutation of
+                `files`, `todos`, `subagents` or `uploads`.
+
+        Returns:
+            A callable that removes the listener from all containers.
+        """
+        unsubscribers = [
+            getattr(self, name).subscribe(listener) for name in sorted(_VERSIONED_FIELDS)
+        ]
+
+        def unsubscribe() -> None:
+            for unsub in unsubscribers:
+                unsub()
+
+        return unsubscribe
+
+    def _cached_prompt(self, name: str, build: Callable[[], str]) -> str:
+        """Return a prompt section, rebuilding it only when its container changed."""
+        version: int = getattr(self, name).version
+        cached = self._prompt_cache.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        prompt = build()
+        self._prompt_cache[name] = (version, prompt)
+        return prompt
 
     def get_todo_prompt(self) -> str:
         """Generate system prompt section for todos."""
+        return self._cached_prompt("todos", self._build_todo_prompt)
+
+    def _build_todo_prompt(self) -> str:
         if not self.todos:
             return ""
 
@@ -62,16 +150,31 @@ class DeepAgentDeps:
         return "\n".join(lines)
 
     def get_files_summary(self) -> str:
-        """Generate summary of files in memory."""
+        """Generate summary of files in memory.
+
+        Small workspaces are listed file by file. When the full listing would
+        exceed `files_summary_max_tokens`, a compact summary is produced
+        instead: per-directory rollups plus the most recently touched files,
+        cut off at the token cap with a pointer to `ls`/`glob`.
+        """
+        return self._cached_prompt("files", self._build_files_summary)
+
+    def _build_files_summary(self) -> str:
         if not self.files:
             return ""
 
-        lines = ["## Files in Memory"]
-        for path, data in sorted(self.files.items()):
-            line_count = len(data["content"])
-            lines.append(f"- {path} ({line_count} lines)")
+        if self._files_index is None:
+            self._files_index = _FilesIndex(self.files)  # type: ignore[arg-type]
 
-        return "\n".join(lines)
+        max_chars = self.files_summary_max_tokens * 4
+        index = self._files_index
+        if index.listing_chars <= max_chars:
+            lines = ["## Files in Memory"]
+            for path in sorted(index.line_counts):
+                lines.append(_format_file_line(path, index.line_counts[path]))
+            return "\n".join(lines)
+
+        return index.render_compact(max_chars, self.files_summary_recent_files)
 
     def get_subagents_summary(self) -> str:
         """Generate summary of available subagents."""
@@ -148,6 +251,9 @@ class DeepAgentDeps:
 
     def get_uploads_summary(self) -> str:
         """Generate summary of uploaded files for system prompt."""
+        return self._cached_prompt("uploads", self._build_uploads_summary)
+
+    def _build_uploads_summary(self) -> str:
         if not self.uploads:
             return ""
 
@@ -168,7 +274,7 @@ class DeepAgentDeps:
 
         return "\n".join(lines)
 
-    def clone_for_subagent(self) -> DeepAgentDeps:
+    def clone_for_subagent(self, *, copy_on_write: bool = False) -> DeepAgentDeps:
         """Create a new deps instance for a subagent.
 
         Subagents get:
@@ -177,16 +283,173 @@ class DeepAgentDeps:
         - Empty subagents (no nested delegation)
         - Same files (shared)
         - Same uploads (shared)
+
+        With `copy_on_write=True` the backend is wrapped in an `OverlayBackend`
+        instead: the subagent reads the parent's files without copying them,
+        but its writes stay private until merged with
+        `deps.backend.commit()`. Use this to run subagents in parallel
+        without them racing on the same files. Sandbox backends get a
+        `SandboxOverlayBackend`, whose `execute` runs in the parent sandbox
+        and is not isolated.
+
+        Args:
+            copy_on_write: Isolate the subagent's writes in an overlay.
         """
+        if copy_on_write:
+            overlay = (
+                SandboxOverlayBackend(self.backend)
+                if isinstance(self.backend, SandboxProtocol)
+                else OverlayBackend(self.backend)
+            )
+            return DeepAgentDeps(
+                backend=overlay,
+                files=overlay.files,  # Only the subagent's own changes
+                todos=[],
+                subagents={},
+                uploads=self.uploads,
+                files_summary_max_tokens=self.files_summary_max_tokens,
+                files_summary_recent_files=self.files_summary_recent_files,
+                event_sink=self.event_sink,
+            )
+
         return DeepAgentDeps(
             backend=self.backend,
             files=self.files,  # Shared reference
             todos=[],  # Fresh todo list
             subagents={},  # No nested subagents
             uploads=self.uploads,  # Shared reference
+            files_summary_max_tokens=self.files_summary_max_tokens,
+            files_summary_recent_files=self.files_summary_recent_files,
+            event_sink=self.event_sink,
         )
 
 
+_VERSIONED_FIELDS = frozenset({"files", "todos", "subagents", "uploads"})
+
+
+def _format_file_line(path: str, line_count: int) -> str:
+    return f"- {path} ({line_count} lines)"
+
+
+def _parent_dir(path: str) -> str:
+    parent = path.rsplit("/", 1)[0]
+    return f"{parent}/" if parent else "/"
+
+
+class _FilesIndex:
+    """Per-directory index of in-memory files, maintained from change events.
+
+    Subscribes to the versioned files dict so that each write only updates the
+    affected path and its directory rollup, instead of re-scanning and sorting
+    every path whenever the prompt is rebuilt.
+    """
+
+    def __init__(self, files: VersionedDict[str, FileData]) -> None:
+        self._files = files
+        self.line_counts: dict[str, int] = {}
+        self.dirs: dict[str, list[int]] = {}  # dir -> [file_count, line_count]
+        self.recent: OrderedDict[str, None] = OrderedDict()  # least -> most recently touched
+        self.listing_chars = 0
+        self._rebuild()
+
+        # Hold the index weakly so a discarded deps does not leak a listener
+        # on a files dict shared with other deps (see clone_for_subagent).
+        index_ref = weakref.ref(self)
+
+        def listener(event: StateChange) -> None:
+            index = index_ref()
+            if index is None:
+                unsubscribe()
+            else:
+                index._on_change(event)
+
+        unsubscribe = files.subscribe(listener)
+
+    def _rebuild(self) -> None:
+        self.line_counts.clear()
+        self.dirs.clear()
+        self.recent.clear()
+        self.listing_chars = len("## Files in Memory")
+        for path, data in self._files.items():
+            self._add(path, len(data["content"]))
+
+    def _add(self, path: str, line_count: int) -> None:
+        self.line_counts[path] = line_count
+        self.recent[path] = None
+        self.recent.move_to_end(path)
+        rollup = self.dirs.setdefault(_parent_dir(path), [0, 0])
+        rollup[0] += 1
+        rollup[1] += line_count
+        self.listing_chars += len(_format_file_line(path, line_count)) + 1
+
+    def _remove(self, path: str) -> None:
+        line_count = self.line_counts.pop(path, None)
+        if line_count is None:
+            return
+        self.recent.pop(path, None)
+        directory = _parent_dir(path)
+        rollup = self.dirs[directory]
+        rollup[0] -= 1
+        rollup[1] -= line_count
+        if rollup[0] == 0:
+            del self.dirs[directory]
+        self.listing_chars -= len(_format_file_line(path, line_count)) + 1
+
+    def _on_change(self, event: StateChange) -> None:
+        path = event.key
+        if path is None or event.kind in ("replace", "clear"):
+            self._rebuild()
+            return
+        self._remove(path)
+        if event.kind != "delete" and path in self._files:
+            self._add(path, len(self._files[path]["content"]))
+
+    def render_compact(self, max_chars: int, recent_files: int) -> str:
+        """Render directory rollups and recent files within `max_chars`."""
+        total_lines = sum(rollup[1] for rollup in self.dirs.values())
+        header = [
+            "## Files in Memory",
+            "",
+            f"{len(self.line_counts)} files in {len(self.dirs)} directories "
+            f"({total_lines} lines total).",
+        ]
+        footer = "Use `ls` or `glob` to see more files."
+        budget = max_chars - sum(len(line) + 1 for line in header) - len(footer) - 2
+
+        body: list[str] = []
+
+        def add(line: str, reserve: int = 0) -> bool:
+            nonlocal budget
+            if len(line) + 1 > budget - reserve:
+                return False
+            body.append(line)
+            budget -= len(line) + 1
+            return True
+
+        if recent_files > 0:
+            add("")
+            add("### Recently Modified")
+            for count, path in enumerate(reversed(self.recent)):
+                if count >= recent_files or not add(
+                    _format_file_line(path, self.line_counts[path])
+                ):
+                    break
+
+        add("")
+        add("### Directories")
+        directories = sorted(self.dirs.items(), key=lambda item: (-item[1][0], item[0]))
+        overflow = "- ... and {} more directories"
+        reserve = len(overflow.format(len(directories))) + 1
+        for shown, (directory, (file_count, line_count)) in enumerate(directories):
+            last = shown == len(directories) - 1
+            line = f"- {directory} ({file_count} files, {line_count} lines)"
+            if not add(line, reserve=0 if last else reserve):
+                add(overflow.format(len(directories) - shown))
+                break
+
+        return "\n".join([*header, *body, "", footer])
+
+
 def _format_size(size_bytes: int) -> str:
     """Format byte size to human-readable string."""
     if size_bytes < 1024:
@@ -0,0 +1,577 @@
+"""Usage and latency instrumentation for deep agent runs.
+
+An `Instrumentation` records `Span`s for model requests, tool calls, subagent
+runs, summarization and skill loading, and hands them to pluggable sinks:
+
+- `InMemorySink` keeps spans in a list (tests, notebooks, dashboards)
+- `JsonlSink` appends one JSON object per span to a file
+- `OTelFileExporter` writes OTLP/JSON trace requests, one per line, that an
+  OpenTelemetry collector (`otlpjsonfile` receiver) can ingest later; it needs
+  no network access and no OpenTelemetry packages
+
+Wrap a run in `trace()` to group its spans and get a `RunSummary`:
+
+```python
+from pydantic_deep import create_deep_agent, DeepAgentDeps
+from pydantic_deep.instrumentation import InMemorySink, Instrumentation
+
+instrumentation = Instrumentation(sinks=[InMemorySink()])
+agent = create_deep_agent(instrumentation=instrumentation)
+
+with instrumentation.trace("chat") as trace:
+    await agent.run("Analyze this code", deps=DeepAgentDeps())
+print(trace.summary.format())
+```
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Literal, Protocol, runtime_checkable
+
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.toolsets import WrapperToolset
+
+if TYPE_CHECKING:
+    from pydantic_ai import RunContext
+    from pydantic_ai.messages import ModelMessage, ModelResponse
+    from pydantic_ai.models import ModelRequestParameters, StreamedResponse
+    from pydantic_ai.settings import ModelSettings
+    from pydantic_ai.toolsets import AbstractToolset, ToolsetTool
+
+logger = logging.getLogger(__name__)
+
+SpanKind = Literal[
+    "agent_run", "model_request", "tool", "subagent", "summarization", "skill_load", "internal"
+]
+
+
+@dataclass
+class Span:
+    """A timed operation with optional usage metrics."""
+
+    name: str
+    """Operation name (model name, tool name, subagent type, ...)."""
+
+    kind: SpanKind
+    """Category of the operation."""
+
+    trace_id: str
+    """32-hex-digit id shared by all spans of one trace."""
+
+    span_id: str
+    """16-hex-digit id of this span."""
+
+    parent_id: str | None = None
+    """Id of the enclosing span, if any."""
+
+    start_time: float = 0.0
+    """Start time as a Unix timestamp in seconds."""
+
+    end_time: float | None = None
+    """End time as a Unix timestamp in seconds (None while running)."""
+
+    status: Literal["ok", "error"] = "ok"
+    """Whether the operation raised."""
+
+    error: str | None = None
+    """Exception type and message if the operation raised."""
+
+    input_tokens: int = 0
+    """Input tokens consumed (model requests, subagents, summarization)."""
+
+    output_tokens: int = 0
+    """Output tokens produced."""
+
+    bytes_returned: int = 0
+    """Size of the returned payload (tool results)."""
+
+    cache_hit: bool | None = None
+    """Whether a cache served the result (None if no cache was involved)."""
+
+    attributes: dict[str, Any] = field(default_factory=dict)
+    """Additional key/value attributes."""
+
+    _perf_start: float = field(default=0.0, repr=False, compare=False)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds (0 while running)."""
+        if self.end_time is None:
+            return 0.0
+        return (self.end_time - self.start_time) * 1000
+
+    def add_usage(self, usage: Any) -> None:
+        """Add token counts from a pydantic-ai usage object."""
+        if usage is None:
+            return
+        self.input_tokens += _usage_value(usage, "input_tokens", "request_tokens")
+        self.output_tokens += _usage_value(usage, "output_tokens", "response_tokens")
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize to a JSON-compatible dict."""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "bytes_returned": self.bytes_returned,
+            "cache_hit": self.cache_hit,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Span | None] = ContextVar("pydantic_deep_current_span", default=None)
+
+
+@runtime_checkable
+class SpanSink(Protocol):
+    """Receives finished spans."""
+
+    def export(self, span: Span) -> None:
+        """Handle a finished span."""
+        ...
+
+
+@dataclass
+class SpanStats:
+    """Aggregated metrics for spans sharing a kind and name."""
+
+    count: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    bytes_returned: int = 0
+    cache_hits: int = 0
+
+    def add(self, span: Span) -> None:
+        """Fold a span into the aggregate."""
+        duration = span.duration_ms
+        self.count += 1
+        self.errors += span.status == "error"
+        self.total_ms += duration
+        self.max_ms = max(self.max_ms, duration)
+        self.input_tokens += span.input_tokens
+        self.output_tokens += span.output_tokens
+        self.bytes_returned += span.bytes_returned
+        self.cache_hits += bool(span.cache_hit)
+
+
+@dataclass
+class RunSummary:
+    """Per-run report aggregated from spans."""
+
+    by_operation: dict[tuple[str, str], SpanStats] = field(default_factory=dict)
+    """Stats keyed by (kind, name)."""
+
+    wall_ms: float = 0.0
+    """Duration of the longest root span seen."""
+
+    def add(self, span: Span) -> None:
+        """Fold a span into the summary."""
+        key = (span.kind, span.name)
+        stats = self.by_operation.get(key)
+        if stats is None:
+            stats = self.by_operation[key] = SpanStats()
+        stats.add(span)
+        if span.parent_id is None:
+            self.wall_ms = max(self.wall_ms, span.duration_ms)
+
+    @classmethod
+    def from_spans(cls, spans: Sequence[Span]) -> RunSummary:
+        """Build a summary from a list of finished spans."""
+        summary = cls()
+        for span in spans:
+            summary.add(span)
+        return summary
+
+    def by_kind(self, kind: str) -> SpanStats:
+        """Aggregate stats over all operations of one kind."""
+        total = SpanStats()
+        for (span_kind, _), stats in self.by_operation.items():
+            if span_kind == kind:
+                total.count += stats.count
+                total.errors += stats.errors
+                total.total_ms += stats.total_ms
+                total.max_ms = max(total.max_ms, stats.max_ms)
+                total.input_tokens += stats.input_tokens
+                total.output_tokens += stats.output_tokens
+                total.bytes_returned += stats.bytes_returned
+                total.cache_hits += stats.cache_hits
+        return total
+
+    @property
+    def input_tokens(self) -> int:
+        """Model input tokens (including subagent and summarization model calls)."""
+        return self.by_kind("model_request").input_tokens
+
+    @property
+    def output_tokens(self) -> int:
+        """Model output tokens."""
+        return self.by_kind("model_request").output_tokens
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize to a JSON-compatible dict."""
+        return {
+            "wall_ms": round(self.wall_ms, 3),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "operations": [
+                {"kind": kind, "name": name, **vars(stats)}
+                for (kind, name), stats in sorted(self.by_operation.items())
+            ],
+        }
+
+    def format(self) -> str:
+        """Render a plain-text report, slowest operations first."""
+        lines = [
+            f"Run took {self.wall_ms:.0f} ms; "
+            f"{self.input_tokens} input / {self.output_tokens} output tokens",
+            "",
+            f"{'kind':<14} {'name':<28} {'calls':>5} {'total ms':>9} {'max ms':>8} "
+            f"{'in tok':>7} {'out tok':>7} {'bytes':>8} {'hits':>4}",
+        ]
+        ranked = sorted(self.by_operation.items(), key=lambda item: -item[1].total_ms)
+        for (kind, name), s in ranked:
+            lines.append(
+                f"{kind:<14} {name[:28]:<28} {s.count:>5} {s.total_ms:>9.1f} {s.max_ms:>8.1f} "
+                f"{s.input_tokens:>7} {s.output_tokens:>7} {s.bytes_returned:>8} "
+                f"{s.cache_hits:>4}"
+            )
+        return "\n".join(lines)
+
+
+class InMemorySink:
+    """Collects spans in memory."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Store the span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self, trace_id: str | None = None) -> RunSummary:
+        """Summarize collected spans, optionally only those of one trace."""
+        spans = [s for s in self.spans if trace_id is None or s.trace_id == trace_id]
+        return RunSummary.from_spans(spans)
+
+    def clear(self) -> None:
+        """Drop collected spans."""
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonlSink:
+    """Appends each span as a JSON line to a file."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = os.fspath(path)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Append the span to the file."""
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTelFileExporter:
+    """Writes spans as OTLP/JSON `ExportTraceServiceRequest` lines.
+
+    The output follows the OpenTelemetry protocol JSON encoding, so the file
+    can be replayed into any OTLP-compatible backend (e.g. with the collector's
+    `otlpjsonfile` receiver) without network access at run time. Token counts
+    use the `gen_ai.usage.*` semantic convention attributes.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], *, service_name: str = "pydantic-deep"
+    ) -> None:
+        self.path = os.fspath(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Append the span as one OTLP/JSON request."""
+        line = json.dumps(self.to_otlp(span), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def to_otlp(self, span: Span) -> dict[str, Any]:
+        """Encode a span as an OTLP/JSON trace request."""
+        attributes: dict[str, Any] = {
+            "pydantic_deep.kind": span.kind,
+            "gen_ai.usage.input_tokens": span.input_tokens,
+            "gen_ai.usage.output_tokens": span.output_tokens,
+            "pydantic_deep.bytes_returned": span.bytes_returned,
+        }
+        if span.cache_hit is not None:
+            attributes["pydantic_deep.cache_hit"] = span.cache_hit
+        attributes.update(span.attributes)
+
+        otlp_span: dict[str, Any] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 3 if span.kind in {"model_request", "subagent"} else 1,  # CLIENT / INTERNAL
+            "startTimeUnixNano": str(int(span.start_time * 1e9)),
+            "endTimeUnixNano": str(int((span.end_time or span.start_time) * 1e9)),
+            "attributes": [_otlp_attribute(k, v) for k, v in attributes.items()],
+            "status": {"code": 2, "message": span.error or ""}
+            if span.status == "error"
+            else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [_otlp_attribute("service.name", self.service_name)]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "pydantic_deep"}, "spans": [otlp_span]},
+                    ],
+                }
+            ]
+        }
+
+
+class Trace:
+    """Handle for a traced run; `summary` is filled in when the trace ends."""
+
+    def __init__(self, root: Span) -> None:
+        self.root = root
+        self.summary = RunSummary()
+
+    @property
+    def trace_id(self) -> str:
+        """Id shared by every span recorded during the trace."""
+        return self.root.trace_id
+
+
+class Instrumentation:
+    """Records spans and exports them to sinks.
+
+    Spans nest through context variables, so spans opened inside a `trace()`
+    (including from tools and subagents running in other tasks) share its
+    trace id and contribute to its `RunSummary`.
+
+    Args:
+        sinks: Destinations for finished spans.
+        enabled: Set to False to make every span a no-op.
+    """
+
+    def __init__(self, sinks: Sequence[SpanSink] = (), *, enabled: bool = True) -> None:
+        self.sinks: list[SpanSink] = list(sinks)
+        self.enabled = enabled
+        self._summaries: dict[str, RunSummary] = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: SpanSink) -> None:
+        """Register an additional sink."""
+        self.sinks.append(sink)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: SpanKind = "internal",
+        **attributes: Any,
+    ) -> Iterator[Span]:
+        """Time the enclosed block as a span.
+
+        Args:
+            name: Operation name.
+            kind: Operation category.
+            **attributes: Extra attributes recorded on the span.
+
+        Yields:
+            The span; set usage fields (tokens, bytes, cache_hit) on it.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            kind=kind,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=attributes,
+            _perf_start=time.perf_counter(),
+        )
+        if not self.enabled:
+            yield span
+            return
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = span.start_time + (time.perf_counter() - span._perf_start)
+            self._finish(span)
+
+    @contextmanager
+    def trace(self, name: str = "agent_run", **attributes: Any) -> Iterator[Trace]:
+        """Group everything in the enclosed block into one trace with a summary.
+
+        Args:
+            name: Name of the root span.
+            **attributes: Extra attributes recorded on the root span.
+
+        Yields:
+            A `Trace`; its `summary` is complete once the block exits.
+        """
+        with self.span(name, "agent_run", **attributes) as root:
+            handle = Trace(root)
+            with self._lock:
+                self._summaries[root.trace_id] = handle.summary
+            try:
+                yield handle
+            finally:
+                with self._lock:
+                    self._summaries.pop(root.trace_id, None)
+        handle.summary.add(root)
+
+    def _finish(self, span: Span) -> None:
+        summary = self._summaries.get(span.trace_id)
+        if summary is not None and span.kind != "agent_run":
+            with self._lock:
+                summary.add(span)
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception:
+                logger.exception("Span sink %r failed", sink)
+
+    def wrap_toolset(self, toolset: AbstractToolset[Any]) -> InstrumentedToolset:
+        """Wrap a toolset so every tool call is recorded as a span."""
+        return InstrumentedToolset(wrapped=toolset, instrumentation=self)
+
+    def wrap_model(self, model: Any) -> InstrumentedModel:
+        """Wrap a model (instance or name) so every request is recorded as a span."""
+        return InstrumentedModel(model, self)
+
+
+def current_span() -> Span | None:
+    """Return the innermost active span, if any."""
+    return _current_span.get()
+
+
+@dataclass
+class InstrumentedToolset(WrapperToolset[Any]):
+    """Toolset wrapper recording a `tool` span per call."""
+
+    instrumentation: Instrumentation = field(default_factory=Instrumentation)
+
+    @property
+    def id(self) -> str | None:
+        return self.wrapped.id
+
+    async def call_tool(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[Any],
+        tool: ToolsetTool[Any],
+    ) -> Any:
+        attributes: dict[str, Any] = {}
+        run_id = getattr(ctx, "run_id", None)
+        if run_id:
+            attributes["run_id"] = run_id
+        with self.instrumentation.span(name, "tool", **attributes) as span:
+            result = await super().call_tool(name, tool_args, ctx, tool)
+            span.bytes_returned = _payload_size(result)
+            return result
+
+
+class InstrumentedModel(WrapperModel):
+    """Model wrapper recording a `model_request` span with token usage per request."""
+
+    def __init__(self, wrapped: Any, instrumentation: Instrumentation) -> None:
+        super().__init__(wrapped)
+        self.instrumentation = instrumentation
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        with self.instrumentation.span(self.model_name, "model_request") as span:
+            response = await super().request(messages, model_settings, model_request_parameters)
+            span.add_usage(response.usage)
+            return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        with self.instrumentation.span(self.model_name, "model_request") as span:
+            async with super().request_stream(
+                messages, model_settings, model_request_parameters, run_context
+            ) as stream:
+                yield stream
+            usage = stream.usage
+            span.add_usage(usage() if callable(usage) else usage)
+
+
+def _usage_value(usage: Any, name: str, legacy_name: str) -> int:
+    value = getattr(usage, name, None)
+    if value is None:
+        value = getattr(usage, legacy_name, None)
+    return int(value or 0)
+
+
+def _payload_size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if not isinstance(value, str):
+        value = str(value)
+    return len(value.encode("utf-8", errors="replace"))
+
+
+def _otlp_attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        encoded: dict[str, Any] = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
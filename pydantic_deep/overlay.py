@@ -0,0 +1,231 @@
+"""Copy-on-write overlay backend for isolated subagent writes.
+
+An `OverlayBackend` wraps a parent backend. Reads fall through to the parent
+without copying anything; writes and edits land in a private in-memory layer.
+When the subagent finishes, the parent merges the layer back with `commit()`,
+which refuses to overwrite files the parent changed in the meantime.
+
+`SandboxOverlayBackend` is the variant used for sandbox backends: file
+operations are isolated the same way, but shell commands run directly in the
+parent sandbox.
+"""
+
+from __future__ import annotations
+
+import glob as globlib
+import hashlib
+from dataclasses import dataclass, field
+
+from pydantic_ai_backends import BackendProtocol, ExecuteResponse, SandboxProtocol, StateBackend
+
+from pydantic_deep.state import VersionedDict
+from pydantic_deep.types import EditResult, FileData, FileInfo, GrepMatch, WriteResult
+
+_MISSING = "<missing>"
+
+
+@dataclass
+class OverlayMergeResult:
+    """Outcome of merging an overlay into its base backend."""
+
+    merged: list[str] = field(default_factory=list)
+    """Paths written to the base backend."""
+
+    conflicts: list[str] = field(default_factory=list)
+    """Paths the base changed after the overlay copied them; left unmerged."""
+
+    errors: dict[str, str] = field(default_factory=dict)
+    """Paths the base backend refused to write, with the error message."""
+
+    @property
+    def ok(self) -> bool:
+        """Whether every overlay change was merged."""
+        return not self.conflicts and not self.errors
+
+
+class OverlayBackend:
+    """Backend that reads through to `base` and keeps its own writes private.
+
+    Files are copied into the overlay only when they are edited, so creating
+    an overlay is O(1) regardless of the size of the parent workspace. For
+    each path the overlay touches, a fingerprint of the base file at that
+    moment is recorded; `commit()` compares it with the current base file to
+    detect conflicting writes from the parent or from sibling overlays.
+
+    Example:
+        ```python
+        overlay = OverlayBackend(parent_backend)
+        overlay.write("/report.md", "draft")
+        result = overlay.commit()
+        if result.conflicts:
+            ...
+        ```
+    """
+
+    def __init__(self, base: BackendProtocol) -> None:
+        self.base = base
+        self._layer = StateBackend()
+        self._layer._files = VersionedDict(name="files")
+        self._base_fingerprints: dict[str, str] = {}
+
+    @property
+    def files(self) -> VersionedDict[str, FileData]:
+        """Files written or edited in the overlay (not yet merged)."""
+        return self._layer._files  # type: ignore[return-value]
+
+    @property
+    def changed_paths(self) -> list[str]:
+        """Sorted paths that differ from the base backend."""
+        return sorted(self.files)
+
+    def _fingerprint(self, path: str) -> str:
+        """Cheap identity of the base file at `path` for conflict detection."""
+        if isinstance(self.base, StateBackend):
+            data = self.base._files.get(path)
+            if data is None:
+                return _MISSING
+            return f"{data['modified_at']}:{len(data['content'])}"
+        content = self.base._read_bytes(path)
+        if not content and not self._base_has(path):
+            return _MISSING
+        return hashlib.sha256(content).hexdigest()
+
+    def _base_has(self, path: str) -> bool:
+        if isinstance(self.base, StateBackend):
+            return path in self.base._files
+        pattern = globlib.escape(path.lstrip("/"))
+        return any(info["path"] == path for info in self.base.glob_info(pattern))
+
+    def _claim(self, path: str) -> None:
+        """Remember the base state of `path` the first time the overlay touches it."""
+        if path not in self._base_fingerprints:
+            self._base_fingerprints[path] = self._fingerprint(path)
+
+    def ls_info(self, path: str) -> list[FileInfo]:
+        """List entries of the base merged with the overlay (overlay wins)."""
+        entries = {info["name"]: info for info in self.base.ls_info(path)}
+        if self.files:
+            entries.update((info["name"], info) for info in self._layer.ls_info(path))
+        return sorted(entries.values(), key=lambda x: (not x["is_dir"], x["name"]))
+
+    def _read_bytes(self, path: str) -> bytes:
+        if _normalize_path(path) in self.files:
+            return self._layer._read_bytes(path)
+        return self.base._read_bytes(path)
+
+    def read(self, path: str, offset: int = 0, limit: int = 2000) -> str:
+        """Read from the overlay if the file was changed there, else from the base."""
+        if _normalize_path(path) in self.files:
+            return self._layer.read(path, offset, limit)
+        return self.base.read(path, offset, limit)
+
+    def write(self, path: str, content: str | bytes) -> WriteResult:
+        """Write to the overlay layer only."""
+        normalized = _normalize_path(path)
+        if normalized not in self.files:
+            self._claim(normalized)
+        return self._layer.write(path, content)
+
+    def edit(
+        self, path: str, old_string: str, new_string: str, replace_all: bool = False
+    ) -> EditResult:
+        """Edit a file, copying it from the base into the overlay first."""
+        normalized = _normalize_path(path)
+        if normalized not in self.files:
+            if not self._base_has(normalized):
+                return EditResult(error=f"File '{normalized}' not found")
+            self._claim(normalized)
+            content = self.base._read_bytes(normalized)
+            result = self._layer.write(normalized, content)
+            if result.error:  # pragma: no cover
+                return EditResult(error=result.error)
+        return self._layer.edit(path, old_string, new_string, replace_all)
+
+    def glob_info(self, pattern: str, path: str = "/") -> list[FileInfo]:
+        """Find files in the base and the overlay (overlay wins)."""
+        matches = {info["path"]: info for info in self.base.glob_info(pattern, path)}
+        if self.files:
+            matches.update((info["path"], info) for info in self._layer.glob_info(pattern, path))
+        return sorted(matches.values(), key=lambda x: x["path"])
+
+    def grep_raw(
+        self, pattern: str, path: str | None = None, glob: str | None = None
+    ) -> list[GrepMatch] | str:
+        """Search the base, substituting overlay contents for changed files."""
+        if path is not None and _normalize_path(path) in self.files:
+            return self._layer.grep_raw(pattern, path, glob)
+        base_matches = self.base.grep_raw(pattern, path, glob)
+        if isinstance(base_matches, str) or not self.files:
+            return base_matches
+        layer_matches = self._layer.grep_raw(pattern, path, glob)
+        if isinstance(layer_matches, str):  # pragma: no cover
+            return layer_matches
+        matches = [m for m in base_matches if m["path"] not in self.files]
+        matches.extend(layer_matches)
+        return sorted(matches, key=lambda m: (m["path"], m["line_number"]))
+
+    def commit(self, *, force: bool = False) -> OverlayMergeResult:
+        """Merge overlay changes into the base backend.
+
+        Files whose base version changed since the overlay copied them are
+        reported as conflicts and kept in the overlay, unless `force` is set.
+        Merged files are removed from the overlay.
+
+        Args:
+            force: Overwrite conflicting base files instead of skipping them.
+
+        Returns:
+            The merged, conflicting and failed paths.
+        """
+        result = OverlayMergeResult()
+        for path in self.changed_paths:
+            if not force and self._fingerprint(path) != self._base_fingerprints.get(path):
+                result.conflicts.append(path)
+                continue
+            write = self.base.write(path, self._layer._read_bytes(path).decode("utf-8"))
+            if write.error:
+                result.errors[path] = write.error
+                continue
+            result.merged.append(path)
+            del self.files[path]
+            self._base_fingerprints.pop(path, None)
+        return result
+
+    def discard(self) -> None:
+        """Drop all overlay changes."""
+        self.files.clear()
+        self._base_fingerprints.clear()
+
+
+class SandboxOverlayBackend(OverlayBackend):
+    """Overlay for sandbox backends that forwards `execute` to the base sandbox.
+
+    Command execution is not isolated: commands run in the parent sandbox, so
+    they do not see files written to the overlay that have not been committed
+    yet, and files they create or modify change the parent directly. Set
+    `copy_on_write=False` on a subagent that relies on running the files it
+    writes.
+    """
+
+    base: SandboxProtocol
+
+    def __init__(self, base: SandboxProtocol) -> None:
+        super().__init__(base)
+
+    @property
+    def id(self) -> str:
+        """Id of the base sandbox."""
+        return self.base.id
+
+    def execute(self, command: str, timeout: int | None = None) -> ExecuteResponse:
+        """Run `command` in the base sandbox."""
+        return self.base.execute(command, timeout)
+
+
+def _normalize_path(path: str) -> str:
+    """Normalize a path the same way `StateBackend` does."""
+    if not path.startswith("/"):
+        path = "/" + path
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return path
@@ -19,7 +19,7 @@ from pydantic_ai.messages import (
 )
 
 if TYPE_CHECKING:
-    pass
+    from pydantic_deep.instrumentation import Instrumentation
 
 
 TokenCounter = Callable[[Sequence[ModelMessage]], int]
@@ -205,6 +205,9 @@ class SummarizationProcessor:
     trim_tokens_to_summarize: int | None = _DEFAULT_TRIM_TOKEN_LIMIT
     """Maximum tokens to include when generating summary. None to skip trimming."""
 
+    instrumentation: Instrumentation | None = None
+    """Records a `summarization` span each time history is summarized."""
+
     _trigger_conditions: list[ContextSize] = field(default_factory=list, init=False)
     _summarization_agent: Agent[None, str] | None = field(default=None, init=False)
 
@@ -364,8 +367,11 @@ class SummarizationProcessor:
     def _get_summarization_agent(self) -> Agent[None, str]:  # pragma: no cover
         """Get or create the summarization agent."""
         if self._summarization_agent is None:
+            model: Any = self.model
+            if self.instrumentation is not None:
+                model = self.instrumentation.wrap_model(model)
             self._summarization_agent = Agent(
-                self.model,
+                model,
                 instructions=(
                     "You are a context summarization assistant. "
                     "Extract the most important information from conversations."
@@ -414,7 +420,19 @@ class SummarizationProcessor:
         messages_to_summarize = messages[:cutoff_index]  # pragma: no cover
         preserved_messages = messages[cutoff_index:]  # pragma: no cover
 
-        summary = await self._create_summary(messages_to_summarize)  # pragma: no cover
+        if self.instrumentation is None:  # pragma: no cover
+            summary = await self._create_summary(messages_to_summarize)
+        else:  # pragma: no cover
+            with self.instrumentation.span(
+                "summarize_history",
+                "summarization",
+                tokens_before=total_tokens,
+                messages_summarized=len(messages_to_summarize),
+            ) as span:
+                summary = await self._create_summary(messages_to_summarize)
+                span.attributes["tokens_after"] = (
+                    self.token_counter(preserved_messages) + len(summary) // 4
+                )
 
         # Create a summary message
         summary_message = ModelRequest(  # pragma: no cover
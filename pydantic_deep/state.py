@@ -0,0 +1,243 @@
+"""Versioned, observable state containers for deep agent dependencies.
+
+`DeepAgentDeps` stores its mutable state (files, todos, uploads, subagents) in
+these containers. Each container keeps a monotonic `version` counter that is
+bumped on every mutation and notifies subscribers with a `StateChange` event,
+so consumers can skip recomputation when nothing changed or push updates
+instead of polling.
+"""
+
+from __future__ import annotations
+
+import itertools
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any, Literal, SupportsIndex, TypeVar, overload
+
+K = TypeVar("K")
+V = TypeVar("V")
+T = TypeVar("T")
+
+ChangeKind = Literal["set", "delete", "insert", "replace", "clear", "touch"]
+
+
+@dataclass(frozen=True)
+class StateChange:
+    """A single mutation of a versioned container."""
+
+    container: str
+    """Name of the container that changed (e.g. "files", "todos")."""
+
+    version: int
+    """Container version after the change."""
+
+    kind: ChangeKind
+    """Type of mutation."""
+
+    key: Any = None
+    """Affected key (dicts) or index (lists), if the change targets a single item."""
+
+
+StateListener = Callable[[StateChange], None]
+
+_container_ids = itertools.count(1)
+
+
+class _Observable:
+    """Version counter and subscriber registry shared by the containers."""
+
+    def _init_observable(self, name: str) -> None:
+        self.name = name
+        self._version = 0
+        self._uid = next(_container_ids)
+        self._listeners: list[StateListener] = []
+
+    @property
+    def version(self) -> int:
+        """Monotonic generation counter, incremented on every mutation."""
+        return self._version
+
+    @property
+    def uid(self) -> int:
+        """Process-unique id of this container; `(uid, version)` identifies a snapshot."""
+        return self._uid
+
+    def subscribe(self, listener: StateListener) -> Callable[[], None]:
+        """Register a listener called after every mutation.
+
+        Args:
+            listener: Callable receiving a `StateChange`.
+
+        Returns:
+            A callable that removes the listener.
+        """
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def _changed(self, kind: ChangeKind, key: Any = None) -> None:
+        self._version += 1
+        if not self._listeners:
+            return
+        event = StateChange(container=self.name, version=self._version, kind=kind, key=key)
+        for listener in list(self._listeners):
+            listener(event)
+
+
+class VersionedDict(dict[K, V], _Observable):
+    """A `dict` that tracks a version counter and notifies subscribers on change.
+
+    It is a real `dict` subclass, so it can be handed to code that expects a
+    plain dictionary (e.g. `StateBackend._files`) while still observing writes.
+
+    Nested values are not tracked; call `touch(key)` after mutating a value
+    in place.
+    """
+
+    def __init__(self, data: Mapping[K, V] | Iterable[tuple[K, V]] = (), *, name: str = "") -> None:
+        super().__init__(data)
+        self._init_observable(name)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        super().__setitem__(key, value)
+        self._changed("set", key)
+
+    def __delitem__(self, key: K) -> None:
+        super().__delitem__(key)
+        self._changed("delete", key)
+
+    def __ior__(self, other: Any) -> VersionedDict[K, V]:  # type: ignore[override,misc]
+        self.update(other)
+        return self
+
+    def touch(self, key: K) -> None:
+        """Record an in-place modification of the value stored under `key`."""
+        self._changed("touch", key)
+
+    def pop(self, key: K, *default: Any) -> Any:  # type: ignore[override]
+        missing = key not in self
+        value = super().pop(key, *default)
+        if not missing:
+            self._changed("delete", key)
+        return value
+
+    def popitem(self) -> tuple[K, V]:
+        key, value = super().popitem()
+        self._changed("delete", key)
+        return key, value
+
+    def setdefault(self, key: K, default: Any = None) -> Any:  # type: ignore[override]
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        if args or kwargs:
+            self._changed("replace")
+
+    def clear(self) -> None:
+        if not self:
+            return
+        super().clear()
+        self._changed("clear")
+
+    def replace(self, data: Mapping[K, V]) -> None:
+        """Replace all contents with `data` as a single change."""
+        super().clear()
+        super().update(data)
+        self._changed("replace")
+
+    def __reduce__(self) -> Any:
+        return (self.__class__, (dict(self),), {"name": self.name})
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self._init_observable(state.get("name", ""))
+
+
+class VersionedList(list[T], _Observable):
+    """A `list` that tracks a version counter and notifies subscribers on change."""
+
+    def __init__(self, data: Iterable[T] = (), *, name: str = "") -> None:
+        super().__init__(data)
+        self._init_observable(name)
+
+    @overload
+    def __setitem__(self, index: SupportsIndex, value: T) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[T]) -> None: ...
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        super().__setitem__(index, value)
+        self._changed("set", None if isinstance(index, slice) else index)
+
+    def __delitem__(self, index: SupportsIndex | slice) -> None:
+        super().__delitem__(index)
+        self._changed("delete", None if isinstance(index, slice) else index)
+
+    def __iadd__(self, other: Iterable[T]) -> VersionedList[T]:  # type: ignore[override,misc]
+        self.extend(other)
+        return self
+
+    def __imul__(self, n: SupportsIndex) -> VersionedList[T]:  # type: ignore[override,misc]
+        super().__imul__(n)
+        self._changed("replace")
+        return self
+
+    def append(self, value: T) -> None:
+        super().append(value)
+        self._changed("insert", len(self) - 1)
+
+    def extend(self, values: Iterable[T]) -> None:
+        before = len(self)
+        super().extend(values)
+        if len(self) != before:
+            self._changed("insert")
+
+    def insert(self, index: SupportsIndex, value: T) -> None:
+        super().insert(index, value)
+        self._changed("insert", index)
+
+    def remove(self, value: T) -> None:
+        super().remove(value)
+        self._changed("delete")
+
+    def pop(self, index: SupportsIndex = -1) -> T:
+        value = super().pop(index)
+        self._changed("delete", index)
+        return value
+
+    def clear(self) -> None:
+        if not self:
+            return
+        super().clear()
+        self._changed("clear")
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._changed("replace")
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed("replace")
+
+    def touch(self, index: int | None = None) -> None:
+        """Record an in-place modification of an item."""
+        self._changed("touch", index)
+
+    def replace(self, data: Iterable[T]) -> None:
+        """Replace all contents with `data` as a single change."""
+        super().__setitem__(slice(None), list(data))
+        self._changed("replace")
+
+    def __reduce__(self) -> Any:
+        return (self.__class__, (list(self),), {"name": self.name})
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self._init_observable(state.get("name", ""))
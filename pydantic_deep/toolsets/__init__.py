@@ -3,13 +3,34 @@
 # Re-export from pydantic-ai-todo
 from pydantic_ai_todo import create_todo_toolset as TodoToolset
 
+from pydantic_deep.toolsets.budget import OutputBudget, OutputBudgetToolset
 from pydantic_deep.toolsets.filesystem import FilesystemToolset
-from pydantic_deep.toolsets.skills import SkillsToolset
-from pydantic_deep.toolsets.subagents import SubAgentToolset
+from pydantic_deep.toolsets.skill_bundles import SkillBundle
+from pydantic_deep.toolsets.skill_sync import SkillMaterializer
+from pydantic_deep.toolsets.skills import (
+    SkillIndex,
+    SkillRegistry,
+    SkillSearchIndex,
+    SkillsToolset,
+)
+from pydantic_deep.toolsets.subagents import (
+    SubAgentRegistry,
+    SubAgentResultCache,
+    SubAgentToolset,
+)
 
 __all__ = [
     "TodoToolset",
     "FilesystemToolset",
     "SubAgentToolset",
+    "SubAgentRegistry",
+    "SubAgentResultCache",
     "SkillsToolset",
+    "SkillBundle",
+    "SkillIndex",
+    "SkillMaterializer",
+    "SkillRegistry",
+    "SkillSearchIndex",
+    "OutputBudget",
+    "OutputBudgetToolset",
 ]
@@ -0,0 +1,164 @@
+"""Output budgets for tool results.
+
+`OutputBudgetToolset` wraps any toolset and keeps tool results from flooding
+the model context. Each result is checked against a per-call token limit and
+against what is left of the per-turn limit (all tool calls answering one
+model response). Oversized results are saved to a file in the agent's
+backend and replaced by a preview plus the file path, so the model can page
+through the full output with `read_file` or `grep` when it needs to.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_ai import RunContext
+from pydantic_ai.toolsets import AbstractToolset, ToolsetTool, WrapperToolset
+from pydantic_core import to_jsonable_python
+
+_CHARS_PER_TOKEN = 4
+_MAX_TRACKED_RUNS = 1024
+
+
+@dataclass
+class OutputBudget:
+    """Token limits for tool results.
+
+    Token counts are estimated as characters / 4.
+
+    Example:
+        ```python
+        agent = create_deep_agent(
+            output_budget=OutputBudget(max_tokens_per_call=4000, per_tool={"execute": 2000}),
+        )
+        ```
+    """
+
+    max_tokens_per_call: int = 8_000
+    """Largest result a single tool call may return."""
+
+    max_tokens_per_turn: int = 24_000
+    """Largest combined result of all tool calls answering one model response."""
+
+    per_tool: dict[str, int] = field(default_factory=dict)
+    """Per-tool overrides of `max_tokens_per_call`."""
+
+    preview_tokens: int = 500
+    """Size of the preview returned in place of a spilled result."""
+
+    spill_dir: str = "/tool_outputs"
+    """Backend directory where oversized results are saved."""
+
+    truncate_only: frozenset[str] = frozenset({"read_file"})
+    """Tools whose oversized results are truncated instead of spilled.
+
+    `read_file` already pages with `offset`/`limit`, so saving its output to
+    another file would only add a level of indirection.
+    """
+
+    _turns: OrderedDict[str, tuple[int, int]] = field(
+        default_factory=OrderedDict, init=False, repr=False, compare=False
+    )
+    """Tokens used per run in its current step, shared by every wrapped toolset."""
+
+    def limit_for(self, tool_name: str) -> int:
+        """Return the per-call token limit for `tool_name`."""
+        return self.per_tool.get(tool_name, self.max_tokens_per_call)
+
+    def used_this_turn(self, ctx: RunContext[Any]) -> int:
+        """Return the tokens already returned by tools in the current turn of `ctx`'s run."""
+        step, used = self._turns.get(ctx.run_id or "", (ctx.run_step, 0))
+        return used if step == ctx.run_step else 0
+
+    def record_turn_usage(self, ctx: RunContext[Any], used: int) -> None:
+        """Store the tokens used so far in the current turn of `ctx`'s run."""
+        key = ctx.run_id or ""
+        self._turns[key] = (ctx.run_step, used)
+        self._turns.move_to_end(key)
+        while len(self._turns) > _MAX_TRACKED_RUNS:
+            self._turns.popitem(last=False)
+
+    def wrap_toolset(self, toolset: AbstractToolset[Any]) -> OutputBudgetToolset:
+        """Wrap a toolset so its results are kept within this budget."""
+        return OutputBudgetToolset(wrapped=toolset, budget=self)
+
+
+@dataclass
+class OutputBudgetToolset(WrapperToolset[Any]):
+    """Toolset wrapper enforcing an `OutputBudget` on every tool result.
+
+    Only text and JSON-serializable results are budgeted; other results
+    (e.g. binary content) pass through unchanged. Results are spilled to
+    `ctx.deps.backend` when the deps have one and truncated otherwise.
+    """
+
+    budget: OutputBudget = field(default_factory=OutputBudget)
+
+    @property
+    def id(self) -> str | None:
+        return self.wrapped.id
+
+    async def call_tool(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[Any],
+        tool: ToolsetTool[Any],
+    ) -> Any:
+        result = await super().call_tool(name, tool_args, ctx, tool)
+        text = _result_text(result)
+        if text is None:
+            return result
+
+        used = self.budget.used_this_turn(ctx)
+        remaining = self.budget.max_tokens_per_turn - used
+        allowed = min(self.budget.limit_for(name), max(remaining, self.budget.preview_tokens))
+        if len(text) > allowed * _CHARS_PER_TOKEN:
+            text = self._shrink(ctx, name, text, allowed, json_result=not isinstance(result, str))
+            result = text
+        self.budget.record_turn_usage(ctx, used + len(text) // _CHARS_PER_TOKEN)
+        return result
+
+    def _shrink(
+        self, ctx: RunContext[Any], name: str, text: str, allowed: int, *, json_result: bool
+    ) -> str:
+        """Spill `text` to the backend, or truncate it, to fit `allowed` tokens."""
+        max_chars = allowed * _CHARS_PER_TOKEN
+        total_tokens = len(text) // _CHARS_PER_TOKEN
+        backend = getattr(ctx.deps, "backend", None)
+
+        if name not in self.budget.truncate_only and backend is not None:
+            extension = "json" if json_result else "txt"
+            path = f"{self.budget.spill_dir.rstrip('/')}/{name}-{uuid.uuid4().hex[:8]}.{extension}"
+            write = backend.write(path, text)
+            if not write.error:
+                pointer = (
+                    f"\n\n[Output of {name} (~{total_tokens} tokens) exceeded its budget; "
+                    f"full result saved to {write.path}. "
+                    "Use read_file with offset/limit or grep to inspect it.]"
+                )
+                preview_chars = min(self.budget.preview_tokens * _CHARS_PER_TOKEN, max_chars)
+                return text[: max(0, preview_chars - len(pointer))] + pointer
+
+        omitted = len(text) - max_chars
+        hint = " Use offset and limit to read the rest." if name == "read_file" else ""
+        return text[:max_chars] + f"\n\n[... {omitted} more characters truncated.{hint}]"
+
+
+def _result_text(result: Any) -> str | None:
+    """Render a tool result as the text the model sees, or None if it is not budgetable."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, BaseModel):
+        return result.model_dump_json()
+    if isinstance(result, (dict, list, tuple)):
+        try:
+            return json.dumps(to_jsonable_python(result))
+        except Exception:
+            return None
+    return None
@@ -152,6 +152,10 @@ def create_filesystem_toolset(  # noqa: C901
         if result.error:
             return f"Error: {result.error}"
 
+        # StateBackend edits file data in place; record it on the versioned files dict
+        if result.path in ctx.deps.files:
+            ctx.deps.files.touch(result.path)  # type: ignore[attr-defined]
+
         return f"Edited {result.path}: replaced {result.occurrences} occurrence(s)"
 
     @toolset.tool
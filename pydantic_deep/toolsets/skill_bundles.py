@@ -0,0 +1,234 @@
+"""Skills packed into a single zip or tar archive.
+
+A skill bundle is an archive holding a skill folder: `SKILL.md` plus its
+resources, either at the top level of the archive or inside one top-level
+directory. Bundles are discovered next to regular skill folders.
+
+Only the archive's member table is read during discovery, plus the
+frontmatter at the start of `SKILL.md`; nothing is extracted. Resources are
+read lazily: byte ranges directly at the member's offset, and line ranges
+from a copy of the member extracted on first use into a cache directory
+keyed by the bundle's content hash, which processes on the same machine
+share.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+BUNDLE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+"""File name suffixes recognized as skill bundles."""
+
+DEFAULT_BUNDLE_CACHE_DIR = "~/.pydantic-deep/cache/bundles"
+"""Where bundle members are extracted for line-based reads."""
+
+_HASH_CHUNK = 1024 * 1024
+_OPEN_BUNDLES_SIZE = 64
+_open_bundles: OrderedDict[str, tuple[int, int, SkillBundle]] = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def is_skill_bundle(path: str | os.PathLike[str]) -> bool:
+    """Return True if `path` has a skill bundle file name suffix."""
+    return os.fspath(path).lower().endswith(BUNDLE_SUFFIXES)
+
+
+@dataclass(frozen=True)
+class BundleMember:
+    """A file inside a skill bundle."""
+
+    name: str
+    """Name relative to the skill root (e.g. "templates/report.md")."""
+
+    size: int
+    """Uncompressed size in bytes."""
+
+    archive_name: str
+    """Full member name inside the archive."""
+
+    data_offset: int | None = None
+    """Offset of the raw data in the archive file, when members are stored uncompressed."""
+
+
+class SkillBundle:
+    """Read-only view of a zip or tar skill bundle.
+
+    Use `SkillBundle.open(path)` to share one instance per unchanged file.
+
+    Example:
+        ```python
+        bundle = SkillBundle.open("skills/pdf.zip")
+        frontmatter, _ = parse_skill_md(bundle.read_text("SKILL.md"))
+        chunk = bundle.read_bytes("data/table.csv", start=1024, length=4096)
+        ```
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = os.path.abspath(os.fspath(path))
+        stat = os.stat(self.path)
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self._hash: str | None = None
+        self._lock = threading.Lock()
+        self.is_zip = zipfile.is_zipfile(self.path)
+        self.members = self._read_members()
+
+    @classmethod
+    def open(cls, path: str | os.PathLike[str]) -> SkillBundle:
+        """Return a bundle for `path`, reusing the last one while the file is unchanged."""
+        key = os.path.abspath(os.fspath(path))
+        stat = os.stat(key)
+        with _open_lock:
+            cached = _open_bundles.get(key)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                _open_bundles.move_to_end(key)
+                return cached[2]
+        bundle = cls(key)
+        with _open_lock:
+            _open_bundles[key] = (bundle.mtime_ns, bundle.size, bundle)
+            while len(_open_bundles) > _OPEN_BUNDLES_SIZE:
+                _open_bundles.popitem(last=False)
+        return bundle
+
+    @property
+    def resources(self) -> list[str]:
+        """Names of all members except SKILL.md, sorted."""
+        return sorted(name for name in self.members if name != "SKILL.md")
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the archive file, computed once per instance."""
+        with self._lock:
+            if self._hash is None:
+                digest = hashlib.sha256()
+                with open(self.path, "rb") as f:
+                    while chunk := f.read(_HASH_CHUNK):
+                        digest.update(chunk)
+                self._hash = digest.hexdigest()
+            return self._hash
+
+    def read_bytes(self, name: str, start: int = 0, length: int | None = None) -> bytes:
+        """Read `length` bytes of member `name` from `start` (to the end if None).
+
+        Raises:
+            KeyError: If the bundle has no member `name`.
+        """
+        member = self.members[name]
+        start = min(max(start, 0), member.size)
+        end = member.size if length is None else min(member.size, start + max(length, 0))
+        if member.data_offset is not None:
+            with open(self.path, "rb") as f:
+                f.seek(member.data_offset + start)
+                return f.read(end - start)
+        with self._open_member(member) as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    @contextmanager
+    def _open_member(self, member: BundleMember) -> Iterator[IO[bytes]]:
+        """Open member data as a stream, decompressing from its start."""
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as zf, zf.open(member.archive_name) as f:
+                yield f
+            return
+        with tarfile.open(self.path) as tf:
+            extracted = tf.extractfile(member.archive_name)
+            assert extracted is not None
+            with extracted as f:
+                yield f
+
+    def read_text(self, name: str) -> str:
+        """Read member `name` as UTF-8 text."""
+        return self.read_bytes(name).decode("utf-8", errors="replace")
+
+    def extract(self, name: str, cache_dir: str | os.PathLike[str] | None = None) -> Path:
+        """Extract member `name` once and return the path of the copy.
+
+        Copies live under `cache_dir/<content_hash>/`, so every process reading
+        the same bundle reuses them.
+        """
+        member = self.members[name]
+        root = Path(cache_dir or DEFAULT_BUNDLE_CACHE_DIR).expanduser() / self.content_hash
+        target = root / name
+        if target.is_file() and target.stat().st_size == member.size:
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        # Stream the member in one pass; compressed members cannot be read at an offset
+        with open(tmp, "wb") as out, self._open_member(member) as f:
+            shutil.copyfileobj(f, out, _HASH_CHUNK)
+        os.replace(tmp, target)
+        return target
+
+    def _read_members(self) -> dict[str, BundleMember]:
+        """List the archive's files, relative to the folder holding SKILL.md."""
+        entries: list[tuple[str, int, int | None]] = []
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    offset = None
+                    if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                        offset = _zip_data_offset(self.path, info)
+                    entries.append((info.filename, info.file_size, offset))
+        else:
+            try:
+                # Members of uncompressed tars can be read at their data offset
+                entries = _tar_entries(self.path, "r:", with_offsets=True)
+            except tarfile.ReadError:
+                entries = _tar_entries(self.path, "r:*", with_offsets=False)
+
+        # Never expose names that would escape the extraction directory
+        entries = [
+            entry
+            for entry in entries
+            if not entry[0].startswith("/") and ".." not in entry[0].split("/")
+        ]
+        names = [name for name, _, _ in entries]
+        prefix = _skill_prefix(names)
+        return {
+            name[len(prefix) :]: BundleMember(name[len(prefix) :], size, name, offset)
+            for name, size, offset in entries
+            if name.startswith(prefix) and len(name) > len(prefix)
+        }
+
+
+def _tar_entries(path: str, mode: str, *, with_offsets: bool) -> list[tuple[str, int, int | None]]:
+    """Return (name, size, data offset) of the regular files in a tar archive."""
+    with tarfile.open(path, mode) as tf:  # type: ignore[call-overload]
+        return [
+            (info.name, info.size, info.offset_data if with_offsets else None)
+            for info in tf.getmembers()
+            if info.isfile()
+        ]
+
+
+def _skill_prefix(names: list[str]) -> str:
+    """Return the member name prefix of the skill root ("" or "folder/")."""
+    if "SKILL.md" in names:
+        return ""
+    roots = [name[: -len("SKILL.md")] for name in names if name.endswith("/SKILL.md")]
+    top_level = [root for root in roots if root.count("/") == 1]
+    return top_level[0] if top_level else ""
+
+
+def _zip_data_offset(path: str, info: zipfile.ZipInfo) -> int:
+    """Return where the data of a stored zip member starts in the file."""
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+    name_length = int.from_bytes(header[26:28], "little")
+    extra_length = int.from_bytes(header[28:30], "little")
+    return info.header_offset + 30 + name_length + extra_length
@@ -0,0 +1,266 @@
+"""Copy skills into agent backends, once per skill version.
+
+Skills live on the host, but scripts bundled with a skill often need to run
+inside a sandbox backend. `SkillMaterializer` copies a skill's files into the
+backend the first time the skill is loaded and writes a marker holding the
+skill's content hash next to them. Later loads into a backend that still
+holds the files (the same sandbox, or a persistent volume shared by several
+sessions) find the marker and skip the copy.
+
+Backends that start empty, such as a new container per session, would get a
+full copy on their first load. For those, set `host_dir`: skills are copied
+once per version into that host directory, which every container
+bind-mounts at `root` (see `SkillMaterializer.volumes`), and nothing is
+written through the backend at all.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shlex
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_deep.overlay import OverlayBackend
+from pydantic_deep.toolsets.skill_bundles import SkillBundle
+from pydantic_deep.types import Skill
+
+MARKER_NAME = ".skill-hash"
+"""File written next to a materialized skill, holding its content hash."""
+
+_FILE_DIGESTS_SIZE = 4096
+_file_digests: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+_digest_lock = threading.Lock()
+
+# Skill names used as backend directory names: no separators, no "." or ".."
+_SKILL_DIR_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def skill_content_hash(skill: Skill) -> str:
+    """Return a SHA-256 identifying the contents of a skill.
+
+    Bundles hash their archive. Folder skills hash the names and contents of
+    every file below the folder; each file's digest is cached until its mtime
+    or size changes, so re-hashing an unchanged skill costs one `stat` per file.
+    """
+    if os.path.isfile(skill["path"]):
+        return skill.get("content_hash") or SkillBundle.open(skill["path"]).content_hash
+
+    digest = hashlib.sha256()
+    for name, path in _folder_files(skill["path"]):
+        digest.update(name.encode("utf-8") + b"\0" + _file_digest(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+@dataclass
+class SkillMaterializer:
+    """Copies skills into a backend under `root`, skipping unchanged skills.
+
+    Example:
+        ```python
+        agent = create_deep_agent(
+            backend=DockerSandbox(image="python:3.12-slim"),
+            skill_directories=[{"path": "./skills"}],
+            skill_materializer=SkillMaterializer(root="/workspace/skills"),
+        )
+        ```
+
+        With a container per session, share one host copy instead:
+        ```python
+        materializer = SkillMaterializer(root="/skills", host_dir="/var/cache/skills")
+        sandbox = DockerSandbox(volumes=materializer.volumes)
+        ```
+    """
+
+    root: str = "/skills"
+    """Backend directory the skills are copied into (one sub-directory per skill)."""
+
+    host_dir: str | None = None
+    """Host directory bind-mounted at `root` in every backend.
+
+    When set, skills are copied into this directory on the host, once per
+    version across all sessions and processes, instead of into each backend.
+    """
+
+    files_written: int = field(default=0, init=False)
+    """Number of files copied into backends so far."""
+
+    _synced: dict[tuple[str, str], str] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def target(self, skill: Skill) -> str:
+        """Return the backend directory for `skill`.
+
+        Raises:
+            ValueError: If the skill name is not a safe directory name.
+        """
+        name = skill["name"]
+        if not _SKILL_DIR_RE.match(name):
+            raise ValueError(f"Skill name {name!r} cannot be used as a directory name")
+        return f"{self.root.rstrip('/')}/{name}"
+
+    @property
+    def volumes(self) -> dict[str, str]:
+        """Volume mapping (host path to container path) that exposes `host_dir` at `root`."""
+        if self.host_dir is None:
+            return {}
+        return {os.path.abspath(self.host_dir): self.root}
+
+    def materialize(self, backend: Any, skill: Skill) -> str:
+        """Make sure `skill` is present in `backend` and return its directory there.
+
+        Sandboxes (backends with an `id`) are remembered in process, so
+        repeated loads cost nothing. Other backends are checked through the
+        marker file, one small read per load.
+
+        With `host_dir` set, only the shared host copy is checked (and
+        refreshed when the skill changed); `backend` is not touched.
+
+        Copy-on-write overlays of a sandbox share its `id` and run commands
+        in it, but keep written files private. They are always checked
+        through the marker, and old files are not removed from them, since
+        `rm -rf` would run on the parent sandbox.
+
+        Raises:
+            OSError: If a file could not be written to the backend.
+            ValueError: If the skill name is not a safe directory name.
+        """
+        target = self.target(skill)
+        digest = skill_content_hash(skill)
+        if self.host_dir is not None:
+            self._materialize_on_host(self.host_dir, skill, digest)
+            return target
+
+        overlay = isinstance(backend, OverlayBackend)
+        backend_id = getattr(backend, "id", None)
+        key = (backend_id, target) if isinstance(backend_id, str) and not overlay else None
+
+        with self._lock:
+            if key is not None and self._synced.get(key) == digest:
+                return target
+            marker = f"{target}/{MARKER_NAME}"
+            if _read_marker(backend, marker) != digest:
+                if hasattr(backend, "execute") and not overlay:
+                    # Drop files of an older version of the skill
+                    backend.execute(f"rm -rf {shlex.quote(target)}")
+                for name, data in _skill_files(skill):
+                    self._write(backend, f"{target}/{name}", data)
+                self._write(backend, marker, digest.encode("ascii"))
+            if key is not None:
+                self._synced[key] = digest
+        return target
+
+    def _materialize_on_host(self, host_dir: str, skill: Skill, digest: str) -> None:
+        """Copy `skill` into `host_dir` unless that copy is already current."""
+        key = (host_dir, skill["name"])
+        with self._lock:
+            if self._synced.get(key) == digest:
+                return
+            folder = os.path.join(host_dir, skill["name"])
+            if _read_host_marker(folder) != digest:
+                self._copy_to_host(skill, folder, digest)
+            self._synced[key] = digest
+
+    def _copy_to_host(self, skill: Skill, folder: str, digest: str) -> None:
+        # Build the new copy next to the old one and swap it in, so containers
+        # (and other processes) never see a half-written skill
+        parent = os.path.dirname(folder)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{skill['name']}.", dir=parent)
+        try:
+            for name, data in _skill_files(skill):
+                path = os.path.join(staging, *name.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                self.files_written += 1
+            with open(os.path.join(staging, MARKER_NAME), "w", encoding="ascii") as f:
+                f.write(digest)
+            self.files_written += 1
+            os.chmod(staging, 0o755)  # mkdtemp creates 0700; containers may use another user
+            old = f"{staging}.old"
+            if os.path.exists(folder):
+                os.replace(folder, old)
+            os.replace(staging, folder)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        shutil.rmtree(old, ignore_errors=True)
+
+    def _write(self, backend: Any, path: str, data: bytes) -> None:
+        try:
+            content: str | bytes = data.decode("utf-8")
+        except UnicodeDecodeError:
+            content = data
+        result = backend.write(path, content)
+        if result.error:
+            raise OSError(f"Could not write {path}: {result.error}")
+        self.files_written += 1
+
+
+def _read_marker(backend: Any, path: str) -> str | None:
+    try:
+        content = backend._read_bytes(path)
+    except Exception:
+        return None
+    if not isinstance(content, bytes):  # pragma: no cover
+        return None
+    return content.decode("utf-8", errors="replace").strip()
+
+
+def _read_host_marker(folder: str) -> str | None:
+    try:
+        with open(os.path.join(folder, MARKER_NAME), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _skill_files(skill: Skill) -> Iterator[tuple[str, bytes]]:
+    """Yield (relative name, content) for every file of a skill."""
+    if os.path.isfile(skill["path"]):
+        bundle = SkillBundle.open(skill["path"])
+        for name in sorted(bundle.members):
+            yield name, bundle.read_bytes(name)
+        return
+    for name, path in _folder_files(skill["path"]):
+        with open(path, "rb") as f:
+            yield name, f.read()
+
+
+def _folder_files(folder: str) -> list[tuple[str, str]]:
+    """Return (relative name, path) of the files below `folder`, sorted by name."""
+    files: list[tuple[str, str]] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            files.append((os.path.relpath(path, folder).replace(os.sep, "/"), path))
+    return sorted(files)
+
+
+def _file_digest(path: str) -> str:
+    stat = os.stat(path)
+    with _digest_lock:
+        cached = _file_digests.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            _file_digests.move_to_end(path)
+            return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _digest_lock:
+        _file_digests[path] = (stat.st_mtime_ns, stat.st_size, value)
+        _file_digests.move_to_end(path)
+        while len(_file_digests) > _FILE_DIGESTS_SIZE:
+            _file_digests.popitem(last=False)
+    return value
@@ -10,7 +10,22 @@ instructions are loaded on-demand when the agent needs them.
 
 from __future__ import annotations
 
+import contextlib
+import copy
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
 import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
@@ -18,12 +33,17 @@ from pydantic_ai import RunContext
 from pydantic_ai.toolsets import FunctionToolset
 
 from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.instrumentation import Instrumentation, Span
+from pydantic_deep.toolsets.skill_bundles import SkillBundle, is_skill_bundle
+from pydantic_deep.toolsets.skill_sync import SkillMaterializer
 from pydantic_deep.types import Skill, SkillDirectory
 
 if TYPE_CHECKING:
     pass
 
 
+logger = logging.getLogger(__name__)
+
 # Default skills directory (can be overridden)
 DEFAULT_SKILLS_DIR = "~/.pydantic-deep/skills"
 
@@ -31,6 +51,12 @@ DEFAULT_SKILLS_DIR = "~/.pydantic-deep/skills"
 def parse_skill_md(content: str) -> tuple[dict[str, Any], str]:
     """Parse a SKILL.md file into frontmatter and instructions.
 
+    Frontmatter in the common subset (`key: value` lines and `- item` lists)
+    is parsed without dependencies. Anything else (inline lists, block
+    strings, nested maps) is parsed with PyYAML when it is installed. All
+    scalars are kept as strings. Parsed frontmatter is cached by content
+    hash, so re-reading an unchanged SKILL.md does not parse it again.
+
     Args:
         content: Full content of the SKILL.md file.
 
@@ -45,30 +71,82 @@ def parse_skill_md(content: str) -> tuple[dict[str, Any], str]:
         # No frontmatter, treat entire content as instructions
         return {}, content.strip()
 
-    frontmatter_yaml = match.group(1)
     instructions = content[match.end() :].strip()
+    return parse_frontmatter(match.group(1)), instructions
+
+
+_FRONTMATTER_CACHE_SIZE = 1024
+_frontmatter_cache: OrderedDict[bytes, dict[str, Any]] = OrderedDict()
+_frontmatter_lock = threading.Lock()
+
+_SIMPLE_KEY_RE = re.compile(r"^([A-Za-z_][\w.-]*):(?:[ \t]+(.*))?$")
+_SIMPLE_ITEM_RE = re.compile(r"^[ \t]*- (.*)$")
+_SIMPLE_VALUE_RE = re.compile(r"""^(?:"[^"\\]*"|'[^']*'|[^\s"'\[\]{}|>&*!%@`#-](?:(?!\s\#).)*)?$""")
+
+
+def parse_frontmatter(text: str) -> dict[str, Any]:
+    """Parse the YAML between the `---` delimiters of a SKILL.md file.
+
+    Args:
+        text: Frontmatter text, without the delimiters.
 
-    # Parse YAML manually (simple key: value format)
+    Returns:
+        The frontmatter as a dict (empty if it is not a mapping).
+    """
+    key = hashlib.blake2b(text.encode("utf-8", errors="replace"), digest_size=16).digest()
+    with _frontmatter_lock:
+        cached = _frontmatter_cache.get(key)
+        if cached is not None:
+            _frontmatter_cache.move_to_end(key)
+            return copy.deepcopy(cached)
+
+    frontmatter = _parse_simple_frontmatter(text, strict=True)
+    if frontmatter is None:
+        frontmatter = _parse_yaml_frontmatter(text)
+    if frontmatter is None:
+        frontmatter = _parse_simple_frontmatter(text, strict=False) or {}
+
+    with _frontmatter_lock:
+        _frontmatter_cache[key] = frontmatter
+        while len(_frontmatter_cache) > _FRONTMATTER_CACHE_SIZE:
+            _frontmatter_cache.popitem(last=False)
+    return copy.deepcopy(frontmatter)
+
+
+def _parse_simple_frontmatter(text: str, *, strict: bool) -> dict[str, Any] | None:
+    """Parse `key: value` lines and `- item` lists.
+
+    With `strict`, returns None as soon as a line falls outside that subset,
+    so the caller can hand the text to a real YAML parser. Otherwise such
+    lines are skipped (the best effort used when PyYAML is not installed).
+    """
     frontmatter: dict[str, Any] = {}
     current_key = None
-    current_list: list[str] | None = None
+    current_list: list[Any] | None = None
 
-    for line in frontmatter_yaml.split("\n"):
+    for line in text.split("\n"):
         line = line.rstrip()
 
-        # Skip empty lines
-        if not line:
+        # Skip empty lines and comments
+        if not line or line.lstrip().startswith("#"):
             continue
 
         # Check for list item
-        if line.startswith("  - ") and current_key:
+        item = _SIMPLE_ITEM_RE.match(line)
+        if item and current_key:
+            value = item.group(1).strip()
+            if strict and not _SIMPLE_VALUE_RE.match(value):
+                return None
             if current_list is None:
                 current_list = []
                 frontmatter[current_key] = current_list
-            current_list.append(line[4:].strip())
+            current_list.append(_unquote(value))
             continue
 
         # Check for key: value
+        pair = _SIMPLE_KEY_RE.match(line)
+        if strict and (pair is None or not _SIMPLE_VALUE_RE.match((pair.group(2) or "").strip())):
+            return None
         if ":" in line:
             key, _, value = line.partition(":")
             key = key.strip()
@@ -77,93 +155,560 @@ def parse_skill_md(content: str) -> tuple[dict[str, Any], str]:
             current_key = key
             current_list = None
 
-            if value:
-                # Handle quoted strings
-                if (
-                    value.startswith('"')
-                    and value.endswith('"')
-                    or value.startswith("'")
-                    and value.endswith("'")
-                ):
-                    value = value[1:-1]
-                frontmatter[key] = value
+            if value.startswith("[") and value.endswith("]"):
+                # Inline list (fallback mode only)
+                frontmatter[key] = [
+                    _unquote(v.strip()) for v in value[1:-1].split(",") if v.strip()
+                ]
+            elif value:
+                frontmatter[key] = _unquote(value)
             # If no value, might be a list (will be populated by subsequent lines)
 
-    return frontmatter, instructions
+    return frontmatter
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _parse_yaml_frontmatter(text: str) -> dict[str, Any] | None:
+    """Parse frontmatter with PyYAML, or return None if unavailable or invalid."""
+    try:
+        import yaml
+    except ImportError:
+        return None
+
+    # BaseLoader keeps every scalar a string, as the simple parser does
+    loader = getattr(yaml, "CBaseLoader", yaml.BaseLoader)
+    try:
+        data = yaml.load(text, Loader=loader)
+    except yaml.YAMLError as e:
+        logger.debug("Invalid YAML frontmatter, using the simple parser: %s", e)
+        return None
+    return data if isinstance(data, dict) else {}
+
+
+_SKILL_INDEX_VERSION = 1
+
+
+class SkillIndex:
+    """Index of discovered skills, revalidated with `stat` calls only.
+
+    The index remembers, for every scanned directory, its mtime and entries,
+    and for every SKILL.md its mtime, size and parsed frontmatter. Later
+    discoveries re-list a directory only when its mtime changed and re-read a
+    SKILL.md only when its mtime or size changed, so repeated discovery over
+    large or remote skill libraries costs one `stat` per directory and skill.
+
+    With `cache_path` set the index is persisted as JSON and reused across
+    processes. `parsed` counts the SKILL.md files this index has read.
+
+    With `max_workers` above 1, directories are listed and SKILL.md files are
+    read on a thread pool, so cold discovery over large libraries on slow
+    storage overlaps its I/O. Only the frontmatter at the start of each
+    SKILL.md is read.
+
+    Example:
+        ```python
+        index = SkillIndex("~/.pydantic-deep/skill-index.json")
+        agent = create_deep_agent(skill_directories=dirs, skill_index=index)
+        ```
+    """
+
+    def __init__(
+        self, cache_path: str | os.PathLike[str] | None = None, *, max_workers: int = 1
+    ) -> None:
+        self.cache_path = Path(cache_path).expanduser() if cache_path is not None else None
+        self.max_workers = max_workers
+        self.parsed = 0
+        # Absolute directory path -> (mtime_ns, subdirectory names, file names)
+        self._dirs: dict[str, tuple[int, list[str], list[str]]] = {}
+        # Absolute SKILL.md path -> {"mtime_ns", "size", "frontmatter"}
+        self._skills: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.cache_path is not None:
+            self._load()
+
+    def discover(
+        self, directories: list[SkillDirectory], *, max_workers: int | None = None
+    ) -> list[Skill]:
+        """Discover skills in `directories`, reusing unchanged index entries.
+
+        Args:
+            directories: Directories to search for skills.
+            max_workers: Threads used to list directories and read SKILL.md
+                files. Defaults to the index's `max_workers`.
+
+        Returns:
+            Discovered skills (frontmatter only), sorted by path. The dicts are
+            fresh copies the caller may modify.
+        """
+        workers = self.max_workers if max_workers is None else max_workers
+        with self._lock, _thread_pool(workers) as pool:
+            map_ = pool.map if pool is not None else map
+            # (skill folder or bundle, resource files or None for bundles)
+            folders: list[tuple[str, list[str] | None]] = []
+            roots: list[str] = []
+            for skill_dir in directories:
+                root = str(Path(skill_dir["path"]).expanduser())
+                if not os.path.isdir(root):
+                    continue
+                roots.append(os.path.abspath(root) + os.sep)
+                folders.extend(self._walk(root, skill_dir.get("recursive", True), map_))
+            folders.sort(key=lambda item: item[0])
+
+            skill_files = [
+                os.path.abspath(folder if files is None else os.path.join(folder, "SKILL.md"))
+                for folder, files in folders
+            ]
+            skills: list[Skill] = []
+            for (folder, files), skill_file, entry in zip(
+                folders, skill_files, map_(self._check, skill_files), strict=True
+            ):
+                if entry is None:  # pragma: no cover
+                    continue
+                if entry is not self._skills.get(skill_file):
+                    self._skills[skill_file] = entry
+                    self.parsed += 1
+                    self._dirty = True
+                skill = _skill_from_entry(entry, folder, entry.get("resources", files or []))
+                if skill is not None:
+                    skills.append(skill)
+
+            seen = set(skill_files)
+            stale = [
+                path
+                for path in self._skills
+                if path not in seen and any(path.startswith(root) for root in roots)
+            ]
+            for path in stale:
+                del self._skills[path]
+                self._dirty = True
+
+            if self._dirty and self.cache_path is not None:
+                self._save()
+            return skills
+
+    def clear(self) -> None:
+        """Forget all entries (the on-disk cache is rewritten on next discovery)."""
+        with self._lock:
+            self._dirs.clear()
+            self._skills.clear()
+            self._dirty = True
+
+    def _listing(self, path: str) -> tuple[list[str], list[str]] | None:
+        """Return (subdirectories, files) of `path`, re-listing only if its mtime changed."""
+        key = os.path.abspath(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            if self._dirs.pop(key, None) is not None:
+                self._dirty = True
+            return None
+        cached = self._dirs.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1], cached[2]
+
+        subdirs: list[str] = []
+        files: list[str] = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:  # pragma: no cover
+                        continue
+        except OSError:  # pragma: no cover
+            return None
+        subdirs.sort()
+        files.sort()
+        self._dirs[key] = (mtime_ns, subdirs, files)
+        self._dirty = True
+        return subdirs, files
+
+    def _walk(
+        self, root: str, recursive: bool, map_: Callable[..., Iterable[Any]]
+    ) -> list[tuple[str, list[str] | None]]:
+        """Return (folder, files) for every folder under `root` containing a SKILL.md.
+
+        Skill bundles (see `SkillBundle`) found in other folders are returned
+        as (bundle path, None). Directories are listed level by level so each
+        level can be listed in parallel. Without `recursive` only direct
+        children of `root` are considered, like the glob patterns
+        "*/SKILL.md" and "*.zip".
+        """
+        found: list[tuple[str, list[str] | None]] = []
+        visited: set[str] = set()
+        frontier = [root]
+        depth = 0
+        while frontier:
+            next_frontier: list[str] = []
+            for folder, listing in zip(frontier, map_(self._listing, frontier), strict=True):
+                real = os.path.realpath(folder)
+                if listing is None or real in visited:  # pragma: no cover
+                    continue  # Vanished directory or symlink cycle
+                visited.add(real)
+                subdirs, files = listing
+                if "SKILL.md" in files:
+                    if recursive or depth == 1:
+                        found.append((folder, files))
+                elif recursive or depth == 0:
+                    found.extend(
+                        (os.path.join(folder, name), None)
+                        for name in files
+                        if is_skill_bundle(name)
+                    )
+                if recursive or depth == 0:
+                    next_frontier.extend(os.path.join(folder, name) for name in subdirs)
+            frontier = next_frontier
+            depth += 1
+        return found
+
+    def _check(self, skill_file: str) -> dict[str, Any] | None:
+        """Return the index entry for `skill_file`, re-parsing it only if it changed.
+
+        Runs in worker threads, so it does not modify the index.
+        """
+        try:
+            stat = os.stat(skill_file)
+        except OSError:  # pragma: no cover
+            return None
+        entry = self._skills.get(skill_file)
+        unchanged = entry is not None and entry["mtime_ns"] == stat.st_mtime_ns
+        if unchanged and entry["size"] == stat.st_size:  # type: ignore[index]
+            return entry
+        if is_skill_bundle(skill_file):
+            return _check_bundle(skill_file, stat)
+        try:
+            frontmatter, _ = parse_skill_md(read_skill_header(skill_file))
+        except Exception:  # pragma: no cover
+            # Skip invalid skill files
+            frontmatter = {}
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "frontmatter": frontmatter}
+
+    def _load(self) -> None:
+        assert self.cache_path is not None
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != _SKILL_INDEX_VERSION:
+            return
+        self._dirs = {path: (d[0], d[1], d[2]) for path, d in data.get("dirs", {}).items()}
+        self._skills = data.get("skills", {})
+
+    def _save(self) -> None:
+        assert self.cache_path is not None
+        data = {
+            "version": _SKILL_INDEX_VERSION,
+            "dirs": {path: list(d) for path, d in self._dirs.items()},
+            "skills": self._skills,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, self.cache_path)
+        except OSError:  # pragma: no cover
+            # The cache is an optimization; discovery still works without it
+            return
+        self._dirty = False
+
+
+def _check_bundle(path: str, stat: os.stat_result) -> dict[str, Any]:
+    """Build the index entry of a skill bundle: frontmatter, resources and content hash."""
+    entry: dict[str, Any] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    try:
+        bundle = SkillBundle.open(path)
+        header = ""
+        if "SKILL.md" in bundle.members:
+            header = bundle.read_bytes("SKILL.md", 0, 8192).decode("utf-8", errors="replace")
+            if not re.match(r"^---\s*\n.*?\n---\s*(\n|$)", header, re.DOTALL):
+                header = bundle.read_text("SKILL.md")
+        frontmatter, _ = parse_skill_md(header)
+        entry.update(resources=bundle.resources, content_hash=bundle.content_hash)
+    except Exception:
+        # Skip unreadable archives
+        frontmatter = {}
+    entry["frontmatter"] = frontmatter
+    return entry
+
+
+def _skill_from_entry(entry: dict[str, Any], folder: str, files: list[str]) -> Skill | None:
+    """Build a `Skill` from an index entry; None for skills without a name."""
+    frontmatter = entry["frontmatter"]
+    if not frontmatter.get("name"):
+        return None
+    tags = frontmatter.get("tags", [])
+    skill: Skill = {
+        "name": frontmatter["name"],
+        "description": frontmatter.get("description", ""),
+        "path": str(Path(folder)),
+        "tags": list(tags) if isinstance(tags, list) else tags,
+        "version": frontmatter.get("version", "1.0.0"),
+        "author": frontmatter.get("author", ""),
+        "frontmatter_loaded": True,
+    }
+    resources = [name for name in files if name != "SKILL.md"]
+    if resources:
+        skill["resources"] = resources
+    if "content_hash" in entry:
+        skill["content_hash"] = entry["content_hash"]
+    return skill
+
+
+@contextlib.contextmanager
+def _thread_pool(max_workers: int) -> Iterator[ThreadPoolExecutor | None]:
+    """Yield a thread pool, or None when `max_workers` does not call for one."""
+    if max_workers <= 1:
+        yield None
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="skills") as pool:
+        yield pool
+
+
+def read_skill_header(skill_file: str | os.PathLike[str], head_bytes: int = 8192) -> str:
+    """Read a SKILL.md file up to the end of its frontmatter.
+
+    Only the first `head_bytes` are read when they contain the whole
+    frontmatter block; the rest of the file (the instructions) is skipped.
+
+    Args:
+        skill_file: Path to the SKILL.md file.
+        head_bytes: Number of bytes to read before falling back to the full file.
+
+    Returns:
+        The start of the file, including the complete frontmatter if present.
+    """
+    with open(skill_file, "rb") as f:
+        head = f.read(head_bytes)
+        if len(head) == head_bytes and head.startswith(b"---"):
+            end = head.find(b"\n---", 3)
+            if end == -1 or head.find(b"\n", end + 4) == -1:
+                head += f.read()
+    return head.decode("utf-8", errors="replace")
 
 
 def discover_skills(
     directories: list[SkillDirectory],
     backend: Any | None = None,
+    *,
+    index: SkillIndex | None = None,
+    max_workers: int | None = None,
 ) -> list[Skill]:
     """Discover skills from the filesystem.
 
     Args:
         directories: List of directories to search for skills.
         backend: Optional backend for virtual filesystem support.
+        index: Index to reuse between discoveries. Without one, every
+            SKILL.md is read.
+        max_workers: Threads used for scanning (see `SkillIndex.discover`).
 
     Returns:
         List of discovered skills (frontmatter only).
     """
-    skills: list[Skill] = []
+    return (index or SkillIndex()).discover(directories, max_workers=max_workers)
 
-    for skill_dir in directories:
-        dir_path = Path(skill_dir["path"]).expanduser()
-        recursive = skill_dir.get("recursive", True)
 
-        if not dir_path.exists():
-            continue
+_RESOURCE_INDEX_SIZE = 64
+_MAX_RESOURCE_CHARS = 256 * 1024
+_resource_line_index: OrderedDict[str, tuple[int, int, array[int]]] = OrderedDict()
+_resource_lock = threading.Lock()
 
-        # Find all SKILL.md files
-        pattern = "**/SKILL.md" if recursive else "*/SKILL.md"
-        for skill_file in dir_path.glob(pattern):
-            try:
-                content = skill_file.read_text()
-                frontmatter, _ = parse_skill_md(content)
 
-                if not frontmatter.get("name"):
-                    # Skip skills without a name
-                    continue
+def read_resource_range(
+    path: str | os.PathLike[str],
+    offset: int = 0,
+    limit: int = 2000,
+    *,
+    byte_offset: int | None = None,
+    byte_length: int = 32_768,
+) -> str:
+    """Read part of a skill resource file without loading all of it.
 
-                # Get list of resources (other files in the skill directory)
-                skill_folder = skill_file.parent
-                resources = [
-                    str(f.relative_to(skill_folder))
-                    for f in skill_folder.iterdir()
-                    if f.is_file() and f.name != "SKILL.md"
-                ]
+    The file is memory-mapped. Line reads use an index of line start offsets
+    that is built once per file and reused until the file's mtime or size
+    changes. Binary files (containing NUL bytes) can only be read by byte
+    range and are returned as a hex dump.
+
+    Args:
+        path: Path to the resource file.
+        offset: First line to read (0-indexed).
+        limit: Maximum number of lines to read.
+        byte_offset: Read a byte range starting here instead of lines.
+        byte_length: Number of bytes to read with `byte_offset`.
+
+    Returns:
+        The requested content, followed by a note when more remains, or an
+        error message.
+    """
+    path = os.fspath(path)
+    name = os.path.basename(path)
+    stat = os.stat(path)
+    size = stat.st_size
+    if size == 0:
+        return ""
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        binary = b"\0" in mm[:8192]
+
+        if byte_offset is not None:
+            return _byte_range(name, size, binary, mm, byte_offset, byte_length)
+        if binary:
+            return _binary_error(name, size)
+
+        starts = _resource_line_starts(path, stat, mm)
+        total = len(starts)
+        offset = max(offset, 0)
+        if offset >= total:
+            return f"Error: Offset {offset} exceeds file length ({total} lines)"
+
+        last = min(offset + max(limit, 0), total)
+        start_byte = starts[offset]
+        end_byte = starts[last] if last < total else size
+        if end_byte - start_byte > _MAX_RESOURCE_CHARS:
+            end_byte = start_byte + _MAX_RESOURCE_CHARS
+            text = mm[start_byte:end_byte].decode("utf-8", "replace")
+            return text + (
+                f"\n\n... (output truncated at {_MAX_RESOURCE_CHARS} bytes; "
+                f"continue with byte_offset={end_byte})"
+            )
 
-                skill: Skill = {
-                    "name": frontmatter.get("name", skill_folder.name),
-                    "description": frontmatter.get("description", ""),
-                    "path": str(skill_folder),
-                    "tags": frontmatter.get("tags", []),
-                    "version": frontmatter.get("version", "1.0.0"),
-                    "author": frontmatter.get("author", ""),
-                    "frontmatter_loaded": True,
-                }
+        text = mm[start_byte:end_byte].decode("utf-8", "replace")
+        if last < total:
+            return text.rstrip("\n") + f"\n\n... ({total - last} more lines, next offset={last})"
+        return text
 
-                if resources:
-                    skill["resources"] = resources
 
-                skills.append(skill)
+def read_bundle_resource(
+    bundle_path: str | os.PathLike[str],
+    resource_name: str,
+    offset: int = 0,
+    limit: int = 2000,
+    *,
+    byte_offset: int | None = None,
+    byte_length: int = 32_768,
+    cache_dir: str | os.PathLike[str] | None = None,
+) -> str:
+    """Read part of a resource packed in a skill bundle.
 
-            except Exception:  # pragma: no cover
-                # Skip invalid skill files
-                continue
+    Byte ranges are read straight from the archive. Line ranges are served
+    by `read_resource_range` from a copy extracted once into `cache_dir`
+    (see `SkillBundle.extract`).
 
-    return skills
+    Args:
+        bundle_path: Path to the skill bundle.
+        resource_name: Member name relative to the skill root.
+        offset: First line to read (0-indexed).
+        limit: Maximum number of lines to read.
+        byte_offset: Read a byte range starting here instead of lines.
+        byte_length: Number of bytes to read with `byte_offset`.
+        cache_dir: Directory for extracted members.
+
+    Returns:
+        The requested content, or an error message.
+    """
+    bundle = SkillBundle.open(bundle_path)
+    member = bundle.members.get(resource_name)
+    if member is None or resource_name == "SKILL.md":
+        return f"Error: Resource '{resource_name}' not found. Available: {bundle.resources}"
+    if member.size == 0:
+        return ""
+
+    binary = b"\0" in bundle.read_bytes(resource_name, 0, 8192)
+    if byte_offset is not None:
+        data = _BundleSlice(bundle, resource_name)
+        return _byte_range(resource_name, member.size, binary, data, byte_offset, byte_length)
+    if binary:
+        return _binary_error(resource_name, member.size)
+    return read_resource_range(bundle.extract(resource_name, cache_dir), offset, limit)
+
+
+@dataclass
+class _BundleSlice:
+    """Slice access to a bundle member, matching what `_byte_range` needs from an mmap."""
+
+    bundle: SkillBundle
+    name: str
+
+    def __getitem__(self, item: slice) -> bytes:
+        return self.bundle.read_bytes(self.name, item.start, item.stop - item.start)
+
+
+def _byte_range(name: str, size: int, binary: bool, data: Any, start: int, length: int) -> str:
+    """Format bytes `start` to `start + length` of a resource of `size` bytes."""
+    if not 0 <= start < size:
+        return f"Error: byte_offset {start} is outside '{name}' ({size} bytes)"
+    end = min(size, start + max(length, 0))
+    chunk = data[start:end]
+    body = _hexdump(chunk, start) if binary else chunk.decode("utf-8", "replace")
+    if end < size:
+        body += f"\n\n... ({size - end} more bytes, next byte_offset={end})"
+    return body
+
+
+def _binary_error(name: str, size: int) -> str:
+    return (
+        f"Error: '{name}' is a binary file ({size} bytes). "
+        "Use byte_offset and byte_length to read it as a hex dump."
+    )
+
+
+def _resource_line_starts(path: str, stat: os.stat_result, mm: mmap.mmap) -> array[int]:
+    """Return the byte offset of every line in `mm`, cached per file, mtime and size."""
+    with _resource_lock:
+        cached = _resource_line_index.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            _resource_line_index.move_to_end(path)
+            return cached[2]
+
+    starts = array("Q", [0])
+    position = mm.find(b"\n")
+    while position != -1:
+        starts.append(position + 1)
+        position = mm.find(b"\n", position + 1)
+    if starts[-1] == stat.st_size:
+        # Trailing newline does not start another line
+        starts.pop()
+
+    with _resource_lock:
+        _resource_line_index[path] = (stat.st_mtime_ns, stat.st_size, starts)
+        while len(_resource_line_index) > _RESOURCE_INDEX_SIZE:
+            _resource_line_index.popitem(last=False)
+    return starts
+
+
+def _hexdump(data: bytes, start: int) -> str:
+    lines = []
+    for i in range(0, len(data), 16):
+        row = data[i : i + 16]
+        text = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+        lines.append(f"{start + i:08x}  {row.hex(' '):<47}  |{text}|")
+    return "\n".join(lines)
 
 
 def load_skill_instructions(skill_path: str) -> str:
     """Load full instructions for a skill.
 
     Args:
-        skill_path: Path to the skill directory.
+        skill_path: Path to the skill directory or skill bundle.
 
     Returns:
         Full markdown instructions from SKILL.md.
     """
+    if os.path.isfile(skill_path):
+        bundle = SkillBundle.open(skill_path)
+        if "SKILL.md" not in bundle.members:
+            return f"Error: SKILL.md not found in {skill_path}"
+        return parse_skill_md(bundle.read_text("SKILL.md"))[1]
+
     skill_file = Path(skill_path) / "SKILL.md"
 
     if not skill_file.exists():
@@ -175,15 +720,28 @@ def load_skill_instructions(skill_path: str) -> str:
     return instructions
 
 
+def _instructions_file(skill_path: str) -> str:
+    """Return the file holding a skill's instructions: the bundle itself or its SKILL.md.
+
+    Bundles are recognised by suffix too, so the key is still right after the file is deleted.
+    """
+    if os.path.isfile(skill_path) or is_skill_bundle(skill_path):
+        return skill_path
+    return os.path.join(skill_path, "SKILL.md")
+
+
 def get_skills_system_prompt(
-    deps: DeepAgentDeps,
+    deps: DeepAgentDeps | None,
     skills: list[Skill] | None = None,
+    *,
+    total: int | None = None,
 ) -> str:
     """Generate system prompt for skills.
 
     Args:
         deps: Agent dependencies.
-        skills: List of available skills.
+        skills: List of skills to advertise.
+        total: Number of available skills, when `skills` is only a selection.
 
     Returns:
         System prompt section describing available skills.
@@ -204,13 +762,302 @@ def get_skills_system_prompt(
         tags_part = f" [{tags_str}]" if tags_str else ""
         lines.append(f"- **{skill['name']}**{tags_part}: {skill['description']}")
 
+    if total is not None and total > len(skills):
+        lines.append("")
+        lines.append(
+            f"{total - len(skills)} more skills are available. "
+            "Use `search_skills` to find skills relevant to your task."
+        )
+
     return "\n".join(lines)
 
 
+_SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _search_tokens(text: str) -> list[str]:
+    return _SEARCH_TOKEN_RE.findall(text.lower())
+
+
+class SkillSearchIndex:
+    """Offline BM25 ranking of skills by name, description and tags.
+
+    Name and tag terms count twice, so a query naming a skill's topic ranks
+    it above skills that only mention the term in passing.
+    """
+
+    def __init__(self, skills: list[Skill], *, k1: float = 1.5, b: float = 0.75) -> None:
+        self.skills = list(skills)
+        self.k1 = k1
+        self.b = b
+        self._term_freqs: list[Counter[str]] = []
+        self._lengths: list[int] = []
+        self._postings: dict[str, list[int]] = {}
+        for i, skill in enumerate(self.skills):
+            tags = skill.get("tags") or []
+            tags_text = " ".join(tags) if isinstance(tags, list) else str(tags)
+            terms = _search_tokens(f"{skill['name']} {tags_text}") * 2 + _search_tokens(
+                skill.get("description", "")
+            )
+            freqs = Counter(terms)
+            self._term_freqs.append(freqs)
+            self._lengths.append(len(terms))
+            for term in freqs:
+                self._postings.setdefault(term, []).append(i)
+        count = len(self.skills)
+        self._avg_length = (sum(self._lengths) / count) if count else 1.0
+        self._idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self._postings.items()
+        }
+
+    def search(self, query: str, limit: int = 10) -> list[Skill]:
+        """Return up to `limit` skills matching `query`, best first."""
+        scores: dict[int, float] = {}
+        for term in set(_search_tokens(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i in self._postings[term]:
+                freq = self._term_freqs[i][term]
+                norm = 1 - self.b + self.b * self._lengths[i] / self._avg_length
+                score = idf * freq * (self.k1 + 1) / (freq + self.k1 * norm)
+                scores[i] = scores.get(i, 0.0) + score
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        return [self.skills[i] for i in ranked[:limit]]
+
+
+class SkillRegistry:
+    """Live set of skills with cached instructions, optionally hot-reloaded.
+
+    `refresh()` rediscovers the skill directories through a `SkillIndex`
+    (one `stat` per directory and skill when nothing changed) and applies
+    only the differences. `version` is bumped, listeners are notified and the
+    cached system prompt is rebuilt only when the set of skills actually
+    changed. Loaded instructions are cached per SKILL.md mtime and size.
+
+    `start()` keeps the registry up to date in a background thread, using
+    `watchfiles` (inotify/FSEvents) when it is installed and polling every
+    `poll_interval` seconds otherwise.
+
+    Example:
+        ```python
+        registry = SkillRegistry([{"path": "./skills"}])
+        registry.start()
+        agent = create_deep_agent(skill_registry=registry)
+        ```
+    """
+
+    def __init__(
+        self,
+        directories: list[SkillDirectory] | None = None,
+        *,
+        skills: list[Skill] | None = None,
+        index: SkillIndex | None = None,
+        poll_interval: float = 2.0,
+        prompt_top_k: int | None = 20,
+    ) -> None:
+        self.directories = list(directories or [])
+        self.index = index or SkillIndex()
+        self.poll_interval = poll_interval
+        self.prompt_top_k = prompt_top_k
+        self._search: tuple[int, SkillSearchIndex] | None = None
+        self._ranked_prompt: tuple[int, str, str] | None = None
+        self._skills: dict[str, Skill] = {skill["name"]: skill for skill in skills or []}
+        self._version = 0
+        self._listeners: list[Callable[[SkillRegistry], None]] = []
+        self._instructions: dict[str, tuple[int, int, str]] = {}
+        self._prompt: tuple[int, str] | None = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+        if skills is None and self.directories:
+            self._skills = {skill["name"]: skill for skill in self.index.discover(self.directories)}
+
+    @property
+    def version(self) -> int:
+        """Counter incremented every time the set of skills changes."""
+        return self._version
+
+    @property
+    def skills(self) -> list[Skill]:
+        """Current skills, in discovery order."""
+        with self._lock:
+            return list(self._skills.values())
+
+    @property
+    def watching(self) -> bool:
+        """Whether a background watcher is running."""
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def get(self, name: str) -> Skill | None:
+        """Return the skill called `name`, if any."""
+        with self._lock:
+            return self._skills.get(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._skills
+
+    def __len__(self) -> int:
+        return len(self._skills)
+
+    def subscribe(self, listener: Callable[[SkillRegistry], None]) -> Callable[[], None]:
+        """Call `listener` with the registry after every change of the skill set.
+
+        Returns:
+            A callable that removes the listener.
+        """
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def refresh(self) -> bool:
+        """Rediscover the skill directories and apply changes.
+
+        Returns:
+            True if skills were added, removed or changed.
+        """
+        if not self.directories:
+            return False
+        discovered = {skill["name"]: skill for skill in self.index.discover(self.directories)}
+        with self._lock:
+            changed = False
+            for name in [name for name in self._skills if name not in discovered]:
+                self._forget(self._skills.pop(name))
+                changed = True
+            for name, skill in discovered.items():
+                current = self._skills.get(name)
+                if current != skill:
+                    if current is not None:
+                        self._forget(current)
+                    self._skills[name] = skill
+                    changed = True
+            if not changed:
+                return False
+            # Keep discovery order
+            self._skills = {name: self._skills[name] for name in discovered}
+            self._version += 1
+        for listener in list(self._listeners):
+            listener(self)
+        return True
+
+    def load_instructions(self, name: str) -> str | None:
+        """Return the full instructions of skill `name`, re-reading SKILL.md only if it changed.
+
+        Returns:
+            The instructions, or None if there is no such skill.
+        """
+        skill = self.get(name)
+        if skill is None:
+            return None
+        skill_file = _instructions_file(skill["path"])
+        try:
+            stat = os.stat(skill_file)
+        except OSError:
+            return load_skill_instructions(skill["path"])
+        cached = self._instructions.get(skill_file)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        instructions = load_skill_instructions(skill["path"])
+        self._instructions[skill_file] = (stat.st_mtime_ns, stat.st_size, instructions)
+        return instructions
+
+    def search(self, query: str, limit: int = 10) -> list[Skill]:
+        """Rank skills against `query` with BM25 (see `SkillSearchIndex`)."""
+        with self._lock:
+            if self._search is None or self._search[0] != self._version:
+                self._search = (self._version, SkillSearchIndex(self.skills))
+            return self._search[1].search(query, limit)
+
+    def system_prompt(self, deps: DeepAgentDeps | None = None, query: str | None = None) -> str:
+        """Return the skills system prompt.
+
+        Catalogs of up to `prompt_top_k` skills are listed in full, and the
+        prompt is rebuilt only when the skill set changes. Larger catalogs
+        advertise the `prompt_top_k` skills most relevant to `query` (usually
+        the user's message) and point to `search_skills` for the rest.
+        """
+        with self._lock:
+            top_k = self.prompt_top_k
+            if top_k is None or len(self._skills) <= top_k:
+                if self._prompt is None or self._prompt[0] != self._version:
+                    self._prompt = (self._version, get_skills_system_prompt(deps, self.skills))
+                return self._prompt[1]
+
+            query = query or ""
+            cached = self._ranked_prompt
+            if cached is not None and cached[:2] == (self._version, query):
+                return cached[2]
+            selected = self.search(query, top_k)
+            if len(selected) < top_k:
+                # Fill up with unranked skills in catalog order
+                chosen = {skill["name"] for skill in selected}
+                selected += [s for s in self.skills if s["name"] not in chosen][
+                    : top_k - len(selected)
+                ]
+            prompt = get_skills_system_prompt(deps, selected, total=len(self._skills))
+            self._ranked_prompt = (self._version, query, prompt)
+            return prompt
+
+    def start(self) -> None:
+        """Start watching the skill directories in a daemon thread."""
+        if self.watching or not self.directories:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, name="skill-registry-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Stop the background watcher."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout)
+            self._watcher = None
+
+    def _forget(self, skill: Skill) -> None:
+        self._instructions.pop(_instructions_file(skill["path"]), None)
+
+    def _watch(self) -> None:
+        try:
+            from watchfiles import watch
+        except ImportError:
+            watch = None
+
+        paths = [
+            Path(d["path"]).expanduser()
+            for d in self.directories
+            if Path(d["path"]).expanduser().is_dir()
+        ]
+        if watch is None or not paths:
+            while not self._stop.wait(self.poll_interval):
+                self._safe_refresh()
+            return
+        for _changes in watch(*paths, stop_event=self._stop, yield_on_timeout=False):
+            self._safe_refresh()
+
+    def _safe_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:  # pragma: no cover
+            logger.exception("Skill refresh failed")
+
+
 class SkillsToolset(FunctionToolset[DeepAgentDeps]):
     """Toolset for skills functionality."""
 
-    pass
+    registry: SkillRegistry
+    """Registry the toolset reads skills from."""
+
+    @property
+    def skills(self) -> list[Skill]:
+        """Skills currently available through this toolset."""
+        return self.registry.skills
 
 
 def create_skills_toolset(  # noqa: C901
@@ -218,6 +1065,11 @@ def create_skills_toolset(  # noqa: C901
     id: str = "skills",
     directories: list[SkillDirectory] | None = None,
     skills: list[Skill] | None = None,
+    instrumentation: Instrumentation | None = None,
+    index: SkillIndex | None = None,
+    registry: SkillRegistry | None = None,
+    prompt_top_k: int | None = 20,
+    materializer: SkillMaterializer | None = None,
 ) -> SkillsToolset:
     """Create a skills toolset.
 
@@ -225,21 +1077,43 @@ def create_skills_toolset(  # noqa: C901
         id: Unique identifier for this toolset.
         directories: List of directories to discover skills from.
         skills: Pre-loaded skills (alternative to directories).
+        instrumentation: Records `skill_load` spans for discovery and loading.
+        index: Skill index used for discovery (see `SkillIndex`).
+        registry: Live skill registry to read skills from, e.g. one that is
+            hot-reloaded with `SkillRegistry.start()`. Overrides `directories`
+            and `skills`.
+        prompt_top_k: Catalogs larger than this advertise only the most
+            relevant skills in the system prompt (None lists every skill).
+            Ignored when `registry` is given.
+        materializer: Copies each loaded skill's files into the agent's
+            backend (see `SkillMaterializer`), so skill scripts can run in
+            sandboxes.
 
     Returns:
         Configured SkillsToolset instance.
     """
     toolset = SkillsToolset(id=id)
 
+    def skill_span(name: str) -> AbstractContextManager[Span | None]:
+        if instrumentation is None:
+            return contextlib.nullcontext()
+        return instrumentation.span(name, "skill_load")
+
     # Discover or use provided skills
-    if skills is None and directories:
-        skills = discover_skills(directories)
-    elif skills is None:
-        # Default skills directory
-        skills = discover_skills([{"path": DEFAULT_SKILLS_DIR, "recursive": True}])
+    if registry is None and skills is not None:
+        registry = SkillRegistry(skills=skills, prompt_top_k=prompt_top_k)
+    elif registry is None:
+        with skill_span("discover_skills") as span:
+            # Fall back to the default skills directory
+            registry = SkillRegistry(
+                directories or [{"path": DEFAULT_SKILLS_DIR, "recursive": True}],
+                index=index,
+                prompt_top_k=prompt_top_k,
+            )
+            if span is not None:
+                span.attributes["skills"] = len(registry)
 
-    # Store skills in toolset for access by tools
-    _skills_cache: dict[str, Skill] = {skill["name"]: skill for skill in (skills or [])}
+    toolset.registry = registry
 
     @toolset.tool
     async def list_skills(ctx: RunContext[DeepAgentDeps]) -> str:  # pragma: no cover
@@ -251,12 +1125,13 @@ def create_skills_toolset(  # noqa: C901
         Returns:
             Formatted list of available skills.
         """
-        if not _skills_cache:
+        skills = {skill["name"]: skill for skill in registry.skills}
+        if not skills:
             return "No skills available."
 
         lines = ["Available Skills:", ""]
 
-        for name, skill in sorted(_skills_cache.items()):
+        for name, skill in sorted(skills.items()):
             tags_str = ", ".join(skill["tags"]) if skill["tags"] else "none"
             resources_str = ""
             if skill.get("resources"):
@@ -270,6 +1145,35 @@ def create_skills_toolset(  # noqa: C901
 
         return "\n".join(lines)
 
+    @toolset.tool
+    async def search_skills(  # pragma: no cover
+        ctx: RunContext[DeepAgentDeps],
+        query: str,
+        limit: int = 10,
+    ) -> str:
+        """Search available skills by topic.
+
+        Ranks skills by how well their name, tags and description match the
+        query. Use this to find skills that are not listed in your instructions.
+
+        Args:
+            query: Keywords describing the task (e.g. "pdf form extraction").
+            limit: Maximum number of skills to return.
+
+        Returns:
+            Matching skills, best match first.
+        """
+        matches = registry.search(query, limit)
+        if not matches:
+            return f"No skills match '{query}'. Use list_skills to see all skills."
+
+        lines = [f"Skills matching '{query}':", ""]
+        for skill in matches:
+            tags = skill["tags"]
+            tags_part = f" [{', '.join(tags)}]" if tags else ""
+            lines.append(f"- **{skill['name']}**{tags_part}: {skill['description']}")
+        return "\n".join(lines)
+
     @toolset.tool
     async def load_skill(  # pragma: no cover
         ctx: RunContext[DeepAgentDeps],
@@ -286,22 +1190,28 @@ def create_skills_toolset(  # noqa: C901
         Returns:
             Full skill instructions in markdown format.
         """
-        if skill_name not in _skills_cache:
-            available = ", ".join(_skills_cache.keys()) if _skills_cache else "none"
+        skill = registry.get(skill_name)
+        if skill is None:
+            available = ", ".join(s["name"] for s in registry.skills) or "none"
             return f"Error: Skill '{skill_name}' not found. Available skills: {available}"
 
-        skill = _skills_cache[skill_name]
-        instructions = load_skill_instructions(skill["path"])
+        with skill_span(skill_name) as span:
+            instructions = registry.load_instructions(skill_name) or ""
+            if span is not None:
+                span.bytes_returned = len(instructions.encode("utf-8"))
 
-        # Update cache with full instructions
-        skill["instructions"] = instructions
-        skill["frontmatter_loaded"] = False
+        path = skill["path"]
+        if materializer is not None:
+            try:
+                path = materializer.materialize(ctx.deps.backend, skill)
+            except Exception as e:
+                logger.warning("Could not copy skill %r into the backend: %s", skill_name, e)
 
         # Format response
         lines = [
             f"# Skill: {skill['name']}",
             f"Version: {skill['version']}",
-            f"Path: {skill['path']}",
+            f"Path: {path}",
             "",
             "## Instructions",
             "",
@@ -317,7 +1227,7 @@ def create_skills_toolset(  # noqa: C901
                 ]
             )
             for resource in skill["resources"]:
-                lines.append(f"- {skill['path']}/{resource}")
+                lines.append(f"- {path}/{resource}")
 
         return "\n".join(lines)
 
@@ -326,26 +1236,49 @@ def create_skills_toolset(  # noqa: C901
         ctx: RunContext[DeepAgentDeps],
         skill_name: str,
         resource_name: str,
+        offset: int = 0,
+        limit: int = 2000,
+        byte_offset: int | None = None,
+        byte_length: int = 32_768,
     ) -> str:
         """Read a resource file from a skill.
 
         Skills can include additional files (scripts, templates, documents)
-        that support their functionality.
+        that support their functionality. Large files are read in pages:
+        pass the `offset` from the note at the end of a page to continue.
 
         Args:
             skill_name: Name of the skill.
             resource_name: Name of the resource file within the skill.
+            offset: Line number to start reading from (0-indexed).
+            limit: Maximum number of lines to read.
+            byte_offset: Read a byte range instead of lines (required for
+                binary files, which are returned as a hex dump).
+            byte_length: Number of bytes to read from `byte_offset`.
 
         Returns:
             Content of the resource file.
         """
-        if skill_name not in _skills_cache:
+        skill = registry.get(skill_name)
+        if skill is None:
             return f"Error: Skill '{skill_name}' not found."
 
-        skill = _skills_cache[skill_name]
+        if os.path.isfile(skill["path"]):
+            try:
+                return read_bundle_resource(
+                    skill["path"],
+                    resource_name,
+                    offset,
+                    limit,
+                    byte_offset=byte_offset,
+                    byte_length=byte_length,
+                )
+            except Exception as e:
+                return f"Error reading resource: {e}"
+
         resource_path = Path(skill["path"]) / resource_name
 
-        if not resource_path.exists():
+        if not resource_path.is_file():
             available = skill.get("resources", [])
             return f"Error: Resource '{resource_name}' not found. Available: {available}"
 
@@ -356,7 +1289,13 @@ def create_skills_toolset(  # noqa: C901
             return "Error: Resource path escapes skill directory."
 
         try:
-            return resource_path.read_text()
+            return read_resource_range(
+                resource_path,
+                offset,
+                limit,
+                byte_offset=byte_offset,
+                byte_length=byte_length,
+            )
         except Exception as e:
             return f"Error reading resource: {e}"
 
@@ -2,16 +2,48 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+)
 from pydantic_ai.toolsets import FunctionToolset
+from pydantic_ai.usage import UsageLimits
+from pydantic_ai_backends import BackendProtocol
+from pydantic_core import to_jsonable_python
 
 from pydantic_deep.deps import DeepAgentDeps
-from pydantic_deep.types import SubAgentConfig
+from pydantic_deep.instrumentation import Instrumentation, Span
+from pydantic_deep.overlay import OverlayBackend, OverlayMergeResult
+from pydantic_deep.types import SubAgentBudget, SubAgentConfig, SubAgentEvent, SubAgentTask
+
+T = TypeVar("T")
 
 SUBAGENT_SYSTEM_PROMPT = """
 ## Task Delegation
 
 You have access to the `task` tool for delegating work to specialized subagents.
+Use `task_batch` to run several independent tasks in parallel.
 Use this when:
 
 1. A task requires specialized knowledge or tools
@@ -51,11 +83,210 @@ Use this for:
 """
 
 
-def create_subagent_toolset(
+def build_subagent(
+    config: SubAgentConfig,
+    default_model: str = "openai:gpt-4.1",
+    instrumentation: Instrumentation | None = None,
+) -> Any:
+    """Build the `Agent` for a subagent configuration.
+
+    The agent gets filesystem and todo toolsets without approval requirements,
+    plus any custom tools from the config.
+
+    Args:
+        config: Subagent configuration.
+        default_model: Model used when the config does not set one.
+        instrumentation: Records the subagent's model requests and tool calls.
+
+    Returns:
+        A new `Agent` instance.
+    """
+    from pydantic_ai_todo import create_todo_toolset
+
+    from pydantic_deep.toolsets.filesystem import create_filesystem_toolset
+
+    model = config.get("model", default_model)
+    tools = config.get("tools", [])
+
+    # Create toolsets for the subagent
+    fs_toolset = create_filesystem_toolset(
+        include_execute=True,
+        require_write_approval=False,
+        require_execute_approval=False,
+    )
+    todo_toolset = create_todo_toolset()
+    toolsets: list[Any] = [fs_toolset, todo_toolset]
+
+    if instrumentation is not None:
+        custom_toolset = FunctionToolset([tool for tool in tools if callable(tool)])
+        toolsets = [instrumentation.wrap_toolset(ts) for ts in (*toolsets, custom_toolset)]
+        model = instrumentation.wrap_model(model)
+        tools = []
+
+    subagent: Agent[DeepAgentDeps, Any] = Agent(
+        model,
+        instructions=config["instructions"],
+        deps_type=DeepAgentDeps,
+        output_type=config.get("output_type", str),
+        toolsets=toolsets,
+    )
+
+    # Add custom tools if any
+    for tool in tools:
+        if callable(tool):
+            subagent.tool(tool)
+
+    return subagent
+
+
+class SubAgentRegistry:
+    """Process-wide cache of subagent agents, built once per configuration.
+
+    Agents hold no per-run state (that lives in `DeepAgentDeps`), so one
+    instance per subagent type can serve every session concurrently. Agents
+    are built lazily on first use, or all at once with `build_all()`.
+    """
+
+    def __init__(
+        self,
+        configs: Sequence[SubAgentConfig],
+        default_model: str = "openai:gpt-4.1",
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        self._configs = {config["name"]: config for config in configs}
+        self._default_model = default_model
+        self._instrumentation = instrumentation
+        self._agents: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """Return the agent for subagent type `name`, building it if needed.
+
+        Raises:
+            KeyError: If no configuration exists for `name`.
+        """
+        agent = self._agents.get(name)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(name)
+                if agent is None:
+                    agent = build_subagent(
+                        self._configs[name], self._default_model, self._instrumentation
+                    )
+                    self._agents[name] = agent
+        return agent
+
+    def build_all(self) -> None:
+        """Build agents for every configuration up front."""
+        for name in self._configs:
+            self.get(name)
+
+    def clear(self) -> None:
+        """Drop built agents; they are rebuilt on next use."""
+        with self._lock:
+            self._agents.clear()
+
+    @property
+    def built(self) -> list[str]:
+        """Names of subagent types whose agents have been built."""
+        return sorted(self._agents)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._configs
+
+
+class SubAgentResultCache:
+    """LRU cache of subagent results with a time-to-live.
+
+    Entries are keyed by subagent type, normalized description and the
+    version of the workspace state (`files` and `uploads`), so a cached result
+    is only reused while the files the subagent could have looked at are
+    unchanged. Backends whose files are not tracked in `DeepAgentDeps.files`
+    (e.g. `FilesystemBackend`) always report the same version; for those,
+    the TTL alone bounds staleness.
+
+    Example:
+        ```python
+        cache = SubAgentResultCache(max_entries=64, ttl=300)
+        toolset = create_subagent_toolset(result_cache=cache)
+        ```
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        ttl: float | None = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(subagent_type: str, description: str, *containers: Any) -> Hashable:
+        """Build a cache key from a delegation and the state it ran against.
+
+        Args:
+            subagent_type: Subagent type name.
+            description: Task description; whitespace and case are normalized.
+            *containers: Versioned state containers (e.g. `deps.files`); their
+                identity and version are part of the key.
+
+        Returns:
+            A hashable key.
+        """
+        normalized = " ".join(description.split()).casefold()
+        state = tuple((c.uid, c.version) for c in containers)
+        return (subagent_type, normalized, state)
+
+    def get(self, key: Hashable) -> str | None:
+        """Return the cached result for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, result: str) -> None:
+        """Store a result, evicting the least recently used entries over the bound."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_subagent_toolset(  # noqa: C901
     subagents: list[SubAgentConfig] | None = None,
     default_model: str = "openai:gpt-4.1",
     include_general_purpose: bool = True,
     id: str | None = None,
+    max_concurrency: int = 4,
+    task_timeout: float | None = None,
+    registry: SubAgentRegistry | None = None,
+    eager: bool = False,
+    result_cache: SubAgentResultCache | None = None,
+    instrumentation: Instrumentation | None = None,
 ) -> FunctionToolset[DeepAgentDeps]:
     """Create a subagent toolset for task delegation.
 
@@ -64,9 +295,18 @@ def create_subagent_toolset(
         default_model: Default model for subagents.
         include_general_purpose: Whether to include a general-purpose subagent.
         id: Optional unique ID for the toolset.
+        max_concurrency: Maximum number of subagents `task_batch` runs at once.
+        task_timeout: Timeout in seconds for each subagent run (None = no limit).
+        registry: Registry holding the subagent agents. Defaults to a new registry
+            owned by this toolset, shared by every session that uses it.
+        eager: Build all subagent agents now instead of on first use.
+        result_cache: Opt-in cache returning earlier results for identical
+            delegations (same subagent type, description and file state).
+        instrumentation: Records a `subagent` span per delegation, and the
+            model requests and tool calls of subagents built by this toolset.
 
     Returns:
-        FunctionToolset with the task tool.
+        FunctionToolset with the task and task_batch tools.
     """
     subagent_configs = list(subagents or [])
 
@@ -89,8 +329,48 @@ def create_subagent_toolset(
         "\n".join(subagent_descriptions) if subagent_descriptions else "No subagents configured"
     )
 
+    subagent_registry = (
+        registry
+        if registry is not None
+        else SubAgentRegistry(subagent_configs, default_model, instrumentation)
+    )
+    if eager:
+        subagent_registry.build_all()
+
     toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset(id=id)
 
+    def find_config(subagent_type: str) -> SubAgentConfig | None:
+        for c in subagent_configs:
+            if c["name"] == subagent_type:
+                return c
+        return None
+
+    def unknown_type_error(subagent_type: str) -> str:
+        available = ", ".join(c["name"] for c in subagent_configs)
+        return f"Unknown subagent type '{subagent_type}'. Available: {available}"
+
+    def cache_key(ctx: RunContext[DeepAgentDeps], subagent_type: str, description: str) -> Hashable:
+        return SubAgentResultCache.make_key(
+            subagent_type, description, ctx.deps.files, ctx.deps.uploads
+        )
+
+    def get_subagent(ctx: RunContext[DeepAgentDeps], config: SubAgentConfig) -> Any:
+        # Pre-built agents on the session deps take precedence over the shared registry
+        if config["name"] in ctx.deps.subagents:
+            return ctx.deps.subagents[config["name"]]
+        return subagent_registry.get(config["name"])
+
+    def subagent_span(subagent_type: str) -> AbstractContextManager[Span | None]:
+        if instrumentation is None:
+            return contextlib.nullcontext()
+        return instrumentation.span(subagent_type, "subagent")
+
+    def record_usage(span: Span | None, result: SubAgentRunResult) -> None:
+        if span is not None:
+            span.input_tokens = result.input_tokens
+            span.output_tokens = result.output_tokens
+            span.attributes["requests"] = result.requests
+
     @toolset.tool
     async def task(  # pragma: no cover
         ctx: RunContext[DeepAgentDeps],
@@ -106,67 +386,459 @@ def create_subagent_toolset(
             description: Detailed description of the task for the subagent.
             subagent_type: Type of subagent to use (e.g., "general-purpose").
         """
-        # Find the subagent config
-        config = None
-        for c in subagent_configs:
-            if c["name"] == subagent_type:
-                config = c
-                break
-
+        config = find_config(subagent_type)
         if config is None:
-            available = ", ".join(c["name"] for c in subagent_configs)
-            return f"Error: Unknown subagent type '{subagent_type}'. Available: {available}"
-
-        # Check if we have a pre-built agent
-        if subagent_type in ctx.deps.subagents:
-            subagent = ctx.deps.subagents[subagent_type]
+            return f"Error: {unknown_type_error(subagent_type)}"
+
+        with subagent_span(subagent_type) as span:
+            if result_cache is not None:
+                cached = result_cache.get(cache_key(ctx, subagent_type, description))
+                if span is not None:
+                    span.cache_hit = cached is not None
+                if cached is not None:
+                    return f"Subagent '{subagent_type}' completed (cached result):\n\n{cached}"
+
+            subagent = get_subagent(ctx, config)
+
+            # Create isolated deps for the subagent
+            copy_on_write = config.get("copy_on_write", False)
+            subagent_deps = ctx.deps.clone_for_subagent(copy_on_write=copy_on_write)
+
+            # Run the subagent, streaming progress to the parent's event sink
+            try:
+                result = await asyncio.wait_for(
+                    run_subagent(
+                        subagent,
+                        description,
+                        subagent_deps,
+                        subagent_type=subagent_type,
+                        budget=config.get("budget"),
+                        event_sink=ctx.deps.event_sink,
+                    ),
+                    task_timeout,
+                )
+            except Exception as e:
+                if span is not None:
+                    span.status, span.error = "error", f"{type(e).__name__}: {e}"
+                return f"Subagent '{subagent_type}' failed: {_describe_error(e, task_timeout)}"
+            record_usage(span, result)
+
+        shaped = shape_subagent_result(
+            result.output, config, ctx.deps.backend, name=f"{subagent_type}-{result.task_id}"
+        )
+        if result.stopped:
+            output = (
+                f"Subagent '{subagent_type}' stopped early ({result.stopped}). "
+                f"Partial output:\n\n{shaped}"
+            )
         else:
-            # Create the subagent on-the-fly
-            from pydantic_ai_todo import create_todo_toolset
+            output = f"Subagent '{subagent_type}' completed:\n\n{shaped}"
+        if copy_on_write:
+            output += format_merge_result(subagent_deps.backend.commit())  # type: ignore[attr-defined]
+        if result_cache is not None and not result.stopped:
+            result_cache.put(cache_key(ctx, subagent_type, description), shaped)
+        return output
 
-            from pydantic_deep.toolsets.filesystem import create_filesystem_toolset
+    @toolset.tool
+    async def task_batch(  # pragma: no cover
+        ctx: RunContext[DeepAgentDeps],
+        tasks: list[SubAgentTask],
+    ) -> str:
+        """Launch several subagents concurrently and wait for all of them.
 
-            model = config.get("model", default_model)
-            tools = config.get("tools", [])
+        Use this for independent subtasks (e.g. researching several topics).
+        Each subagent writes to a private copy of the filesystem (unless its
+        type disables copy-on-write); changes are merged back in task order
+        once all tasks finish. Results are returned
+        in the same order as `tasks`, and a failing task does not affect the
+        others.
 
-            # Create toolsets for the subagent
-            fs_toolset = create_filesystem_toolset(
-                include_execute=True,
-                require_write_approval=False,
-                require_execute_approval=False,
+        Args:
+            tasks: Tasks to run, each with a `description` and `subagent_type`.
+        """
+        if not tasks:
+            return "Error: No tasks given"
+
+        overlays: list[OverlayBackend | None] = [None] * len(tasks)
+        fresh: dict[int, str] = {}  # Completed (not cached, not stopped) results
+
+        async def run_one(index: int, item: SubAgentTask) -> str:
+            config = find_config(item["subagent_type"])
+            if config is None:
+                raise ValueError(unknown_type_error(item["subagent_type"]))
+            with subagent_span(config["name"]) as span:
+                if result_cache is not None:
+                    cached = result_cache.get(cache_key(ctx, config["name"], item["description"]))
+                    if span is not None:
+                        span.cache_hit = cached is not None
+                    if cached is not None:
+                        return f"(cached result)\n{cached}"
+                subagent = get_subagent(ctx, config)
+                copy_on_write = config.get("copy_on_write", True)
+                subagent_deps = ctx.deps.clone_for_subagent(copy_on_write=copy_on_write)
+                if isinstance(subagent_deps.backend, OverlayBackend):
+                    overlays[index] = subagent_deps.backend
+                result = await run_subagent(
+                    subagent,
+                    item["description"],
+                    subagent_deps,
+                    subagent_type=config["name"],
+                    budget=config.get("budget"),
+                    event_sink=ctx.deps.event_sink,
+                )
+                record_usage(span, result)
+            shaped = shape_subagent_result(
+                result.output, config, ctx.deps.backend, name=f"{config['name']}-{result.task_id}"
             )
-            todo_toolset = create_todo_toolset()
+            if result.stopped:
+                return f"Stopped early ({result.stopped}). Partial output:\n{shaped}"
+            fresh[index] = shaped
+            return shaped
+
+        results = await run_concurrently(
+            [functools.partial(run_one, i, item) for i, item in enumerate(tasks)],
+            max_concurrency=max_concurrency,
+            timeout=task_timeout,
+        )
 
-            subagent = Agent(
-                model,
-                instructions=config["instructions"],
-                deps_type=type(ctx.deps),
-                toolsets=[fs_toolset, todo_toolset],
-            )
+        notes = merge_batch_overlays(overlays, results)
+
+        # Cache against the file state after all merges
+        if result_cache is not None:
+            for index, shaped in fresh.items():
+                item = tasks[index]
+                result_cache.put(cache_key(ctx, item["subagent_type"], item["description"]), shaped)
+
+        return format_batch_results(tasks, results, notes, timeout=task_timeout)
+
+    # Update the tools' docstrings with available subagents
+    for tool_func in (task, task_batch):
+        if tool_func.__doc__:  # pragma: no branch
+            tool_func.__doc__ += f"\n\nAvailable subagent types:\n{available_subagents}"
+
+    return toolset
+
+
+@dataclass
+class SubAgentRunResult:
+    """Outcome of a single subagent run."""
+
+    output: str
+    """Final output (JSON for structured output), or the last text if it was stopped."""
+
+    task_id: str = ""
+    """Identifier of this run, as used in `SubAgentEvent`s."""
+
+    stopped: str | None = None
+    """Why the run was cut short by its budget, or None if it completed."""
 
-            # Add custom tools if any
-            for tool in tools:
-                if callable(tool):
-                    subagent.tool(tool)
+    requests: int = 0
+    """Number of model requests made."""
 
-            # Cache the subagent
-            ctx.deps.subagents[subagent_type] = subagent
+    total_tokens: int = 0
+    """Input plus output tokens used."""
 
-        # Create isolated deps for the subagent
-        subagent_deps = ctx.deps.clone_for_subagent()
+    input_tokens: int = 0
+    """Input tokens used."""
 
-        # Run the subagent
+    output_tokens: int = 0
+    """Output tokens used."""
+
+
+async def run_subagent(  # noqa: C901
+    agent: Any,
+    description: str,
+    deps: DeepAgentDeps,
+    *,
+    subagent_type: str,
+    budget: SubAgentBudget | None = None,
+    event_sink: Callable[[SubAgentEvent], Any] | None = None,
+) -> SubAgentRunResult:
+    """Run a subagent node by node, streaming progress and enforcing a budget.
+
+    Text deltas and tool calls/results are forwarded to `event_sink` as
+    `SubAgentEvent`s while the subagent runs. When the token, step or time
+    budget is exhausted the run is stopped and the last text the subagent
+    produced is returned as partial output.
+
+    Args:
+        agent: The subagent `Agent`.
+        description: Task prompt for the subagent.
+        deps: Deps for the subagent run.
+        subagent_type: Subagent type name, included in events.
+        budget: Optional token/time/step limits.
+        event_sink: Optional callback (sync or async) receiving progress events.
+
+    Returns:
+        The subagent output, with the stop reason if it was cut short.
+
+    Raises:
+        Exception: Any error raised by the subagent other than budget exhaustion.
+    """
+    budget = budget or {}
+    task_id = uuid.uuid4().hex[:8]
+    limits: dict[str, int] = {}
+    if "max_steps" in budget:
+        limits["request_limit"] = budget["max_steps"]
+    if "max_tokens" in budget:
+        limits["total_tokens_limit"] = budget["max_tokens"]
+
+    partial = ""
+    usage: Any = None
+
+    async def emit(kind: str, **fields: Any) -> None:
+        if event_sink is None:
+            return
+        event = SubAgentEvent(task_id=task_id, subagent_type=subagent_type, kind=kind, **fields)  # type: ignore[typeddict-item]
         try:
-            result = await subagent.run(description, deps=subagent_deps)
-            return f"Subagent '{subagent_type}' completed:\n\n{result.output}"
-        except Exception as e:
-            return f"Subagent '{subagent_type}' failed: {e}"
+            result = event_sink(event)
+            if inspect.isawaitable(result):
+                await result
+        except Exception:  # pragma: no cover
+            # A broken sink (e.g. a closed WebSocket) must not fail the subagent
+            pass
+
+    async def forward(stream: Any) -> None:
+        async for event in stream:
+            if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                if event.part.content:
+                    await emit("text", content=event.part.content)
+            elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                await emit("text", content=event.delta.content_delta)
+            elif isinstance(event, FunctionToolCallEvent):
+                await emit("tool_call", tool_name=event.part.tool_name, args=event.part.args)
+            elif isinstance(event, FunctionToolResultEvent):
+                await emit(
+                    "tool_result",
+                    tool_name=event.part.tool_name,
+                    content=str(event.part.content),
+                )
+
+    async def drive() -> str:
+        nonlocal partial, usage
+        async with agent.iter(description, deps=deps, usage_limits=UsageLimits(**limits)) as run:
+            async for node in run:
+                if Agent.is_call_tools_node(node):
+                    text = "".join(
+                        part.content
+                        for part in node.model_response.parts
+                        if isinstance(part, TextPart)
+                    )
+                    partial = text or partial
+                if event_sink is not None and (
+                    Agent.is_model_request_node(node) or Agent.is_call_tools_node(node)
+                ):
+                    async with node.stream(run.ctx) as stream:
+                        await forward(stream)
+                usage = run.usage
+            assert run.result is not None
+            return _output_to_text(run.result.output)
+
+    await emit("start", content=description)
+    stopped: str | None = None
+    loop = asyncio.get_running_loop()
+    max_seconds = budget.get("max_seconds")
+    deadline = None if max_seconds is None else loop.time() + max_seconds
+    try:
+        output = await asyncio.wait_for(drive(), max_seconds)
+    except UsageLimitExceeded as e:
+        stopped, output = str(e), partial
+    except (TimeoutError, asyncio.TimeoutError) as e:
+        if deadline is None or loop.time() < deadline:
+            # Raised inside the subagent (e.g. by a tool), not by the time budget
+            await emit("failed", content=str(e))
+            raise
+        stopped, output = f"time budget of {max_seconds:g}s exceeded", partial
+    except Exception as e:
+        await emit("failed", content=str(e))
+        raise
+
+    if stopped:
+        await emit("aborted", content=stopped)
+    else:
+        await emit("complete", content=output)
+    return SubAgentRunResult(
+        output=output,
+        task_id=task_id,
+        stopped=stopped,
+        requests=usage.requests if usage else 0,
+        total_tokens=usage.total_tokens if usage else 0,
+        input_tokens=usage.input_tokens if usage else 0,
+        output_tokens=usage.output_tokens if usage else 0,
+    )
 
-    # Update the tool's docstring with available subagents
-    if task.__doc__:  # pragma: no branch
-        task.__doc__ += f"\n\nAvailable subagent types:\n{available_subagents}"
 
-    return toolset
+async def run_concurrently(
+    jobs: Sequence[Callable[[], Awaitable[T]]],
+    *,
+    max_concurrency: int = 4,
+    timeout: float | None = None,
+) -> list[T | BaseException]:
+    """Run async jobs concurrently with a concurrency limit and per-job timeout.
+
+    Args:
+        jobs: Zero-argument callables returning awaitables.
+        max_concurrency: Maximum number of jobs running at the same time.
+        timeout: Timeout in seconds for each job, measured from when it starts.
+
+    Returns:
+        One entry per job, in the order of `jobs`: the job's result, or the
+        exception it raised (`TimeoutError` on timeout).
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def guarded(job: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await asyncio.wait_for(job(), timeout)
+
+    return await asyncio.gather(*(guarded(job) for job in jobs), return_exceptions=True)
+
+
+def format_batch_results(
+    tasks: Sequence[SubAgentTask],
+    results: Sequence[str | BaseException],
+    notes: Sequence[str] = (),
+    *,
+    timeout: float | None = None,
+) -> str:
+    """Format `task_batch` results in task order.
+
+    Args:
+        tasks: The tasks that were run.
+        results: Output string or exception for each task.
+        notes: Optional text appended to each task's section (e.g. merge conflicts).
+        timeout: The per-task timeout, used to describe timeouts.
+
+    Returns:
+        A report with a summary line and one section per task.
+    """
+    succeeded = sum(1 for r in results if not isinstance(r, BaseException))
+    lines = [f"Batch completed: {succeeded}/{len(tasks)} tasks succeeded."]
+
+    for i, (item, result) in enumerate(zip(tasks, results, strict=True)):
+        header = f"### Task {i + 1}: {item['subagent_type']}"
+        if isinstance(result, BaseException):
+            lines.append(f"\n{header} (failed)\nError: {_describe_error(result, timeout)}")
+        else:
+            lines.append(f"\n{header} (completed)\n{result}")
+        if i < len(notes) and notes[i]:
+            lines.append(notes[i].lstrip("\n"))
+
+    return "\n".join(lines)
+
+
+def merge_batch_overlays(
+    overlays: Sequence[OverlayBackend | None],
+    results: Sequence[str | BaseException],
+) -> list[str]:
+    """Merge the overlays of `task_batch` subagents into the parent, in task order.
+
+    Tasks that returned are committed, including runs stopped early by their
+    budget: their report already says the output is partial, and the files they
+    finished writing are kept. Failed and timed-out tasks are discarded. Earlier
+    tasks win conflicts; conflicting files of later tasks are not merged.
+
+    Args:
+        overlays: The copy-on-write backend of each task, or None if it had none.
+        results: Output string or exception for each task.
+
+    Returns:
+        One note per task describing unmerged changes (see `format_merge_result`).
+    """
+    notes: list[str] = []
+    for overlay, result in zip(overlays, results, strict=True):
+        if overlay is None:
+            notes.append("")
+        elif isinstance(result, BaseException):
+            overlay.discard()
+            notes.append("")
+        else:
+            notes.append(format_merge_result(overlay.commit()))
+    return notes
+
+
+def shape_subagent_result(
+    output: str,
+    config: SubAgentConfig,
+    backend: BackendProtocol,
+    *,
+    name: str,
+) -> str:
+    """Fit a subagent result into the parent's context.
+
+    Results within `max_result_tokens` are returned unchanged. Larger results
+    are saved to `result_offload_dir` in the backend, returning a preview and
+    a pointer to the file; without an offload directory they are truncated.
+
+    Args:
+        output: The subagent's output text.
+        config: The subagent configuration.
+        backend: Backend to save oversized results to.
+        name: File name stem for the saved result.
+
+    Returns:
+        The text to return to the parent agent.
+    """
+    max_tokens = config.get("max_result_tokens")
+    if max_tokens is None or len(output) <= max_tokens * 4:
+        return output
+
+    max_chars = max_tokens * 4
+    total_tokens = len(output) // 4
+
+    offload_dir = config.get("result_offload_dir")
+    if offload_dir:
+        extension = "json" if "output_type" in config else "md"
+        path = f"{offload_dir.rstrip('/')}/{name}.{extension}"
+        write = backend.write(path, output)
+        if not write.error:
+            pointer = (
+                f"\n\n[Full result (~{total_tokens} tokens) saved to {write.path}. "
+                "Use read_file to see the rest.]"
+            )
+            return output[: max(0, max_chars - len(pointer))] + pointer
+
+    omitted = len(output) - max_chars
+    return output[:max_chars] + f"\n\n[... {omitted} more characters truncated]"
+
+
+def _output_to_text(output: Any) -> str:
+    """Render a subagent output, serializing structured output as compact JSON."""
+    if isinstance(output, str):
+        return output
+    if isinstance(output, BaseModel):
+        return output.model_dump_json()
+    try:
+        return json.dumps(to_jsonable_python(output))
+    except Exception:  # pragma: no cover
+        return str(output)
+
+
+def _describe_error(error: BaseException, timeout: float | None) -> str:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return f"Timed out after {timeout:g}s" if timeout else "Timed out"
+    return str(error) or type(error).__name__
+
+
+def format_merge_result(result: OverlayMergeResult) -> str:
+    """Describe unmerged overlay changes for the parent agent.
+
+    Args:
+        result: Result of committing a subagent's overlay.
+
+    Returns:
+        Empty string if everything merged, otherwise a note listing the
+        conflicting and failed paths.
+    """
+    if result.ok:
+        return ""
+
+    lines = ["", "", "Some file changes were not merged:"]
+    for path in result.conflicts:
+        lines.append(f"- {path}: modified by another agent while the subagent was running")
+    for path, error in result.errors.items():
+        lines.append(f"- {path}: {error}")
+    return "\n".join(lines)
 
 
 def get_subagent_system_prompt(
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import TypedDict, TypeVar
+from typing import Any, Literal, TypeVar
 
 from pydantic_ai.output import OutputSpec
 from pydantic_ai_backends import (
@@ -27,7 +27,7 @@ from pydantic_ai_backends import (
     WriteResult as WriteResult,
 )
 from pydantic_ai_todo import Todo as Todo
-from typing_extensions import NotRequired
+from typing_extensions import NotRequired, TypedDict
 
 # Re-export OutputSpec from pydantic-ai for structured output support
 # This allows users to specify the response format for agents
@@ -37,6 +37,25 @@ ResponseFormat = OutputSpec[object]
 OutputT = TypeVar("OutputT")
 
 
+class SubAgentBudget(TypedDict, total=False):
+    """Resource limits for a single subagent run; the run stops when one is hit."""
+
+    max_tokens: int  # Total input + output tokens across all model requests
+    max_seconds: float  # Wall-clock time
+    max_steps: int  # Number of model requests
+
+
+class SubAgentEvent(TypedDict):
+    """Progress event emitted by a running subagent to `DeepAgentDeps.event_sink`."""
+
+    task_id: str  # Identifies one subagent run (several can run concurrently)
+    subagent_type: str
+    kind: Literal["start", "text", "tool_call", "tool_result", "complete", "aborted", "failed"]
+    content: NotRequired[str]  # Text delta, tool result, or error/abort reason
+    tool_name: NotRequired[str]
+    args: NotRequired[Any]
+
+
 class SubAgentConfig(TypedDict):
     """Configuration for a subagent."""
 
@@ -45,6 +64,20 @@ class SubAgentConfig(TypedDict):
     instructions: str
     tools: NotRequired[list[object]]
     model: NotRequired[str]
+    # Isolate writes in an overlay, merged on completion (default: off for task, on for
+    # task_batch). Overlays forward execute to a sandbox backend without isolating it.
+    copy_on_write: NotRequired[bool]
+    budget: NotRequired[SubAgentBudget]  # Token/time/step limits for each run
+    output_type: NotRequired[Any]  # Structured output schema; results are returned as JSON
+    max_result_tokens: NotRequired[int]  # Cap on the result returned to the parent
+    result_offload_dir: NotRequired[str]  # Save oversized results here, return a pointer
+
+
+class SubAgentTask(TypedDict):
+    """A single delegation in a `task_batch` call."""
+
+    description: str
+    subagent_type: str
 
 
 class CompiledSubAgent(TypedDict):
@@ -70,13 +103,14 @@ class Skill(TypedDict):
 
     name: str
     description: str
-    path: str  # Path to the skill directory
+    path: str  # Path to the skill directory (or skill bundle archive)
     tags: list[str]
     version: str
     author: str
     frontmatter_loaded: bool  # Whether only frontmatter is loaded
     instructions: NotRequired[str]  # Full instructions (loaded on demand)
     resources: NotRequired[list[str]]  # List of additional files in the skill directory
+    content_hash: NotRequired[str]  # SHA-256 of the skill bundle archive (bundles only)
 
 
 class SkillDirectory(TypedDict):
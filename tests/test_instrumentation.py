@@ -0,0 +1,232 @@
+"""Tests for usage and latency instrumentation."""
+
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.test import TestModel
+from pydantic_ai_backends import StateBackend
+
+from pydantic_deep import DeepAgentDeps, create_deep_agent
+from pydantic_deep.instrumentation import (
+    InMemorySink,
+    Instrumentation,
+    JsonlSink,
+    OTelFileExporter,
+    RunSummary,
+    current_span,
+)
+from pydantic_deep.processors import SummarizationProcessor
+from pydantic_deep.toolsets.subagents import SubAgentResultCache, create_subagent_toolset
+from pydantic_deep.types import SubAgentConfig
+
+
+class TestSpans:
+    """Tests for span recording and sinks."""
+
+    def test_nested_spans_share_trace(self):
+        """Test that child spans link to their parent and trace."""
+        sink = InMemorySink()
+        instrumentation = Instrumentation(sinks=[sink])
+
+        with instrumentation.span("outer") as outer:
+            with instrumentation.span("inner", "tool") as inner:
+                assert current_span() is inner
+            assert current_span() is outer
+        assert current_span() is None
+
+        assert [s.name for s in sink.spans] == ["inner", "outer"]
+        assert inner.trace_id == outer.trace_id
+        assert inner.parent_id == outer.span_id
+        assert outer.parent_id is None
+        assert outer.duration_ms >= inner.duration_ms >= 0
+
+    def test_errors_are_recorded(self):
+        """Test that an exception marks the span as failed and propagates."""
+        sink = InMemorySink()
+        instrumentation = Instrumentation(sinks=[sink])
+
+        with pytest.raises(ValueError), instrumentation.span("boom", "tool"):
+            raise ValueError("bad input")
+
+        assert sink.spans[0].status == "error"
+        assert sink.spans[0].error == "ValueError: bad input"
+        assert sink.summary().by_kind("tool").errors == 1
+
+    def test_disabled_and_failing_sinks(self):
+        """Test that disabled instrumentation exports nothing and sink errors are contained."""
+
+        class BrokenSink:
+            def export(self, span):
+                raise RuntimeError("sink down")
+
+        sink = InMemorySink()
+        with Instrumentation(sinks=[sink], enabled=False).span("skipped"):
+            pass
+        assert sink.spans == []
+
+        instrumentation = Instrumentation(sinks=[BrokenSink()])
+        instrumentation.add_sink(sink)
+        with instrumentation.span("kept"):
+            pass
+        assert [s.name for s in sink.spans] == ["kept"]
+
+    def test_jsonl_sink(self, tmp_path):
+        """Test that the JSONL sink writes one object per span."""
+        path = tmp_path / "spans.jsonl"
+        instrumentation = Instrumentation(sinks=[JsonlSink(path)])
+        with instrumentation.span("read_file", "tool") as span:
+            span.bytes_returned = 42
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 1
+        record = json.loads(lines[0])
+        assert record["name"] == "read_file"
+        assert record["bytes_returned"] == 42
+
+    def test_otlp_export(self, tmp_path):
+        """Test that spans are written as OTLP/JSON with GenAI usage attributes."""
+        path = tmp_path / "traces.jsonl"
+        exporter = OTelFileExporter(path, service_name="test-service")
+        instrumentation = Instrumentation(sinks=[exporter])
+        with instrumentation.span("gpt", "model_request") as span:
+            span.input_tokens, span.output_tokens = 10, 5
+
+        request = json.loads(path.read_text())
+        resource_spans = request["resourceSpans"][0]
+        service = resource_spans["resource"]["attributes"][0]
+        assert service["value"]["stringValue"] == "test-service"
+        otlp_span = resource_spans["scopeSpans"][0]["spans"][0]
+        assert otlp_span["traceId"] == span.trace_id
+        attributes = {a["key"]: a["value"] for a in otlp_span["attributes"]}
+        assert attributes["gen_ai.usage.input_tokens"] == {"intValue": "10"}
+        assert attributes["gen_ai.usage.output_tokens"] == {"intValue": "5"}
+
+
+class TestRunSummary:
+    """Tests for per-run summaries."""
+
+    def test_trace_collects_summary(self):
+        """Test that trace() aggregates every span opened inside it."""
+        instrumentation = Instrumentation()
+        with instrumentation.trace("chat") as trace:
+            for _ in range(2):
+                with instrumentation.span("model", "model_request") as span:
+                    span.input_tokens, span.output_tokens = 100, 20
+            with instrumentation.span("subagent", "subagent") as span:
+                span.cache_hit = True
+
+        summary = trace.summary
+        assert summary.input_tokens == 200
+        assert summary.output_tokens == 40
+        assert summary.by_operation[("model_request", "model")].count == 2
+        assert summary.by_kind("subagent").cache_hits == 1
+        assert summary.wall_ms == trace.root.duration_ms
+        assert ("agent_run", "chat") in summary.by_operation
+
+        report = summary.format()
+        assert "200 input / 40 output tokens" in report
+        assert summary.to_dict()["input_tokens"] == 200
+
+    def test_from_spans(self):
+        """Test building a summary from exported spans."""
+        sink = InMemorySink()
+        instrumentation = Instrumentation(sinks=[sink])
+        with instrumentation.trace() as first, instrumentation.span("ls", "tool"):
+            pass
+        with instrumentation.trace(), instrumentation.span("grep", "tool"):
+            pass
+
+        summary = sink.summary(first.trace_id)
+        assert isinstance(summary, RunSummary)
+        assert ("tool", "ls") in summary.by_operation
+        assert ("tool", "grep") not in summary.by_operation
+        sink.clear()
+        assert sink.spans == []
+
+
+class TestAgentInstrumentation:
+    """Tests for instrumentation wired through create_deep_agent."""
+
+    @pytest.mark.anyio
+    async def test_model_and_tool_spans(self):
+        """Test that model requests and user tool calls are recorded."""
+
+        def ping() -> str:
+            """Return pong."""
+            return "pong"
+
+        sink = InMemorySink()
+        instrumentation = Instrumentation(sinks=[sink])
+        agent = create_deep_agent(
+            model=TestModel(call_tools=["ping"]),
+            tools=[ping],
+            include_subagents=False,
+            include_skills=False,
+            instrumentation=instrumentation,
+        )
+
+        with instrumentation.trace("chat") as trace:
+            await agent.run("Ping it", deps=DeepAgentDeps(backend=StateBackend()))
+
+        summary = trace.summary
+        assert summary.by_kind("model_request").count == 2
+        assert summary.input_tokens > 0
+        tool_stats = summary.by_operation[("tool", "ping")]
+        assert tool_stats.count == 1
+        assert tool_stats.bytes_returned == len("pong")
+        tool_span = next(s for s in sink.spans if s.name == "ping")
+        assert tool_span.trace_id == trace.trace_id
+        assert "run_id" in tool_span.attributes
+
+    def test_summarization_processor_is_attached(self):
+        """Test that summarization processors pick up the agent's instrumentation."""
+        instrumentation = Instrumentation()
+        processor = SummarizationProcessor(model="test", trigger=("messages", 10))
+        create_deep_agent(
+            model=TestModel(),
+            history_processors=[processor],
+            instrumentation=instrumentation,
+        )
+        assert processor.instrumentation is instrumentation
+
+    @pytest.mark.anyio
+    async def test_subagent_spans(self):
+        """Test that delegations record subagent spans, including cache hits."""
+        sink = InMemorySink()
+        instrumentation = Instrumentation(sinks=[sink])
+        toolset = create_subagent_toolset(
+            subagents=[
+                SubAgentConfig(
+                    name="researcher",
+                    description="Research topics",
+                    instructions="Research thoroughly.",
+                    model="test",
+                )
+            ],
+            include_general_purpose=False,
+            result_cache=SubAgentResultCache(),
+            instrumentation=instrumentation,
+        )
+
+        def delegate(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                args = {"description": "Look it up", "subagent_type": "researcher"}
+                return ModelResponse(parts=[ToolCallPart("task", args)])
+            return ModelResponse(parts=[TextPart("done")])
+
+        agent = Agent(FunctionModel(delegate), deps_type=DeepAgentDeps, toolsets=[toolset])
+        deps = DeepAgentDeps(backend=StateBackend())
+        with instrumentation.trace() as trace:
+            await agent.run("go", deps=deps)
+            await agent.run("go again", deps=deps)
+
+        spans = [s for s in sink.spans if s.kind == "subagent"]
+        assert [s.cache_hit for s in spans] == [False, True]
+        assert spans[0].input_tokens > 0
+        # The subagent's own model requests are nested under its span
+        nested = {s.kind for s in sink.spans if s.parent_id == spans[0].span_id}
+        assert nested == {"model_request", "tool"}
+        assert trace.summary.by_kind("subagent").cache_hits == 1
@@ -0,0 +1,184 @@
+"""Tests for the copy-on-write overlay backend."""
+
+from pydantic_ai_backends import ExecuteResponse, FilesystemBackend, SandboxProtocol, StateBackend
+
+from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.overlay import OverlayBackend, OverlayMergeResult, SandboxOverlayBackend
+from pydantic_deep.toolsets.subagents import format_merge_result
+
+
+class _FakeSandbox(StateBackend):
+    """State backend that records executed commands."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.commands: list[str] = []
+
+    @property
+    def id(self) -> str:
+        return "sandbox-1"
+
+    def execute(self, command: str, timeout: int | None = None) -> ExecuteResponse:
+        self.commands.append(command)
+        return ExecuteResponse(output=f"ran {command}", exit_code=0)
+
+
+class TestOverlayBackend:
+    """Tests for OverlayBackend."""
+
+    def test_reads_fall_through(self):
+        """Test that base files are visible without copying."""
+        base = StateBackend()
+        base.write("/a.txt", "hello")
+        overlay = OverlayBackend(base)
+        assert "hello" in overlay.read("/a.txt")
+        assert [f["path"] for f in overlay.glob_info("*.txt")] == ["/a.txt"]
+        assert overlay.files == {}
+
+    def test_writes_stay_private(self):
+        """Test that writes go to the overlay, not the base."""
+        base = StateBackend()
+        base.write("/a.txt", "base")
+        overlay = OverlayBackend(base)
+
+        overlay.write("/a.txt", "overlay")
+        overlay.write("/b.txt", "new")
+
+        assert "overlay" in overlay.read("/a.txt")
+        assert "base" in base.read("/a.txt")
+        assert "/b.txt" not in base._files
+        assert overlay.changed_paths == ["/a.txt", "/b.txt"]
+        assert [e["name"] for e in overlay.ls_info("/")] == ["a.txt", "b.txt"]
+
+    def test_edit_copies_on_write(self):
+        """Test that editing copies the base file into the overlay."""
+        base = StateBackend()
+        base.write("/a.txt", "one two")
+        overlay = OverlayBackend(base)
+
+        result = overlay.edit("/a.txt", "one", "three")
+
+        assert result.error is None
+        assert "three two" in overlay.read("/a.txt")
+        assert "one two" in base.read("/a.txt")
+        assert overlay.edit("/missing.txt", "x", "y").error is not None
+
+    def test_grep_prefers_overlay(self):
+        """Test that grep sees overlay contents for changed files."""
+        base = StateBackend()
+        base.write("/a.txt", "needle")
+        base.write("/b.txt", "needle")
+        overlay = OverlayBackend(base)
+        overlay.write("/a.txt", "hay")
+
+        matches = overlay.grep_raw("needle")
+
+        assert isinstance(matches, list)
+        assert [m["path"] for m in matches] == ["/b.txt"]
+
+    def test_commit_merges_changes(self):
+        """Test that commit writes overlay files into the base."""
+        base = StateBackend()
+        base.write("/a.txt", "base")
+        overlay = OverlayBackend(base)
+        overlay.edit("/a.txt", "base", "merged")
+        overlay.write("/new.txt", "x")
+
+        result = overlay.commit()
+
+        assert result.ok
+        assert result.merged == ["/a.txt", "/new.txt"]
+        assert "merged" in base.read("/a.txt")
+        assert overlay.files == {}
+
+    def test_commit_detects_conflicts(self):
+        """Test that concurrent base changes are reported, not overwritten."""
+        base = StateBackend()
+        base.write("/a.txt", "base")
+        first = OverlayBackend(base)
+        second = OverlayBackend(base)
+        first.write("/a.txt", "first")
+        second.write("/a.txt", "second")
+        second.write("/b.txt", "created")
+        base.write("/b.txt", "parent")
+
+        assert first.commit().merged == ["/a.txt"]
+        result = second.commit()
+
+        assert result.conflicts == ["/a.txt", "/b.txt"]
+        assert "first" in base.read("/a.txt")
+        assert second.changed_paths == ["/a.txt", "/b.txt"]
+
+        assert second.commit(force=True).merged == ["/a.txt", "/b.txt"]
+        assert "second" in base.read("/a.txt")
+
+    def test_discard(self):
+        """Test that discard drops overlay changes."""
+        overlay = OverlayBackend(StateBackend())
+        overlay.write("/a.txt", "x")
+        overlay.discard()
+        assert overlay.changed_paths == []
+        assert overlay.commit().merged == []
+
+    def test_filesystem_base(self, tmp_path):
+        """Test conflict detection against a non-state backend."""
+        base = FilesystemBackend(tmp_path)
+        base.write("/a.txt", "base")
+        overlay = OverlayBackend(base)
+        overlay.edit("/a.txt", "base", "edited")
+        base.write("/a.txt", "changed")
+
+        assert overlay.commit().conflicts == ["/a.txt"]
+
+    def test_sandbox_overlay_forwards_execute(self):
+        """Test that commands run in the base sandbox while writes stay private."""
+        base = _FakeSandbox()
+        overlay = SandboxOverlayBackend(base)
+        overlay.write("/a.txt", "private")
+
+        assert overlay.id == "sandbox-1"
+        assert overlay.execute("ls").output == "ran ls"
+        assert base.commands == ["ls"]
+        assert "/a.txt" not in base._files
+
+
+class TestCopyOnWriteDeps:
+    """Tests for copy-on-write subagent deps."""
+
+    def test_clone_uses_overlay(self):
+        """Test that copy-on-write clones isolate writes from the parent."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.backend.write("/shared.txt", "x")
+
+        cloned = deps.clone_for_subagent(copy_on_write=True)
+        cloned.backend.write("/sub.txt", "y")
+
+        assert isinstance(cloned.backend, OverlayBackend)
+        assert cloned.uploads is deps.uploads
+        assert list(cloned.files) == ["/sub.txt"]
+        assert "/sub.txt" not in deps.files
+        assert "x" in cloned.backend.read("/shared.txt")
+
+        cloned.backend.commit()
+        assert "/sub.txt" in deps.files
+
+    def test_clone_of_sandbox_keeps_execute(self):
+        """Test that copy-on-write clones of a sandbox backend can still execute."""
+        deps = DeepAgentDeps(backend=_FakeSandbox())
+        cloned = deps.clone_for_subagent(copy_on_write=True)
+
+        assert isinstance(cloned.backend, SandboxOverlayBackend)
+        assert isinstance(cloned.backend, SandboxProtocol)
+        assert not isinstance(
+            DeepAgentDeps(backend=StateBackend()).clone_for_subagent(copy_on_write=True).backend,
+            SandboxProtocol,
+        )
+
+    def test_format_merge_result(self):
+        """Test the note appended to subagent output on conflicts."""
+        assert format_merge_result(OverlayMergeResult(merged=["/a.txt"])) == ""
+        note = format_merge_result(
+            OverlayMergeResult(conflicts=["/a.txt"], errors={"/b.txt": "denied"})
+        )
+        assert "/a.txt: modified by another agent" in note
+        assert "/b.txt: denied" in note
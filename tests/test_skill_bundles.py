@@ -0,0 +1,333 @@
+"""Tests for skills packed as zip and tar bundles."""
+
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+from pydantic_ai_backends import StateBackend
+
+from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.toolsets.skill_bundles import SkillBundle, is_skill_bundle
+from pydantic_deep.toolsets.skill_sync import SkillMaterializer, skill_content_hash
+from pydantic_deep.toolsets.skills import (
+    SkillIndex,
+    SkillRegistry,
+    load_skill_instructions,
+    read_bundle_resource,
+)
+
+SKILL_MD = """---
+name: packed
+description: A packed skill
+tags: [archive]
+---
+
+# Packed instructions
+"""
+
+ROWS = "".join(f"row {i}\n" for i in range(100))
+
+
+def _bump_mtime(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def _write_zip(path, prefix="", compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        zf.writestr(f"{prefix}SKILL.md", SKILL_MD)
+        zf.writestr(f"{prefix}data/rows.txt", ROWS)
+        zf.writestr(f"{prefix}blob.bin", b"\x00\x01" * 10)
+    return path
+
+
+def _write_tar(path, mode="w"):
+    with tarfile.open(path, mode) as tf:
+        for name, data in [("SKILL.md", SKILL_MD.encode()), ("data/rows.txt", ROWS.encode())]:
+            info = tarfile.TarInfo(f"packed/{name}")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return path
+
+
+class TestSkillBundle:
+    """Tests for reading bundle archives."""
+
+    @pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+    def test_zip_members(self, tmp_path, compression):
+        """Test member listing and ranged reads for stored and deflated zips."""
+        bundle = SkillBundle(_write_zip(tmp_path / "s.zip", "packed/", compression))
+        assert bundle.resources == ["blob.bin", "data/rows.txt"]
+        stored = compression == zipfile.ZIP_STORED
+        assert (bundle.members["data/rows.txt"].data_offset is not None) is stored
+        assert bundle.read_bytes("data/rows.txt", 6, 5) == b"row 1"
+        assert bundle.read_text("SKILL.md") == SKILL_MD
+
+    @pytest.mark.parametrize(("name", "mode"), [("s.tar", "w"), ("s.tar.gz", "w:gz")])
+    def test_tar_members(self, tmp_path, name, mode):
+        """Test that plain and compressed tars are read lazily by member."""
+        bundle = SkillBundle(_write_tar(tmp_path / name, mode))
+        assert bundle.resources == ["data/rows.txt"]
+        assert (bundle.members["SKILL.md"].data_offset is not None) is (mode == "w")
+        assert bundle.read_bytes("data/rows.txt", 6, 5) == b"row 1"
+
+    @pytest.mark.parametrize("name", ["s.zip", "s.tgz"])
+    def test_extract_streams_compressed_member_once(self, tmp_path, name, monkeypatch):
+        """Test that extracting a multi-chunk compressed member opens it only once."""
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        path = tmp_path / name
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("SKILL.md", SKILL_MD)
+                zf.writestr("big.bin", data)
+        else:
+            with tarfile.open(path, "w:gz") as tf:
+                for member, content in [("SKILL.md", SKILL_MD.encode()), ("big.bin", data)]:
+                    info = tarfile.TarInfo(member)
+                    info.size = len(content)
+                    tf.addfile(info, io.BytesIO(content))
+        bundle = SkillBundle(path)
+        opens = []
+        original = SkillBundle._open_member
+        monkeypatch.setattr(
+            SkillBundle,
+            "_open_member",
+            lambda self, member: opens.append(member.name) or original(self, member),
+        )
+
+        target = bundle.extract("big.bin", cache_dir=tmp_path / "cache")
+
+        assert target.read_bytes() == data
+        assert opens == ["big.bin"]
+
+    def test_open_reuses_unchanged_bundle(self, tmp_path):
+        """Test that open() shares instances and content hashes per file version."""
+        path = _write_zip(tmp_path / "s.zip")
+        bundle = SkillBundle.open(path)
+        assert SkillBundle.open(path) is bundle
+        assert len(bundle.content_hash) == 64
+        assert SkillBundle(_write_zip(tmp_path / "copy.zip")).content_hash == bundle.content_hash
+
+    def test_unsafe_member_names_are_hidden(self, tmp_path):
+        """Test that members escaping the skill root are never exposed."""
+        path = tmp_path / "evil.zip"
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("SKILL.md", SKILL_MD)
+            zf.writestr("../escape.txt", "x")
+        assert SkillBundle(path).resources == []
+
+    def test_suffixes(self):
+        """Test bundle file name detection."""
+        assert is_skill_bundle("a.zip")
+        assert is_skill_bundle("a.TAR.GZ")
+        assert not is_skill_bundle("a.md")
+
+
+class TestBundleDiscovery:
+    """Tests for bundles found by skill discovery."""
+
+    def test_discovered_next_to_folders(self, tmp_path):
+        """Test that bundles are discovered with resources and content hash."""
+        _write_zip(tmp_path / "packed.zip")
+        (tmp_path / "broken.zip").write_bytes(b"not an archive")
+
+        index = SkillIndex()
+        skills = index.discover([{"path": str(tmp_path)}])
+
+        assert [s["name"] for s in skills] == ["packed"]
+        assert skills[0]["path"] == str(tmp_path / "packed.zip")
+        assert skills[0]["tags"] == ["archive"]
+        assert skills[0]["resources"] == ["blob.bin", "data/rows.txt"]
+        assert skills[0]["content_hash"] == SkillBundle(tmp_path / "packed.zip").content_hash
+
+        parsed = index.parsed
+        index.discover([{"path": str(tmp_path)}])
+        assert index.parsed == parsed
+
+    def test_instructions_and_resources(self, tmp_path):
+        """Test loading instructions and paging resources from a bundle."""
+        path = str(_write_zip(tmp_path / "packed.zip", compression=zipfile.ZIP_DEFLATED))
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+
+        assert registry.load_instructions("packed") == "# Packed instructions"
+        assert load_skill_instructions(path) == "# Packed instructions"
+
+        cache = tmp_path / "cache"
+        page = read_bundle_resource(path, "data/rows.txt", 98, 10, cache_dir=cache)
+        assert page == "row 98\nrow 99\n"
+        assert len(list(cache.rglob("rows.txt"))) == 1
+        assert read_bundle_resource(path, "data/rows.txt", byte_offset=0, byte_length=5).startswith(
+            "row 0"
+        )
+        assert "binary file" in read_bundle_resource(path, "blob.bin", cache_dir=cache)
+        assert "not found" in read_bundle_resource(path, "missing.txt")
+
+    def test_removed_bundle_forgets_instructions(self, tmp_path):
+        """Test that removing a bundle drops its cached instructions."""
+        path = _write_zip(tmp_path / "packed.zip")
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+        registry.load_instructions("packed")
+        assert str(path) in registry._instructions
+
+        path.unlink()
+        _bump_mtime(tmp_path)
+        assert registry.refresh() is True
+        assert registry._instructions == {}
+
+
+class _FakeSandbox(StateBackend):
+    """State backend posing as a sandbox with an id and execute()."""
+
+    id = "sandbox-1"
+
+    def __init__(self):
+        super().__init__()
+        self.commands: list[str] = []
+
+    def execute(self, command, timeout=None):
+        self.commands.append(command)
+        if command.startswith("rm -rf "):
+            prefix = command.removeprefix("rm -rf ") + "/"
+            for path in [p for p in self._files if p.startswith(prefix)]:
+                del self._files[path]
+
+
+class TestSkillMaterializer:
+    """Tests for copying skills into backends."""
+
+    @staticmethod
+    def _folder_skill(tmp_path):
+        folder = tmp_path / "runner"
+        (folder / "scripts").mkdir(parents=True)
+        (folder / "SKILL.md").write_text("---\nname: runner\ndescription: Runs\n---\nRun it.")
+        (folder / "scripts" / "run.py").write_text("print('hi')")
+        return SkillIndex().discover([{"path": str(tmp_path)}])[0]
+
+    def test_copies_once_per_version(self, tmp_path):
+        """Test that unchanged skills are not copied again."""
+        skill = self._folder_skill(tmp_path)
+        backend = StateBackend()
+        materializer = SkillMaterializer(root="/skills")
+
+        assert materializer.materialize(backend, skill) == "/skills/runner"
+        assert backend._read_bytes("/skills/runner/scripts/run.py") == b"print('hi')"
+        assert materializer.files_written == 3  # SKILL.md, script, marker
+
+        materializer.materialize(backend, skill)
+        SkillMaterializer(root="/skills").materialize(backend, skill)
+        assert materializer.files_written == 3
+
+        script = tmp_path / "runner" / "scripts" / "run.py"
+        script.write_text("print('changed')")
+        _bump_mtime(script)
+        materializer.materialize(backend, skill)
+        assert backend._read_bytes("/skills/runner/scripts/run.py") == b"print('changed')"
+
+    def test_sandboxes_are_remembered(self, tmp_path):
+        """Test that sandboxes skip even the marker check after the first copy."""
+        skill = self._folder_skill(tmp_path)
+        sandbox = _FakeSandbox()
+        materializer = SkillMaterializer()
+
+        materializer.materialize(sandbox, skill)
+        assert sandbox.commands == ["rm -rf /skills/runner"]
+        sandbox._files.clear()
+        materializer.materialize(sandbox, skill)
+        assert sandbox.commands == ["rm -rf /skills/runner"]
+
+    def test_discarded_overlay_does_not_mark_parent(self, tmp_path):
+        """Test that a copy-on-write subagent neither removes nor claims the parent's copy."""
+        skill = self._folder_skill(tmp_path)
+        sandbox = _FakeSandbox()
+        materializer = SkillMaterializer()
+        materializer.materialize(sandbox, skill)
+        script = tmp_path / "runner" / "scripts" / "run.py"
+        script.write_text("print('changed')")
+        _bump_mtime(script)
+
+        child = DeepAgentDeps(backend=sandbox).clone_for_subagent(copy_on_write=True)
+        materializer.materialize(child.backend, skill)
+
+        assert sandbox.commands == ["rm -rf /skills/runner"]
+        assert sandbox._read_bytes("/skills/runner/scripts/run.py") == b"print('hi')"
+        assert child.backend._read_bytes("/skills/runner/scripts/run.py") == b"print('changed')"
+
+        child.backend.discard()
+        materializer.materialize(sandbox, skill)
+        assert sandbox._read_bytes("/skills/runner/scripts/run.py") == b"print('changed')"
+
+    def test_host_dir_is_shared_across_sessions(self, tmp_path):
+        """Test that a bind-mounted host copy is written once for every session."""
+        skill = self._folder_skill(tmp_path / "src")
+        host_dir = tmp_path / "shared"
+        materializer = SkillMaterializer(root="/skills", host_dir=str(host_dir))
+        first_session = _FakeSandbox()
+
+        assert materializer.materialize(first_session, skill) == "/skills/runner"
+        assert materializer.volumes == {str(host_dir): "/skills"}
+        assert (host_dir / "runner" / "scripts" / "run.py").read_text() == "print('hi')"
+        assert materializer.files_written == 3
+        assert first_session.commands == [] and not first_session._files
+
+        # A new container and a new process (empty in-process cache) skip the copy
+        materializer.materialize(_FakeSandbox(), skill)
+        later = SkillMaterializer(root="/skills", host_dir=str(host_dir))
+        later.materialize(_FakeSandbox(), skill)
+        assert materializer.files_written == 3
+        assert later.files_written == 0
+
+    def test_host_dir_copy_is_replaced(self, tmp_path):
+        """Test that a changed skill replaces the host copy, dropping removed files."""
+        skill = self._folder_skill(tmp_path / "src")
+        host_dir = tmp_path / "shared"
+        SkillMaterializer(host_dir=str(host_dir)).materialize(StateBackend(), skill)
+        (tmp_path / "src" / "runner" / "scripts" / "run.py").unlink()
+        (tmp_path / "src" / "runner" / "scripts" / "new.py").write_text("print('new')")
+
+        SkillMaterializer(host_dir=str(host_dir)).materialize(StateBackend(), skill)
+
+        assert sorted(p.name for p in (host_dir / "runner" / "scripts").iterdir()) == ["new.py"]
+        assert sorted(p.name for p in host_dir.iterdir()) == ["runner"]
+        marker = (host_dir / "runner" / ".skill-hash").read_text()
+        assert marker == skill_content_hash(skill)
+
+    @pytest.mark.parametrize("name", ["../escape", "a/b", "..", ".hidden", ""])
+    def test_unsafe_names_are_rejected(self, tmp_path, name):
+        """Test that names that would leave the root are never removed or written."""
+        skill = self._folder_skill(tmp_path)
+        skill["name"] = name
+        sandbox = _FakeSandbox()
+
+        with pytest.raises(ValueError, match="cannot be used as a directory name"):
+            SkillMaterializer(root="/skills").materialize(sandbox, skill)
+        assert sandbox.commands == []
+        assert not sandbox._files
+
+    def test_file_digest_cache_is_bounded(self, tmp_path, monkeypatch):
+        """Test that per-file digests are evicted least recently used first."""
+        from pydantic_deep.toolsets import skill_sync
+
+        monkeypatch.setattr(skill_sync, "_FILE_DIGESTS_SIZE", 2)
+        monkeypatch.setattr(skill_sync, "_file_digests", skill_sync.OrderedDict())
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"f{i}.txt"
+            path.write_text(str(i))
+            paths.append(str(path))
+            skill_sync._file_digest(str(path))
+
+        assert list(skill_sync._file_digests) == paths[1:]
+
+    def test_bundles(self, tmp_path):
+        """Test that bundle members are copied with the bundle's content hash."""
+        _write_zip(tmp_path / "packed.zip")
+        skill = SkillIndex().discover([{"path": str(tmp_path)}])[0]
+        backend = StateBackend()
+
+        target = SkillMaterializer().materialize(backend, skill)
+
+        assert backend._read_bytes(f"{target}/data/rows.txt") == ROWS.encode()
+        marker = backend._read_bytes(f"{target}/.skill-hash").decode()
+        assert marker == skill_content_hash(skill) == skill["content_hash"]
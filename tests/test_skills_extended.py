@@ -1,14 +1,27 @@
 """Extended tests for skills toolset to reach 100% coverage."""
 
+import os
+import sys
+import threading
+import time
+
+import pytest
+from pydantic_ai.models.test import TestModel
 from pydantic_ai_backends import StateBackend
 
 from pydantic_deep.deps import DeepAgentDeps
 from pydantic_deep.toolsets.skills import (
+    SkillIndex,
+    SkillRegistry,
+    SkillSearchIndex,
     create_skills_toolset,
     discover_skills,
     get_skills_system_prompt,
     load_skill_instructions,
+    parse_frontmatter,
     parse_skill_md,
+    read_resource_range,
+    read_skill_header,
 )
 from pydantic_deep.types import Skill, SkillDirectory
 
@@ -113,6 +126,52 @@ Instructions.
         assert frontmatter["description"] == "test desc"
 
 
+class TestParseFrontmatter:
+    """Tests for the YAML frontmatter loader."""
+
+    def test_full_yaml(self):
+        """Test inline lists, block strings and nested maps."""
+        pytest.importorskip("yaml")
+        frontmatter = parse_frontmatter(
+            "name: pdf\n"
+            "tags: [pdf, 'forms']\n"
+            "description: >\n"
+            "  Extract fields\n"
+            "  from PDF forms\n"
+            "metadata:\n"
+            "  owner: docs-team\n"
+            "version: 2.0"
+        )
+        assert frontmatter["tags"] == ["pdf", "forms"]
+        assert frontmatter["description"] == "Extract fields from PDF forms\n"
+        assert frontmatter["metadata"] == {"owner": "docs-team"}
+        assert frontmatter["version"] == "2.0"
+
+    def test_fallback_without_yaml(self, monkeypatch):
+        """Test that the simple parser handles inline lists when PyYAML is missing."""
+        monkeypatch.setitem(sys.modules, "yaml", None)
+        frontmatter = parse_frontmatter('name: x\ntags: [a, "b"]\nbroken line')
+        assert frontmatter == {"name": "x", "tags": ["a", "b"]}
+
+    def test_results_cached_by_content(self, monkeypatch):
+        """Test that unchanged frontmatter is not parsed again."""
+        from pydantic_deep.toolsets import skills as skills_module
+
+        calls: list[str] = []
+        original = skills_module._parse_simple_frontmatter
+
+        def counting(text, *, strict):
+            calls.append(text)
+            return original(text, strict=strict)
+
+        monkeypatch.setattr(skills_module, "_parse_simple_frontmatter", counting)
+        text = "name: cached-skill\ntags:\n  - one"
+        first = parse_frontmatter(text)
+        first["tags"].append("mutated")
+        assert parse_frontmatter(text) == {"name": "cached-skill", "tags": ["one"]}
+        assert len(calls) == 1
+
+
 class TestDiscoverSkills:
     """Tests for discover_skills function."""
 
@@ -342,3 +401,345 @@ Instructions.
         """Test creating toolset with custom ID."""
         toolset = create_skills_toolset(id="custom-skills")
         assert toolset.id == "custom-skills"
+
+
+def _write_skill(root, name, description="A skill"):
+    folder = root / name
+    folder.mkdir(exist_ok=True)
+    (folder / "SKILL.md").write_text(
+        f"---\nname: {name}\ndescription: {description}\n---\n\n# {name}\n"
+    )
+    return folder
+
+
+def _bump_mtime(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+class TestSkillIndex:
+    """Tests for the stat-revalidated skill index."""
+
+    def test_unchanged_skills_are_not_reparsed(self, tmp_path):
+        """Test that a second discovery only stats files."""
+        _write_skill(tmp_path, "alpha")
+        _write_skill(tmp_path, "beta")
+        index = SkillIndex()
+        directories: list[SkillDirectory] = [{"path": str(tmp_path)}]
+
+        first = index.discover(directories)
+        second = index.discover(directories)
+
+        assert [s["name"] for s in first] == ["alpha", "beta"]
+        assert second == first
+        assert index.parsed == 2
+
+    def test_changes_are_detected(self, tmp_path):
+        """Test that edits, new skills, removals and new resources are picked up."""
+        alpha = _write_skill(tmp_path, "alpha")
+        _write_skill(tmp_path, "beta")
+        index = SkillIndex()
+        directories: list[SkillDirectory] = [{"path": str(tmp_path)}]
+        index.discover(directories)
+
+        (alpha / "SKILL.md").write_text("---\nname: alpha\ndescription: Edited\n---\n")
+        _bump_mtime(alpha / "SKILL.md")
+        (alpha / "notes.txt").write_text("x")
+        _bump_mtime(alpha)
+        (tmp_path / "beta" / "SKILL.md").unlink()
+        _bump_mtime(tmp_path / "beta")
+        _write_skill(tmp_path, "gamma")
+        _bump_mtime(tmp_path)
+
+        skills = {s["name"]: s for s in index.discover(directories)}
+
+        assert sorted(skills) == ["alpha", "gamma"]
+        assert skills["alpha"]["description"] == "Edited"
+        assert skills["alpha"]["resources"] == ["notes.txt"]
+        assert index.parsed == 4
+
+    def test_returned_skills_are_copies(self, tmp_path):
+        """Test that callers can modify discovered skills without affecting the index."""
+        _write_skill(tmp_path, "alpha")
+        index = SkillIndex()
+        directories: list[SkillDirectory] = [{"path": str(tmp_path)}]
+        index.discover(directories)[0]["instructions"] = "loaded"
+        assert "instructions" not in index.discover(directories)[0]
+
+    def test_persisted_across_instances(self, tmp_path):
+        """Test that a saved index lets a new process skip parsing."""
+        root = tmp_path / "skills"
+        root.mkdir()
+        _write_skill(root, "alpha")
+        cache = tmp_path / "cache" / "index.json"
+        directories: list[SkillDirectory] = [{"path": str(root)}]
+
+        SkillIndex(cache).discover(directories)
+        reloaded = SkillIndex(cache)
+        skills = reloaded.discover(directories)
+
+        assert cache.exists()
+        assert [s["name"] for s in skills] == ["alpha"]
+        assert reloaded.parsed == 0
+
+    def test_corrupt_cache_is_ignored(self, tmp_path):
+        """Test that an unreadable cache file falls back to a full scan."""
+        _write_skill(tmp_path, "alpha")
+        cache = tmp_path / "index.json"
+        cache.write_text("not json")
+        index = SkillIndex(cache)
+        assert len(index.discover([{"path": str(tmp_path)}])) == 1
+        assert index.parsed == 1
+
+    def test_agent_discovers_once(self, tmp_path):
+        """Test that the toolset and the system prompt share one discovery."""
+        from pydantic_deep import create_deep_agent
+
+        class CountingIndex(SkillIndex):
+            calls = 0
+
+            def discover(self, directories, **kwargs):
+                self.calls += 1
+                return super().discover(directories, **kwargs)
+
+        _write_skill(tmp_path, "alpha")
+        index = CountingIndex()
+        create_deep_agent(
+            model=TestModel(),
+            skill_directories=[{"path": str(tmp_path)}],
+            skill_index=index,
+        )
+        assert index.calls == 1
+
+
+class TestParallelDiscovery:
+    """Tests for threaded skill discovery."""
+
+    def _library(self, root):
+        for group in range(5):
+            group_dir = root / f"group{group}"
+            group_dir.mkdir()
+            for i in range(6):
+                _write_skill(group_dir, f"skill-{group}-{i}")
+        _write_skill(root, "top")
+
+    def test_matches_sequential_discovery(self, tmp_path):
+        """Test that threaded discovery returns the same skills in the same order."""
+        self._library(tmp_path)
+        directories: list[SkillDirectory] = [{"path": str(tmp_path)}]
+
+        sequential = discover_skills(directories)
+        parallel = discover_skills(directories, max_workers=8)
+
+        assert len(parallel) == 31
+        assert parallel == sequential
+
+    def test_non_recursive(self, tmp_path):
+        """Test that non-recursive threaded discovery only looks at direct children."""
+        self._library(tmp_path)
+        index = SkillIndex(max_workers=4)
+        skills = index.discover([{"path": str(tmp_path), "recursive": False}])
+        assert [s["name"] for s in skills] == ["top"]
+
+    def test_header_read_stops_after_frontmatter(self, tmp_path):
+        """Test that only the start of a large SKILL.md is read."""
+        skill_file = tmp_path / "SKILL.md"
+        skill_file.write_text("---\nname: big\n---\n" + "body line\n" * 10_000)
+
+        header = read_skill_header(skill_file, head_bytes=256)
+
+        assert len(header) == 256
+        assert parse_skill_md(header)[0] == {"name": "big"}
+
+    def test_header_read_falls_back_for_long_frontmatter(self, tmp_path):
+        """Test that frontmatter longer than the head is read completely."""
+        skill_file = tmp_path / "SKILL.md"
+        description = "x" * 500
+        skill_file.write_text(f"---\nname: long\ndescription: {description}\n---\nBody\n")
+
+        frontmatter, _ = parse_skill_md(read_skill_header(skill_file, head_bytes=64))
+
+        assert frontmatter["description"] == description
+
+
+class TestSkillRegistry:
+    """Tests for the live skill registry."""
+
+    def test_refresh_applies_changes(self, tmp_path):
+        """Test that refresh reports and applies only real changes."""
+        _write_skill(tmp_path, "alpha")
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+        changes: list[int] = []
+        registry.subscribe(lambda r: changes.append(r.version))
+
+        assert registry.refresh() is False
+        assert registry.version == 0
+
+        _write_skill(tmp_path, "beta")
+        _bump_mtime(tmp_path)
+        assert registry.refresh() is True
+        assert [s["name"] for s in registry.skills] == ["alpha", "beta"]
+
+        (tmp_path / "alpha" / "SKILL.md").unlink()
+        _bump_mtime(tmp_path / "alpha")
+        assert registry.refresh() is True
+        assert "alpha" not in registry
+        assert changes == [1, 2]
+
+    def test_system_prompt_rebuilt_on_change_only(self, tmp_path):
+        """Test that the prompt is cached until the skill set changes."""
+        _write_skill(tmp_path, "alpha")
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+
+        prompt = registry.system_prompt()
+        registry.refresh()
+        assert registry.system_prompt() is prompt
+
+        _write_skill(tmp_path, "beta")
+        _bump_mtime(tmp_path)
+        registry.refresh()
+        assert "**beta**" in registry.system_prompt()
+
+    def test_instructions_cached_by_mtime(self, tmp_path):
+        """Test that instructions are re-read only after SKILL.md changes."""
+        folder = _write_skill(tmp_path, "alpha")
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+
+        first = registry.load_instructions("alpha")
+        assert registry.load_instructions("alpha") is first
+        assert registry.load_instructions("missing") is None
+
+        (folder / "SKILL.md").write_text("---\nname: alpha\n---\n\nNew body\n")
+        _bump_mtime(folder / "SKILL.md")
+        assert registry.load_instructions("alpha") == "New body"
+
+    def test_toolset_reads_registry(self, tmp_path):
+        """Test that a toolset sees skills added to its registry."""
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+        toolset = create_skills_toolset(registry=registry)
+        assert toolset.skills == []
+
+        _write_skill(tmp_path, "alpha")
+        _bump_mtime(tmp_path)
+        registry.refresh()
+        assert [s["name"] for s in toolset.skills] == ["alpha"]
+
+    def _wait_for_skill(self, registry, root, name):
+        added = threading.Event()
+        registry.subscribe(lambda r: added.set() if name in r else None)
+        registry.start()
+        try:
+            assert registry.watching
+            time.sleep(0.5)  # Let the watcher subscribe before changing files
+            _write_skill(root, name)
+            _bump_mtime(root)
+            assert added.wait(10)
+        finally:
+            registry.stop()
+        assert not registry.watching
+
+    def test_polling_watcher(self, tmp_path, monkeypatch):
+        """Test that the polling fallback picks up new skills."""
+        monkeypatch.setitem(sys.modules, "watchfiles", None)
+        registry = SkillRegistry([{"path": str(tmp_path)}], poll_interval=0.01)
+        self._wait_for_skill(registry, tmp_path, "alpha")
+
+    def test_watchfiles_watcher(self, tmp_path):
+        """Test that file system events trigger a refresh."""
+        pytest.importorskip("watchfiles")
+        registry = SkillRegistry([{"path": str(tmp_path)}])
+        self._wait_for_skill(registry, tmp_path, "alpha")
+
+
+def _catalog_skill(name, description, tags=None):
+    return Skill(
+        name=name,
+        description=description,
+        path=f"/skills/{name}",
+        tags=tags or [],
+        version="1.0.0",
+        author="",
+        frontmatter_loaded=True,
+    )
+
+
+class TestSkillSearch:
+    """Tests for relevance-ranked skill selection."""
+
+    CATALOG = [
+        _catalog_skill("csv-report", "Summarize tabular data into reports", ["data"]),
+        _catalog_skill("pdf-forms", "Extract fields from PDF forms", ["pdf", "forms"]),
+        _catalog_skill("pdf-merge", "Merge several documents into one"),
+        _catalog_skill("git-review", "Review a git diff for bugs", ["git"]),
+    ]
+
+    def test_bm25_ranking(self):
+        """Test that name and tag matches outrank incidental matches."""
+        index = SkillSearchIndex(self.CATALOG)
+        names = [s["name"] for s in index.search("extract pdf form fields")]
+        assert names == ["pdf-forms", "pdf-merge"]
+        assert index.search("kubernetes") == []
+        assert [s["name"] for s in index.search("pdf", limit=1)] == ["pdf-forms"]
+
+    def test_prompt_advertises_top_k(self):
+        """Test that large catalogs list only the most relevant skills."""
+        registry = SkillRegistry(skills=self.CATALOG, prompt_top_k=2)
+
+        prompt = registry.system_prompt(query="review my git diff")
+        assert "**git-review**" in prompt
+        assert prompt.count("- **") == 2
+        assert "2 more skills are available" in prompt
+        assert "search_skills" in prompt
+        assert registry.system_prompt(query="review my git diff") is prompt
+
+    def test_small_catalog_lists_everything(self):
+        """Test that catalogs within top_k are listed in full."""
+        registry = SkillRegistry(skills=self.CATALOG, prompt_top_k=None)
+        prompt = registry.system_prompt(query="pdf")
+        assert prompt.count("- **") == 4
+        assert "more skills are available" not in prompt
+
+
+class TestReadResourceRange:
+    """Tests for paged skill resource reads."""
+
+    def test_line_pages(self, tmp_path):
+        """Test offset/limit paging with a continuation note."""
+        path = tmp_path / "data.csv"
+        path.write_text("".join(f"row {i}\n" for i in range(10)))
+
+        assert read_resource_range(path) == path.read_text()
+        page = read_resource_range(path, 2, 3)
+        assert page.startswith("row 2\nrow 3\nrow 4\n\n")
+        assert "5 more lines, next offset=5" in page
+        assert read_resource_range(path, 10).startswith("Error: Offset 10")
+
+    def test_line_index_cached_until_modified(self, tmp_path):
+        """Test that the line index is rebuilt only after the file changes."""
+        from pydantic_deep.toolsets import skills as skills_module
+
+        path = tmp_path / "notes.md"
+        path.write_text("a\nb\n")
+        read_resource_range(path)
+        index = skills_module._resource_line_index[str(path)][2]
+        read_resource_range(path, 1)
+        assert skills_module._resource_line_index[str(path)][2] is index
+
+        path.write_text("a\nb\nc")
+        _bump_mtime(path)
+        assert read_resource_range(path, 2) == "c"
+
+    def test_byte_ranges_and_binary(self, tmp_path):
+        """Test byte-range reads and hex dumps of binary files."""
+        text = tmp_path / "text.txt"
+        text.write_text("hello world")
+        assert read_resource_range(text, byte_offset=6, byte_length=5) == "world"
+        assert "next byte_offset=5" in read_resource_range(text, byte_offset=0, byte_length=5)
+
+        blob = tmp_path / "blob.bin"
+        blob.write_bytes(b"\x00\x01AB" * 8)
+        assert read_resource_range(blob).startswith("Error: 'blob.bin' is a binary file")
+        dump = read_resource_range(blob, byte_offset=0, byte_length=4)
+        assert dump.startswith("00000000  00 01 41 42 ")
+        assert dump.splitlines()[0].endswith("  |..AB|")
+        assert "outside" in read_resource_range(blob, byte_offset=100)
@@ -0,0 +1,260 @@
+"""Tests for versioned state containers."""
+
+import copy
+import pickle
+
+from pydantic_ai_backends import StateBackend
+
+from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.state import StateChange, VersionedDict, VersionedList
+from pydantic_deep.types import Todo
+
+
+class TestVersionedDict:
+    """Tests for VersionedDict."""
+
+    def test_is_a_dict(self):
+        """Test that it behaves like a plain dict."""
+        d = VersionedDict({"a": 1}, name="test")
+        assert isinstance(d, dict)
+        assert d == {"a": 1}
+        assert d.version == 0
+
+    def test_mutations_bump_version(self):
+        """Test that every mutation increments the version."""
+        d: VersionedDict[str, int] = VersionedDict(name="test")
+        d["a"] = 1
+        d.update(b=2)
+        d.setdefault("c", 3)
+        d.setdefault("c", 4)  # no-op
+        d |= {"d": 4}
+        del d["a"]
+        d.pop("b")
+        d.pop("missing", None)  # no-op
+        d.popitem()
+        d.touch("d")
+        d.clear()
+        d.clear()  # no-op
+        assert d.version == 9
+
+    def test_subscribe_and_unsubscribe(self):
+        """Test change events are delivered to subscribers."""
+        d: VersionedDict[str, int] = VersionedDict(name="files")
+        events: list[StateChange] = []
+        unsubscribe = d.subscribe(events.append)
+
+        d["a"] = 1
+        assert events == [StateChange(container="files", version=1, kind="set", key="a")]
+
+        unsubscribe()
+        unsubscribe()  # idempotent
+        d["b"] = 2
+        assert len(events) == 1
+
+    def test_replace(self):
+        """Test replace swaps contents as a single change."""
+        d = VersionedDict({"a": 1}, name="test")
+        d.replace({"b": 2})
+        assert d == {"b": 2}
+        assert d.version == 1
+
+    def test_copy_and_pickle(self):
+        """Test that containers survive copy and pickle."""
+        d = VersionedDict({"a": [1]}, name="files")
+        for clone in (copy.deepcopy(d), pickle.loads(pickle.dumps(d))):
+            assert clone == d
+            assert clone.name == "files"
+            assert clone.uid != d.uid
+            clone["b"] = [2]
+            assert clone.version == 1
+
+
+class TestVersionedList:
+    """Tests for VersionedList."""
+
+    def test_mutations_bump_version(self):
+        """Test that every mutation increments the version."""
+        lst: VersionedList[int] = VersionedList(name="todos")
+        lst.append(3)
+        lst.extend([1, 2])
+        lst.extend([])  # no-op
+        lst.insert(0, 0)
+        lst += [5]
+        lst[0] = 10
+        lst[0:1] = [0]
+        del lst[0]
+        lst.remove(5)
+        lst.pop()
+        lst.sort()
+        lst.reverse()
+        lst *= 2
+        del lst[0:1]
+        lst.touch(0)
+        lst.clear()
+        lst.clear()  # no-op
+        assert lst.version == 15
+        assert lst == []
+
+    def test_replace_and_events(self):
+        """Test replace emits a single replace event."""
+        lst = VersionedList([1, 2], name="todos")
+        events: list[StateChange] = []
+        lst.subscribe(events.append)
+        lst.replace([3])
+        assert lst == [3]
+        assert events == [StateChange(container="todos", version=1, kind="replace")]
+
+    def test_pickle(self):
+        """Test that lists survive pickling."""
+        lst = VersionedList([1, 2], name="todos")
+        clone = pickle.loads(pickle.dumps(lst))
+        assert clone == [1, 2]
+        assert clone.name == "todos"
+
+
+class TestVersionedDeps:
+    """Tests for versioned containers on DeepAgentDeps."""
+
+    def test_containers_are_versioned(self):
+        """Test that deps wrap state in versioned containers."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        assert isinstance(deps.files, VersionedDict)
+        assert isinstance(deps.todos, VersionedList)
+        assert isinstance(deps.subagents, VersionedDict)
+        assert isinstance(deps.uploads, VersionedDict)
+        assert deps.state_version == (0, 0, 0, 0)
+
+    def test_backend_writes_are_tracked(self):
+        """Test that StateBackend writes bump the files version."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.backend.write("/a.txt", "hello")
+        assert deps.backend._files is deps.files
+        assert "/a.txt" in deps.files
+        assert deps.files.version == 1
+
+    def test_existing_backend_files_are_kept(self):
+        """Test that files already in the backend are exposed on deps."""
+        backend = StateBackend()
+        backend.write("/a.txt", "hello")
+        deps = DeepAgentDeps(backend=backend)
+        assert "/a.txt" in deps.files
+        assert backend._files is deps.files
+
+    def test_reassignment_keeps_container(self):
+        """Test that reassigning a field replaces contents in place."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        todos = deps.todos
+        events: list[StateChange] = []
+        deps.subscribe(events.append)
+
+        deps.todos = [Todo(content="Task", status="pending", active_form="Working")]
+
+        assert deps.todos is todos
+        assert len(deps.todos) == 1
+        assert events[-1].container == "todos"
+        assert events[-1].kind == "replace"
+
+    def test_unsubscribe_from_all(self):
+        """Test that deps.subscribe returns a combined unsubscribe."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        events: list[StateChange] = []
+        unsubscribe = deps.subscribe(events.append)
+        deps.subagents["x"] = object()
+        unsubscribe()
+        deps.subagents["y"] = object()
+        assert [e.container for e in events] == ["subagents"]
+
+    def test_prompt_sections_cached_by_version(self):
+        """Test that prompt sections are rebuilt only after a change."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.upload_file("data.csv", b"a,b\n1,2\n")
+
+        first = deps.get_uploads_summary()
+        assert deps.get_uploads_summary() is first
+
+        deps.upload_file("more.csv", b"c\n")
+        second = deps.get_uploads_summary()
+        assert second is not first
+        assert "/uploads/more.csv" in second
+
+    def test_files_summary_refreshes_after_touch(self):
+        """Test that touching a file invalidates the files summary."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.backend.write("/a.txt", "one")
+        assert "(1 lines)" in deps.get_files_summary()
+
+        deps.backend.edit("/a.txt", "one", "one\ntwo")
+        deps.files.touch("/a.txt")
+        assert "(2 lines)" in deps.get_files_summary()
+
+    def test_clone_shares_versioned_files(self):
+        """Test that subagent deps share the same tracked files."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        cloned = deps.clone_for_subagent()
+        cloned.backend.write("/sub.txt", "x")
+        assert cloned.files is deps.files
+        assert deps.files.version == 1
+
+
+class TestFilesSummary:
+    """Tests for the incrementally indexed files summary."""
+
+    @staticmethod
+    def _write_many(deps, count, directories=10):
+        for i in range(count):
+            deps.backend.write(f"/dir{i % directories}/file{i}.py", "a\nb")
+
+    def test_small_workspace_lists_every_file(self):
+        """Test that small workspaces keep the per-file listing."""
+        deps = DeepAgentDeps(backend=StateBackend())
+        self._write_many(deps, 5)
+        summary = deps.get_files_summary()
+        assert summary.count("(2 lines)") == 5
+        assert "Directories" not in summary
+
+    def test_large_workspace_is_compacted(self):
+        """Test rollups, recent files and the token cap for large workspaces."""
+        deps = DeepAgentDeps(backend=StateBackend(), files_summary_max_tokens=300)
+        self._write_many(deps, 2000)
+        deps.backend.write("/dir3/latest.py", "x")
+
+        summary = deps.get_files_summary()
+
+        assert len(summary) <= 300 * 4
+        assert "2001 files in 10 directories" in summary
+        assert "### Recently Modified" in summary
+        assert summary.index("/dir3/latest.py") < summary.index("/dir9/file1999.py")
+        assert "### Directories" in summary
+        assert "Use `ls` or `glob`" in summary
+
+    def test_directory_overflow_is_reported(self):
+        """Test that directories beyond the cap are counted, not listed."""
+        deps = DeepAgentDeps(
+            backend=StateBackend(), files_summary_max_tokens=200, files_summary_recent_files=0
+        )
+        self._write_many(deps, 500, directories=500)
+        summary = deps.get_files_summary()
+        assert "Recently Modified" not in summary
+        assert "more directories" in summary
+        assert len(summary) <= 200 * 4
+
+    def test_index_tracks_deletes_and_edits(self):
+        """Test that the index follows deletes, edits and bulk replacement."""
+        deps = DeepAgentDeps(backend=StateBackend(), files_summary_max_tokens=50)
+        self._write_many(deps, 100)
+        deps.get_files_summary()
+        index = deps._files_index
+        assert index is not None
+
+        del deps.files["/dir0/file0.py"]
+        deps.backend.edit("/dir1/file1.py", "a", "a\nc")
+        deps.files.touch("/dir1/file1.py")
+        assert "/dir0/file0.py" not in index.line_counts
+        assert index.line_counts["/dir1/file1.py"] == 3
+        assert index.dirs["/dir0/"] == [9, 18]
+        assert next(reversed(index.recent)) == "/dir1/file1.py"
+
+        deps.files = {"/only.txt": {"content": ["x"], "created_at": "", "modified_at": ""}}
+        assert index.line_counts == {"/only.txt": 1}
+        assert index.dirs == {"/": [1, 1]}
+        assert "- /only.txt (1 lines)" in deps.get_files_summary()
@@ -1,17 +1,37 @@
 """Extended tests for toolset implementations to reach 100% coverage."""
 
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic import BaseModel
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.toolsets import FunctionToolset
 from pydantic_ai_backends import StateBackend
 from pydantic_ai_todo import TodoItem
 
 from pydantic_deep.deps import DeepAgentDeps
+from pydantic_deep.state import VersionedDict
+from pydantic_deep.toolsets.budget import OutputBudget
 from pydantic_deep.toolsets.filesystem import (
     get_filesystem_system_prompt,
 )
 from pydantic_deep.toolsets.subagents import (
+    SubAgentRegistry,
+    SubAgentResultCache,
+    build_subagent,
     create_subagent_toolset,
+    format_batch_results,
     get_subagent_system_prompt,
+    run_concurrently,
+    run_subagent,
+    shape_subagent_result,
 )
-from pydantic_deep.types import SubAgentConfig
+from pydantic_deep.types import SubAgentConfig, SubAgentEvent, SubAgentTask
 
 
 class TestTodoToolsetExtended:
@@ -28,6 +48,44 @@ class TestTodoToolsetExtended:
         assert item.status == "pending"
         assert item.active_form == "Testing"
 
+    @pytest.mark.anyio
+    async def test_in_place_status_change_refreshes_prompt(self):
+        """Test that in-place todo edits bump the todos version and the cached prompt."""
+        from pydantic_ai_todo import Todo
+
+        from pydantic_deep.agent import _TodoChangeToolset
+
+        toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @toolset.tool
+        def update_todo_status(ctx: RunContext[DeepAgentDeps], todo_id: str, status: str) -> str:
+            """Update a todo in place, like pydantic-ai-todo does."""
+            for todo in ctx.deps.todos:
+                if todo.id == todo_id:
+                    todo.status = status  # type: ignore[assignment]
+            return "ok"
+
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.todos = [Todo(id="t1", content="Task", status="pending", active_form="Working")]
+        assert "[ ] Task" in deps.get_todo_prompt()
+        version = deps.todos.version
+
+        def model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                args = {"todo_id": "t1", "status": "completed"}
+                return ModelResponse(parts=[ToolCallPart("update_todo_status", args)])
+            return ModelResponse(parts=[TextPart("done")])
+
+        agent = Agent(
+            FunctionModel(model),
+            deps_type=DeepAgentDeps,
+            toolsets=[_TodoChangeToolset(wrapped=toolset)],
+        )
+        await agent.run("go", deps=deps)
+
+        assert deps.todos.version > version
+        assert "[x] Task" in deps.get_todo_prompt()
+
 
 class TestFilesystemToolsetExtended:
     """Extended tests for FilesystemToolset."""
@@ -137,3 +195,686 @@ class TestSubagentToolsetExtended:
         prompt = get_subagent_system_prompt(deps)
         assert "Cached Subagents" in prompt
         assert "researcher" in prompt
+
+
+class TestSubagentBatch:
+    """Tests for concurrent subagent fan-out."""
+
+    def test_toolset_has_batch_tool(self):
+        """Test that the batch tool is registered alongside task."""
+        toolset = create_subagent_toolset()
+        assert {"task", "task_batch"} <= set(toolset.tools)
+
+    @pytest.mark.anyio
+    async def test_run_concurrently_preserves_order(self):
+        """Test that results come back in job order despite finish order."""
+
+        def job(value: str, delay: float):
+            async def run() -> str:
+                await asyncio.sleep(delay)
+                return value
+
+            return run
+
+        results = await run_concurrently([job("slow", 0.05), job("fast", 0)])
+        assert results == ["slow", "fast"]
+
+    @pytest.mark.anyio
+    async def test_run_concurrently_limits_concurrency(self):
+        """Test that no more than max_concurrency jobs run at once."""
+        running = 0
+        peak = 0
+
+        async def run() -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await run_concurrently([run] * 6, max_concurrency=2)
+        assert peak == 2
+
+    @pytest.mark.anyio
+    async def test_run_concurrently_partial_failures(self):
+        """Test that failures and timeouts are returned, not raised."""
+
+        async def ok() -> str:
+            return "done"
+
+        async def boom() -> str:
+            raise ValueError("bad input")
+
+        async def hang() -> str:
+            await asyncio.sleep(10)
+            return "never"
+
+        results = await run_concurrently([ok, boom, hang], timeout=0.05)
+
+        assert results[0] == "done"
+        assert isinstance(results[1], ValueError)
+        assert isinstance(results[2], asyncio.TimeoutError)
+
+    def test_format_batch_results(self):
+        """Test the aggregated report lists tasks in order with failures."""
+        tasks = [
+            SubAgentTask(description="a", subagent_type="researcher"),
+            SubAgentTask(description="b", subagent_type="writer"),
+            SubAgentTask(description="c", subagent_type="general-purpose"),
+        ]
+        results = ["found it", asyncio.TimeoutError(), ValueError("Unknown subagent type")]
+
+        report = format_batch_results(tasks, results, ["\n\nSome file changes", "", ""], timeout=30)
+
+        assert report.startswith("Batch completed: 1/3 tasks succeeded.")
+        assert "### Task 1: researcher (completed)\nfound it\nSome file changes" in report
+        assert "### Task 2: writer (failed)\nError: Timed out after 30s" in report
+        assert "### Task 3: general-purpose (failed)\nError: Unknown subagent type" in report
+
+    @pytest.mark.anyio
+    async def test_batch_merges_overlays_in_task_order(self):
+        """Test ordering, failures, timeouts, stopped runs and conflicts of task_batch."""
+        tools: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @tools.tool
+        def write(ctx: RunContext[DeepAgentDeps], path: str, content: str) -> str:
+            """Write a file."""
+            ctx.deps.backend.write(path, content)
+            return "ok"
+
+        async def subagent_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            command, path, content = messages[0].parts[-1].content.split()
+            if len(messages) == 1:
+                if command == "fail":
+                    raise ValueError("bad input")
+                if command == "slow":
+                    await asyncio.sleep(0.1)
+                args = {"path": path, "content": content}
+                return ModelResponse(parts=[TextPart("working"), ToolCallPart("write", args)])
+            if command == "hang":
+                await asyncio.sleep(10)
+            return ModelResponse(parts=[TextPart(f"wrote {path}")])
+
+        tasks = [
+            {"description": "slow /notes.md first", "subagent_type": "writer"},
+            {"description": "write /notes.md second", "subagent_type": "writer"},
+            {"description": "fail /failed.md never", "subagent_type": "writer"},
+            {"description": "hang /hung.md never", "subagent_type": "writer"},
+            {"description": "write /partial.md kept", "subagent_type": "limited"},
+        ]
+
+        def parent_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                return ModelResponse(parts=[ToolCallPart("task_batch", {"tasks": tasks})])
+            return ModelResponse(parts=[TextPart("done")])
+
+        configs = [
+            SubAgentConfig(name="writer", description="Writes", instructions="Write."),
+            SubAgentConfig(
+                name="limited", description="Writes", instructions="Write.", budget={"max_steps": 1}
+            ),
+        ]
+        toolset = create_subagent_toolset(
+            subagents=configs, include_general_purpose=False, task_timeout=0.5
+        )
+        agent = Agent(FunctionModel(parent_model), deps_type=DeepAgentDeps, toolsets=[toolset])
+        deps = DeepAgentDeps(backend=StateBackend())
+        for config in configs:
+            deps.subagents[config["name"]] = Agent(
+                FunctionModel(subagent_model), deps_type=DeepAgentDeps, toolsets=[tools]
+            )
+
+        result = await agent.run("go", deps=deps)
+
+        (report,) = [
+            part.content
+            for message in result.all_messages()
+            for part in message.parts
+            if part.part_kind == "tool-return"
+        ]
+        sections = report.split("\n\n### ")
+        assert sections[0] == "Batch completed: 3/5 tasks succeeded."
+        assert sections[1] == "Task 1: writer (completed)\nwrote /notes.md"
+        assert sections[2].startswith("Task 2: writer (completed)\nwrote /notes.md\n")
+        assert "- /notes.md: modified by another agent" in sections[2]
+        assert sections[3] == "Task 3: writer (failed)\nError: bad input"
+        assert sections[4] == "Task 4: writer (failed)\nError: Timed out after 0.5s"
+        assert sections[5].startswith("Task 5: limited (completed)\nStopped early")
+        assert "first" in deps.backend.read("/notes.md")
+        assert "kept" in deps.backend.read("/partial.md")
+        assert sorted(deps.backend.files) == ["/notes.md", "/partial.md"]
+
+
+class TestSubAgentRegistry:
+    """Tests for the shared subagent registry."""
+
+    def _configs(self):
+        return [
+            SubAgentConfig(
+                name="researcher",
+                description="Research topics",
+                instructions="Research thoroughly.",
+                model="test",
+            ),
+        ]
+
+    def test_builds_lazily_once(self):
+        """Test that an agent is built on first use and then reused."""
+        registry = SubAgentRegistry(self._configs())
+        assert registry.built == []
+        assert "researcher" in registry
+
+        agent = registry.get("researcher")
+
+        assert registry.get("researcher") is agent
+        assert registry.built == ["researcher"]
+
+    def test_unknown_type(self):
+        """Test that unknown subagent types raise KeyError."""
+        registry = SubAgentRegistry(self._configs())
+        with pytest.raises(KeyError):
+            registry.get("missing")
+
+    def test_eager_toolset_populates_registry(self):
+        """Test that eager toolsets build every agent at creation time."""
+        registry = SubAgentRegistry(self._configs())
+        create_subagent_toolset(registry=registry, eager=True)
+        assert registry.built == ["researcher"]
+
+        registry.clear()
+        assert registry.built == []
+
+    @pytest.mark.anyio
+    async def test_agents_shared_across_sessions(self):
+        """Test that separate sessions reuse one agent and keep deps isolated."""
+        configs = self._configs()
+        registry = SubAgentRegistry(configs)
+        toolset = create_subagent_toolset(
+            subagents=configs, include_general_purpose=False, registry=registry
+        )
+
+        def delegate(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                args = {"description": "Look it up", "subagent_type": "researcher"}
+                return ModelResponse(parts=[ToolCallPart("task", args)])
+            return ModelResponse(parts=[TextPart("done")])
+
+        agent = Agent(FunctionModel(delegate), deps_type=DeepAgentDeps, toolsets=[toolset])
+
+        first = DeepAgentDeps(backend=StateBackend())
+        second = DeepAgentDeps(backend=StateBackend())
+        await agent.run("go", deps=first)
+        assert registry.built == ["researcher"]
+        built = registry.get("researcher")
+        await agent.run("go", deps=second)
+
+        assert registry.get("researcher") is built
+        assert first.subagents == {}
+        assert second.subagents == {}
+
+
+class TestRunSubagent:
+    """Tests for streaming, budgeted subagent runs."""
+
+    @pytest.mark.anyio
+    async def test_streams_events_to_sink(self):
+        """Test that text and tool events reach the event sink."""
+        toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @toolset.tool_plain
+        def lookup(query: str) -> str:
+            """Look something up."""
+            return f"result for {query}"
+
+        agent = Agent(TestModel(custom_output_text="all done"), toolsets=[toolset])
+        events: list[SubAgentEvent] = []
+
+        result = await run_subagent(
+            agent,
+            "Research",
+            DeepAgentDeps(backend=StateBackend()),
+            subagent_type="researcher",
+            event_sink=events.append,
+        )
+
+        assert result.output == "all done"
+        assert result.stopped is None
+        assert result.requests == 2
+        kinds = [e["kind"] for e in events]
+        assert kinds[0] == "start"
+        assert kinds[-1] == "complete"
+        assert "tool_call" in kinds and "tool_result" in kinds
+        assert "".join(e["content"] for e in events if e["kind"] == "text") == "all done"
+        assert len({e["task_id"] for e in events}) == 1
+
+    @pytest.mark.anyio
+    async def test_async_sink(self):
+        """Test that awaitable sinks are awaited."""
+        received: list[str] = []
+
+        async def sink(event: SubAgentEvent) -> None:
+            received.append(event["kind"])
+
+        agent = Agent(TestModel())
+        await run_subagent(
+            agent, "Hi", DeepAgentDeps(), subagent_type="general-purpose", event_sink=sink
+        )
+        assert received[0] == "start"
+        assert received[-1] == "complete"
+
+    @pytest.mark.anyio
+    async def test_step_budget_stops_run(self):
+        """Test that exceeding max_steps stops the run with partial output."""
+        toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @toolset.tool_plain
+        def lookup(query: str) -> str:
+            """Look something up."""
+            return query
+
+        agent = Agent(TestModel(), toolsets=[toolset])
+        events: list[SubAgentEvent] = []
+
+        result = await run_subagent(
+            agent,
+            "Research",
+            DeepAgentDeps(),
+            subagent_type="researcher",
+            budget={"max_steps": 1},
+            event_sink=events.append,
+        )
+
+        assert result.stopped is not None
+        assert events[-1]["kind"] == "aborted"
+
+    @pytest.mark.anyio
+    async def test_time_budget_stops_run(self):
+        """Test that exceeding max_seconds stops the run."""
+
+        async def slow(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            await asyncio.sleep(1)
+            return ModelResponse(parts=[TextPart("late")])
+
+        agent = Agent(FunctionModel(slow))
+        result = await run_subagent(
+            agent, "Hi", DeepAgentDeps(), subagent_type="slow", budget={"max_seconds": 0.05}
+        )
+        assert result.stopped == "time budget of 0.05s exceeded"
+        assert result.output == ""
+
+    @pytest.mark.anyio
+    async def test_timeout_from_tool_is_raised(self):
+        """Test that a TimeoutError raised inside the subagent is not reported as a budget stop."""
+        toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @toolset.tool_plain
+        def fetch(url: str) -> str:
+            """Fetch a URL."""
+            raise TimeoutError("connection timed out")
+
+        events: list[SubAgentEvent] = []
+        for budget in (None, {"max_seconds": 10}):
+            with pytest.raises(TimeoutError, match="connection timed out"):
+                await run_subagent(
+                    Agent(TestModel(), toolsets=[toolset]),
+                    "Hi",
+                    DeepAgentDeps(),
+                    subagent_type="x",
+                    budget=budget,  # type: ignore[arg-type]
+                    event_sink=events.append,
+                )
+            assert events[-1]["kind"] == "failed"
+
+    @pytest.mark.anyio
+    async def test_errors_are_reported_and_raised(self):
+        """Test that subagent errors emit a failed event and propagate."""
+
+        async def broken(messages: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+            raise RuntimeError("model down")
+            yield ""
+
+        events: list[SubAgentEvent] = []
+        with pytest.raises(RuntimeError):
+            await run_subagent(
+                Agent(FunctionModel(stream_function=broken)),
+                "Hi",
+                DeepAgentDeps(),
+                subagent_type="x",
+                event_sink=events.append,
+            )
+        assert events[-1] == {
+            "task_id": events[0]["task_id"],
+            "subagent_type": "x",
+            "kind": "failed",
+            "content": "model down",
+        }
+
+
+class TestSubagentResultShaping:
+    """Tests for shaping subagent results before they reach the parent."""
+
+    def _config(self, **kwargs):
+        return SubAgentConfig(name="researcher", description="d", instructions="i", **kwargs)
+
+    def test_small_results_unchanged(self):
+        """Test that results within the cap are returned verbatim."""
+        config = self._config(max_result_tokens=100)
+        assert shape_subagent_result("short", config, StateBackend(), name="r") == "short"
+        assert shape_subagent_result("x" * 10_000, self._config(), StateBackend(), name="r") == (
+            "x" * 10_000
+        )
+
+    def test_oversized_results_truncated(self):
+        """Test truncation when no offload directory is configured."""
+        shaped = shape_subagent_result(
+            "x" * 1000, self._config(max_result_tokens=10), StateBackend(), name="r"
+        )
+        assert shaped.startswith("x" * 40)
+        assert "[... 960 more characters truncated]" in shaped
+
+    def test_oversized_results_offloaded(self):
+        """Test that oversized results are saved to the backend with a pointer."""
+        backend = StateBackend()
+        config = self._config(max_result_tokens=50, result_offload_dir="/results/")
+        output = "line\n" * 500
+
+        shaped = shape_subagent_result(output, config, backend, name="researcher-abc")
+
+        assert len(shaped) <= 50 * 4
+        assert "saved to /results/researcher-abc.md" in shaped
+        assert backend._read_bytes("/results/researcher-abc.md").decode() == output
+
+    @pytest.mark.anyio
+    async def test_structured_output_is_json(self):
+        """Test that subagents with an output schema return compact JSON."""
+
+        class Finding(BaseModel):
+            title: str
+            score: int
+
+        config = self._config(model="test", output_type=Finding)
+        agent = build_subagent(config)
+
+        result = await run_subagent(agent, "Find", DeepAgentDeps(), subagent_type="researcher")
+
+        assert json.loads(result.output).keys() == {"title", "score"}
+        assert result.task_id
+
+
+class TestSubAgentResultCache:
+    """Tests for subagent result memoization."""
+
+    def test_key_normalizes_description(self):
+        """Test that whitespace and case differences map to the same key."""
+        files = VersionedDict(name="files")
+        first = SubAgentResultCache.make_key("researcher", "Find  the\nbug", files)
+        second = SubAgentResultCache.make_key("researcher", " find the bug ", files)
+        assert first == second
+        assert first != SubAgentResultCache.make_key("writer", "find the bug", files)
+
+    def test_key_tracks_file_state(self):
+        """Test that file changes and other workspaces produce new keys."""
+        files = VersionedDict(name="files")
+        before = SubAgentResultCache.make_key("r", "task", files)
+        files["/a.txt"] = {"content": [], "created_at": "", "modified_at": ""}
+        assert SubAgentResultCache.make_key("r", "task", files) != before
+        assert SubAgentResultCache.make_key("r", "task", VersionedDict(name="files")) != before
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL."""
+        now = [0.0]
+        cache = SubAgentResultCache(ttl=10, clock=lambda: now[0])
+        cache.put("k", "result")
+        assert cache.get("k") == "result"
+        now[0] = 11
+        assert cache.get("k") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert len(cache) == 0
+
+    def test_size_bound_evicts_lru(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = SubAgentResultCache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        cache.clear()
+        assert len(cache) == 0
+
+    @pytest.mark.anyio
+    async def test_duplicate_delegation_hits_cache(self):
+        """Test that the same delegation runs the subagent only once."""
+        subagent_calls = 0
+
+        def subagent_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            nonlocal subagent_calls
+            subagent_calls += 1
+            return ModelResponse(parts=[TextPart("the answer")])
+
+        def parent_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) < 5:
+                args = {"description": "Look it up", "subagent_type": "general-purpose"}
+                return ModelResponse(parts=[ToolCallPart("task", args)])
+            return ModelResponse(parts=[TextPart("done")])
+
+        cache = SubAgentResultCache()
+        toolset = create_subagent_toolset(result_cache=cache)
+        agent = Agent(FunctionModel(parent_model), deps_type=DeepAgentDeps, toolsets=[toolset])
+        deps = DeepAgentDeps(backend=StateBackend())
+        deps.subagents["general-purpose"] = Agent(FunctionModel(subagent_model))
+
+        result = await agent.run("go", deps=deps)
+
+        assert subagent_calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        returns = [
+            part.content
+            for message in result.all_messages()
+            for part in message.parts
+            if part.part_kind == "tool-return"
+        ]
+        assert "(cached result)" in returns[1]
+
+    @pytest.mark.anyio
+    async def test_create_deep_agent_passes_subagent_options(self):
+        """Test that create_deep_agent forwards the cache and registry options."""
+        from pydantic_deep import create_deep_agent
+
+        def parent_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) < 5:
+                args = {"description": "Look it up", "subagent_type": "researcher"}
+                return ModelResponse(parts=[ToolCallPart("task", args)])
+            return ModelResponse(parts=[TextPart("done")])
+
+        configs = [
+            SubAgentConfig(
+                name="researcher",
+                description="Research topics",
+                instructions="Research thoroughly.",
+                model="test",
+            )
+        ]
+        registry = SubAgentRegistry(configs)
+        cache = SubAgentResultCache()
+        agent = create_deep_agent(
+            model=FunctionModel(parent_model),
+            subagents=configs,
+            include_skills=False,
+            subagent_registry=registry,
+            subagent_result_cache=cache,
+            eager_subagents=True,
+        )
+        assert registry.built == ["researcher"]
+
+        await agent.run("go", deps=DeepAgentDeps(backend=StateBackend()))
+
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+class TestOutputBudget:
+    """Tests for tool output budgets."""
+
+    @staticmethod
+    async def _run(budget, calls, deps=None):
+        """Run an agent whose model calls `calls` in one turn; return tool results by call."""
+        toolset: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @toolset.tool_plain
+        def big(size: int) -> str:
+            """Return `size` characters."""
+            return "x" * size
+
+        @toolset.tool_plain
+        def rows(count: int) -> list[dict[str, int]]:
+            """Return `count` rows."""
+            return [{"row": i} for i in range(count)]
+
+        @toolset.tool_plain
+        def read_file(size: int) -> str:
+            """Pretend to read a file."""
+            return "y" * size
+
+        def model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                return ModelResponse(
+                    parts=[
+                        ToolCallPart(name, args, tool_call_id=f"call-{i}")
+                        for i, (name, args) in enumerate(calls)
+                    ]
+                )
+            return ModelResponse(parts=[TextPart("done")])
+
+        agent = Agent(
+            FunctionModel(model), deps_type=DeepAgentDeps, toolsets=[budget.wrap_toolset(toolset)]
+        )
+        deps = deps or DeepAgentDeps(backend=StateBackend())
+        result = await agent.run("go", deps=deps)
+        returns = {
+            part.tool_call_id: part.content
+            for message in result.all_messages()
+            for part in getattr(message, "parts", [])
+            if part.part_kind == "tool-return"
+        }
+        return [returns[f"call-{i}"] for i in range(len(calls))], deps
+
+    @pytest.mark.anyio
+    async def test_small_results_pass_through(self):
+        """Test that results within budget are unchanged, including structured ones."""
+        budget = OutputBudget(max_tokens_per_call=100)
+        (text, data), _ = await self._run(budget, [("big", {"size": 40}), ("rows", {"count": 2})])
+        assert text == "x" * 40
+        assert data == [{"row": 0}, {"row": 1}]
+
+    @pytest.mark.anyio
+    async def test_oversized_result_spills_to_backend(self):
+        """Test that oversized results are saved and replaced with a preview and path."""
+        budget = OutputBudget(max_tokens_per_call=100, preview_tokens=50)
+        (text,), deps = await self._run(budget, [("big", {"size": 1000})])
+
+        assert len(text) <= 200
+        assert "saved to /tool_outputs/big-" in text
+        (path,) = [p for p in deps.files if p.startswith("/tool_outputs/")]
+        assert path.endswith(".txt")
+        assert "x" * 1000 in deps.backend.read(path, limit=1)
+
+    @pytest.mark.anyio
+    async def test_structured_result_spills_as_json(self):
+        """Test that oversized structured results are saved as JSON."""
+        budget = OutputBudget(max_tokens_per_call=20)
+        (text,), deps = await self._run(budget, [("rows", {"count": 50})])
+        assert isinstance(text, str)
+        (path,) = list(deps.files)
+        assert path.endswith(".json")
+
+    @pytest.mark.anyio
+    async def test_read_file_is_truncated(self):
+        """Test that read_file output is truncated with a paging hint, not spilled."""
+        budget = OutputBudget(max_tokens_per_call=10)
+        (text,), deps = await self._run(budget, [("read_file", {"size": 100})])
+        assert text.startswith("y" * 40)
+        assert "60 more characters truncated. Use offset and limit" in text
+        assert not deps.files
+
+    @pytest.mark.anyio
+    async def test_per_tool_limit(self):
+        """Test that per-tool overrides replace the default limit."""
+        budget = OutputBudget(max_tokens_per_call=10, per_tool={"big": 1000})
+        (text,), _ = await self._run(budget, [("big", {"size": 400})])
+        assert text == "x" * 400
+
+    @pytest.mark.anyio
+    async def test_turn_budget_shared_by_parallel_calls(self):
+        """Test that calls answering one model response share the per-turn budget."""
+        budget = OutputBudget(max_tokens_per_call=100, max_tokens_per_turn=150, preview_tokens=20)
+        calls = [("big", {"size": 400}), ("big", {"size": 400}), ("big", {"size": 400})]
+        results, deps = await self._run(budget, calls)
+        spilled = [r for r in results if "saved to" in r]
+        assert len(spilled) == 2
+        assert len(deps.files) == 2
+        assert results[0] == "x" * 400
+
+    @pytest.mark.anyio
+    async def test_turn_budget_shared_across_toolsets(self):
+        """Test that the per-turn budget covers calls to different wrapped toolsets."""
+        first: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+        second: FunctionToolset[DeepAgentDeps] = FunctionToolset()
+
+        @first.tool_plain
+        def alpha() -> str:
+            """Return 400 characters."""
+            return "a" * 400
+
+        @second.tool_plain
+        def beta() -> str:
+            """Return 400 characters."""
+            return "b" * 400
+
+        def model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            if len(messages) == 1:
+                return ModelResponse(
+                    parts=[
+                        ToolCallPart("alpha", {}, tool_call_id="call-0"),
+                        ToolCallPart("beta", {}, tool_call_id="call-1"),
+                    ]
+                )
+            return ModelResponse(parts=[TextPart("done")])
+
+        budget = OutputBudget(max_tokens_per_call=100, max_tokens_per_turn=150, preview_tokens=20)
+        agent = Agent(
+            FunctionModel(model),
+            deps_type=DeepAgentDeps,
+            toolsets=[budget.wrap_toolset(first), budget.wrap_toolset(second)],
+        )
+        deps = DeepAgentDeps(backend=StateBackend())
+        result = await agent.run("go", deps=deps)
+
+        returns = [
+            part.content
+            for message in result.all_messages()
+            for part in getattr(message, "parts", [])
+            if part.part_kind == "tool-return"
+        ]
+        assert len([r for r in returns if "saved to" in r]) == 1
+        assert len(deps.files) == 1
+
+    @pytest.mark.anyio
+    async def test_applied_to_user_tools(self):
+        """Test that create_deep_agent budgets user tools too."""
+        from pydantic_deep import create_deep_agent
+
+        def dump() -> str:
+            """Return a large blob."""
+            return "z" * 1000
+
+        agent = create_deep_agent(
+            model=TestModel(call_tools=["dump"]),
+            tools=[dump],
+            include_subagents=False,
+            include_skills=False,
+            output_budget=OutputBudget(max_tokens_per_call=50),
+        )
+        deps = DeepAgentDeps(backend=StateBackend())
+        await agent.run("go", deps=deps)
+        assert [p for p in deps.files if p.startswith("/tool_outputs/dump-")]